@@ -0,0 +1,74 @@
+"""Benchmark subtitle alignment: ffsubsync CLI vs the warm in-process aligner.
+
+Aligns the same unsynced SRT on a spoken audio file several times with each
+path and prints the latencies as a Markdown table. The aligner path includes
+decoding the audio to PCM, as in a render.
+
+Usage:
+    python benchmark_aligner.py speech.mp3 --text "Texte lu dans l'audio" [--runs 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import main
+
+
+async def timed(coro) -> float:
+    start = time.time()
+    await coro
+    return time.time() - start
+
+
+async def benchmark(audio: Path, text: str, runs: int) -> list:
+    duration = (await main.probe_media(audio)).duration or 30.0
+    rows = []
+
+    with tempfile.TemporaryDirectory(prefix="aligner_bench_") as tmp:
+        tmp_dir = Path(tmp)
+        unsynced = tmp_dir / "unsynced.srt"
+        synced = tmp_dir / "synced.srt"
+        main.generate_unsynced_srt(text, unsynced, total_duration=duration)
+
+        cli = [
+            await timed(main.run_ffsubsync_cli(audio, unsynced, synced)) for _ in range(runs)
+        ]
+        rows.append(("ffsubsync CLI", cli))
+
+        main.start_aligner_pool()
+        # First call includes waiting for the pool warm-up, reported separately
+        cold = await timed(main.run_ffsubsync(audio, unsynced, synced))
+        rows.append(("aligner pool, first call", [cold]))
+
+        warm = [await timed(main.run_ffsubsync(audio, unsynced, synced)) for _ in range(runs)]
+        rows.append(("aligner pool + decode", warm))
+        main.aligner_pool.shutdown()
+
+    return rows
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("audio", type=Path, help="Audio (or video) file with speech")
+    parser.add_argument("--text", required=True, help="Text spoken in the audio")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per path")
+    args = parser.parse_args()
+
+    rows = asyncio.run(benchmark(args.audio, args.text, args.runs))
+
+    print()
+    print("| path | runs | median (s) | min (s) | max (s) |")
+    print("|---|---|---|---|---|")
+    for name, times in rows:
+        print(
+            f"| {name} | {len(times)} | {statistics.median(times):.3f} | "
+            f"{min(times):.3f} | {max(times):.3f} |"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+"""Benchmark the reel normalization plan: legacy filter order vs plan_reel_video.
+
+For common source sizes, with and without stabilization, prints the pixels
+read per frame by the normalization filters in the legacy order (motion
+filter and sharpen on the source, then scale and crop) and in the planned
+order: in total, and by the stabilization and sharpen filters alone, which
+cost far more per pixel than scale or crop. Also times planning, building,
+validating and rendering the graph.
+Nothing is encoded unless --run is given: then each chain also filters a
+synthetic clip of the source size (ffmpeg -f null), and the SSIM of the
+planned output against the legacy one shows what the early scale changes
+in the picture (sharpen reads scaled pixels). --run uses deshake as the
+motion filter, vidstabtransform would need a transforms file per size.
+
+Usage:
+    python benchmark_filter_graph.py [--run] [--duration 5]
+"""
+
+import argparse
+import re
+import subprocess
+import time
+
+from filter_graph import FilterGraph, legacy_reel_plan, plan_reel_video
+from main import COLOR_ADJUST_FILTER, REEL_SIZE, SHARPEN_FILTER
+
+# (width, height) as the filters see them
+SOURCES = {
+    "4K landscape": (3840, 2160),
+    "4K portrait": (2160, 3840),
+    "1080p landscape": (1920, 1080),
+    "1080p portrait": (1080, 1920),
+    "720p portrait": (720, 1280),
+}
+
+
+def has_filter(name: str) -> bool:
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True)
+    return re.search(rf"\s{name}\s", result.stdout) is not None
+
+
+def plans(size: tuple, stabilize: bool) -> tuple:
+    sharpen = SHARPEN_FILTER if stabilize else None
+    return (
+        legacy_reel_plan(size, REEL_SIZE, stabilize, sharpen, COLOR_ADJUST_FILTER),
+        plan_reel_video(size, REEL_SIZE, stabilize, sharpen, COLOR_ADJUST_FILTER),
+    )
+
+
+def build_seconds(size: tuple, stabilize: bool, repeat: int = 2000) -> float:
+    """Mean time to plan, build, validate and render the normalization graph."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        plan = plans(size, stabilize)[1]
+        graph = FilterGraph()
+        graph.chain(["0:v"], plan.filters("deshake" if stabilize else None), ["vout"])
+        graph.validate(1, ["[vout]"])
+        graph.render()
+    return (time.perf_counter() - start) / repeat
+
+
+def synthetic_source(size: tuple, duration: float) -> str:
+    return f"testsrc2=size={size[0]}x{size[1]}:rate=30:duration={duration}"
+
+
+def filter_seconds(size: tuple, filters: list, duration: float) -> float:
+    start = time.time()
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-f", "lavfi", "-i", synthetic_source(size, duration),
+            "-vf", ",".join(filters), "-f", "null", "-",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Filtering {size} failed: {result.stderr[-500:]}")
+    return time.time() - start
+
+
+def ssim(size: tuple, legacy: list, planned: list, duration: float) -> float:
+    """SSIM (All) of the planned chain's output against the legacy chain's, same source."""
+    graph = FilterGraph()
+    graph.chain(["0:v"], ["split=2"], ["a", "b"])
+    graph.chain(["a"], legacy, ["legacy"])
+    graph.chain(["b"], planned, ["planned"])
+    graph.chain(["planned", "legacy"], ["ssim"], ["vout"])
+    graph.validate(1, ["[vout]"])
+    result = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-f", "lavfi", "-i", synthetic_source(size, duration),
+            "-filter_complex", graph.render(), "-map", "[vout]", "-f", "null", "-",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    match = re.search(r"All:([0-9.]+)", result.stderr)
+    if result.returncode != 0 or match is None:
+        raise RuntimeError(f"SSIM of {size} failed: {result.stderr[-500:]}")
+    return float(match.group(1))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run", action="store_true", help="Also time ffmpeg on synthetic clips")
+    parser.add_argument("--duration", type=float, default=5.0, help="Clip length in seconds")
+    args = parser.parse_args()
+
+    motion = "deshake" if args.run and has_filter("deshake") else None
+    header = (
+        "| source | stabilize | legacy (MP/frame) | planned (MP/frame) "
+        "| stabilize+sharpen legacy | stabilize+sharpen planned | build (µs) |"
+    )
+    if args.run:
+        header += " legacy (s) | planned (s) | SSIM planned vs legacy |"
+    print(header)
+    print("|---" * (header.count("|") - 1) + "|")
+
+    for name, size in SOURCES.items():
+        for stabilize in (False, True):
+            legacy, planned = plans(size, stabilize)
+            row = f"| {name} {size[0]}x{size[1]} | {'yes' if stabilize else 'no'} |"
+            for kinds in (None, ("motion", "local")):
+                for plan in (legacy, planned):
+                    row += f" {plan.pixel_work(kinds) / 1e6:.2f} |"
+            row += f" {build_seconds(size, stabilize) * 1e6:.0f} |"
+            if args.run:
+                if stabilize and motion is None:
+                    row += " - | - | - |"
+                else:
+                    for plan in (legacy, planned):
+                        row += f" {filter_seconds(size, plan.filters(motion), args.duration):.2f} |"
+                    similarity = ssim(size, legacy.filters(motion), planned.filters(motion), args.duration)
+                    row += f" {similarity:.4f} |"
+            print(row)
+
+
+if __name__ == "__main__":
+    main_cli()
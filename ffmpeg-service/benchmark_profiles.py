@@ -0,0 +1,124 @@
+"""Benchmark the encoding profiles of main.py on synthetic clips.
+
+For each synthetic source and each profile in ENCODING_PROFILES, records the
+encode wall time, the output size and the SSIM (and VMAF when ffmpeg is built
+with libvmaf) against a lossless reference, then prints a Markdown table.
+
+Usage:
+    python benchmark_profiles.py [--duration 10] [--profiles draft,balanced]
+"""
+
+import argparse
+import re
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from main import ENCODING_PROFILE_ORDER, video_encoding_args
+
+# lavfi sources at the reel geometry: flat graphics, fine detail, grain
+SOURCES = {
+    "graphics": "testsrc2=size=1080x1920:rate=30",
+    "detail": "mandelbrot=size=1080x1920:rate=30",
+    "grain": "testsrc2=size=1080x1920:rate=30,noise=alls=20:allf=t+u",
+}
+
+
+def run(cmd: list) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def has_filter(name: str) -> bool:
+    return re.search(rf"\s{name}\s", run(["ffmpeg", "-hide_banner", "-filters"]).stdout) is not None
+
+
+def make_reference(source: str, duration: float, path: Path):
+    # Lossless reference the encodes are compared against
+    result = run(
+        [
+            "ffmpeg", "-y", "-f", "lavfi", "-i", source, "-t", str(duration),
+            "-c:v", "libx264", "-qp", "0", "-preset", "ultrafast",
+            "-pix_fmt", "yuv420p", str(path),
+        ]
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not generate {source}: {result.stderr[-500:]}")
+
+
+def measure_ssim(encoded: Path, reference: Path) -> float:
+    result = run(
+        ["ffmpeg", "-i", str(encoded), "-i", str(reference), "-lavfi", "ssim", "-f", "null", "-"]
+    )
+    match = re.search(r"All:([0-9.]+)", result.stderr)
+    return float(match.group(1)) if match else float("nan")
+
+
+def measure_vmaf(encoded: Path, reference: Path) -> float:
+    result = run(
+        ["ffmpeg", "-i", str(encoded), "-i", str(reference), "-lavfi", "libvmaf", "-f", "null", "-"]
+    )
+    match = re.search(r"VMAF score: ([0-9.]+)", result.stderr)
+    return float(match.group(1)) if match else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="Clip length in seconds")
+    parser.add_argument(
+        "--profiles", default=",".join(ENCODING_PROFILE_ORDER), help="Comma-separated profiles"
+    )
+    args = parser.parse_args()
+
+    profiles = [p for p in args.profiles.split(",") if p]
+    with_vmaf = has_filter("libvmaf")
+    rows = []
+
+    with tempfile.TemporaryDirectory(prefix="profile_bench_") as tmp:
+        tmp_dir = Path(tmp)
+        for source_name, source in SOURCES.items():
+            reference = tmp_dir / f"{source_name}_ref.mp4"
+            make_reference(source, args.duration, reference)
+            print(f"🎞️ Reference '{source_name}' ready")
+
+            for profile in profiles:
+                encoded = tmp_dir / f"{source_name}_{profile}.mp4"
+                cmd = ["ffmpeg", "-y", "-i", str(reference)]
+                cmd += video_encoding_args(profile)
+                cmd += ["-pix_fmt", "yuv420p", "-an", str(encoded)]
+
+                start = time.time()
+                result = run(cmd)
+                encode_time = time.time() - start
+                if result.returncode != 0:
+                    print(f"❌ {source_name}/{profile} failed: {result.stderr[-300:]}")
+                    continue
+
+                row = {
+                    "source": source_name,
+                    "profile": profile,
+                    "encode_s": encode_time,
+                    "speed_x": args.duration / encode_time,
+                    "size_kb": encoded.stat().st_size / 1024,
+                    "ssim": measure_ssim(encoded, reference),
+                    "vmaf": measure_vmaf(encoded, reference) if with_vmaf else None,
+                }
+                rows.append(row)
+                print(
+                    f"✅ {source_name}/{profile}: {encode_time:.2f}s, "
+                    f"{row['size_kb']:.0f} KB, SSIM {row['ssim']:.4f}"
+                )
+
+    print()
+    print("| source | profile | encode (s) | speed (x realtime) | size (KB) | SSIM | VMAF |")
+    print("|---|---|---|---|---|---|---|")
+    for row in rows:
+        vmaf = f"{row['vmaf']:.2f}" if row["vmaf"] is not None else "n/a"
+        print(
+            f"| {row['source']} | {row['profile']} | {row['encode_s']:.2f} | "
+            f"{row['speed_x']:.2f} | {row['size_kb']:.0f} | {row['ssim']:.4f} | {vmaf} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
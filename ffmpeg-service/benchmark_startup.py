@@ -0,0 +1,81 @@
+"""Benchmark service startup: time to accept requests and time to /ready.
+
+Starts uvicorn on main:app several times and polls /health and /ready. The
+first run can start from an empty environment cache (--cold), the following
+ones reuse it, which is the usual container restart / new replica case.
+Prints the timings as a Markdown table.
+
+Usage:
+    python benchmark_startup.py [--runs 3] [--cold] [--port 8765]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+import main
+
+
+def wait_for(client: httpx.Client, path: str, headers: dict, deadline: float) -> float:
+    while time.time() < deadline:
+        try:
+            if client.get(path, headers=headers).status_code == 200:
+                return time.time()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{path} not ready in time")
+
+
+def start_once(port: int, timeout: float) -> tuple:
+    start = time.time()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            deadline = start + timeout
+            serving = wait_for(client, "/health", {"X-API-Key": main.API_KEY}, deadline)
+            ready = wait_for(client, "/ready", {}, deadline)
+            from_cache = client.get("/ready").json()["from_cache"]
+    finally:
+        server.terminate()
+        server.wait()
+    return serving - start, ready - start, from_cache
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Server starts")
+    parser.add_argument("--cold", action="store_true", help="Drop the environment cache first")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300, help="Per start, in seconds")
+    args = parser.parse_args()
+
+    if args.cold and main.ENVIRONMENT_CACHE_FILE.exists():
+        os.remove(main.ENVIRONMENT_CACHE_FILE)
+
+    rows = {}
+    for _ in range(args.runs):
+        serving, ready, from_cache = start_once(args.port, args.timeout)
+        label = "cached environment" if from_cache else "cold environment"
+        rows.setdefault(label, []).append((serving, ready))
+
+    print()
+    print("| environment | runs | serving (s) | ready (s) |")
+    print("|---|---|---|---|")
+    for label, times in rows.items():
+        serving = statistics.median(t[0] for t in times)
+        ready = statistics.median(t[1] for t in times)
+        print(f"| {label} | {len(times)} | {serving:.3f} | {ready:.3f} |")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,275 @@
+"""FFmpeg filter graphs built as data, and the resolution-aware reel video plan.
+
+main.py assembles its -filter_complex with FilterGraph instead of string
+concatenation: chains are kept as lists of filters with named input and
+output labels, so a graph can be copied (one per encoded segment), checked
+before ffmpeg runs (validate) and rendered. plan_reel_video orders the
+normalization steps (stabilization, scale, crop, sharpen, colour) so that
+each filter runs on as few pixels as the result allows. The module is pure
+(no ffmpeg, no main.py import) so both can be exercised and benchmarked
+without encoding anything.
+"""
+
+import copy
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# "0:v", "2:a", "1:v:0": input streams, usable by several chains
+_STREAM_SPEC_RE = re.compile(r"^(\d+)(:[vas](:\d+)?)?$")
+
+# Stands for the motion filter in a plan, whose transforms depend on the plan
+MOTION = "<motion>"
+
+
+class FilterGraphError(ValueError):
+    """The graph's labels are not wired into a single valid filter graph."""
+
+
+@dataclass
+class Chain:
+    """[in]...filter,filter...[out]: a linear run of filters between labels."""
+
+    inputs: list
+    filters: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+
+    def __str__(self) -> str:
+        # A chain without filters is a pass-through, ffmpeg needs one filter
+        return (
+            "".join(f"[{label}]" for label in self.inputs)
+            + (",".join(self.filters) or "null")
+            + "".join(f"[{label}]" for label in self.outputs)
+        )
+
+
+class FilterGraph:
+    """Ordered chains of a -filter_complex, wired by label."""
+
+    def __init__(self):
+        self.chains: list = []
+
+    def chain(self, inputs: list, filters: list = (), outputs: list = ()) -> Chain:
+        chain = Chain(list(inputs), list(filters), list(outputs))
+        self.chains.append(chain)
+        return chain
+
+    def then(self, chain: Chain, label: str, filters: list, extra_inputs: list = ()) -> Chain:
+        """Close chain on [label] and open a chain reading it, then extra_inputs."""
+        chain.outputs = [label]
+        return self.chain([label, *extra_inputs], filters)
+
+    def open_chain(self) -> Chain:
+        """The only chain without outputs (where the next filters go)."""
+        open_chains = [c for c in self.chains if not c.outputs]
+        if len(open_chains) != 1:
+            raise FilterGraphError(f"Expected one open chain, found {len(open_chains)}")
+        return open_chains[0]
+
+    def copy(self) -> "FilterGraph":
+        return copy.deepcopy(self)
+
+    def merged(self, other: "FilterGraph") -> "FilterGraph":
+        graph = self.copy()
+        graph.chains += copy.deepcopy(other.chains)
+        return graph
+
+    def render(self) -> str:
+        return ";".join(str(chain) for chain in self.chains)
+
+    def validate(self, input_count: int, mapped: list = ()):
+        """Raise FilterGraphError unless every label is wired exactly once.
+
+        Stream specs must name one of the input_count inputs; every output
+        label is produced by one chain and read by one chain or mapped
+        ("[label]" or a stream spec, as given to -map); chains must not form
+        a cycle.
+        """
+        producers = {}
+        for index, chain in enumerate(self.chains):
+            if not chain.outputs:
+                raise FilterGraphError(f"Chain {chain} has no output label")
+            for label in chain.outputs:
+                if label in producers:
+                    raise FilterGraphError(f"Label [{label}] is produced twice")
+                producers[label] = index
+
+        consumers = {label: 0 for label in producers}
+
+        def use(label: str, where: str):
+            spec = _STREAM_SPEC_RE.match(label)
+            if spec:
+                if int(spec.group(1)) >= input_count:
+                    raise FilterGraphError(
+                        f"{where} reads input {label}, only {input_count} inputs"
+                    )
+            elif label not in producers:
+                raise FilterGraphError(f"{where} reads [{label}], which no chain produces")
+            else:
+                consumers[label] += 1
+
+        for chain in self.chains:
+            for label in chain.inputs:
+                use(label, f"Chain {chain}")
+        for target in mapped:
+            use(target.strip("[]"), "-map")
+
+        for label, count in consumers.items():
+            if count != 1:
+                raise FilterGraphError(f"Label [{label}] is read {count} times, expected once")
+
+        # Depth-first search over producer -> consumer edges
+        state = [0] * len(self.chains)  # 0 new, 1 on the stack, 2 done
+
+        def visit(index: int):
+            state[index] = 1
+            for label in self.chains[index].inputs:
+                source = producers.get(label)
+                if source is None:
+                    continue
+                if state[source] == 1:
+                    raise FilterGraphError(f"Cycle through [{label}]")
+                if state[source] == 0:
+                    visit(source)
+            state[index] = 2
+
+        for index in range(len(self.chains)):
+            if state[index] == 0:
+                visit(index)
+
+
+def cover_size(source: tuple, target: tuple) -> tuple:
+    """Size of scale=W:H:force_original_aspect_ratio=increase (same rounding as ffmpeg)."""
+    (width, height), (target_width, target_height) = source, target
+    return (
+        max(target_width, round(target_height * width / height)),
+        max(target_height, round(target_width * height / width)),
+    )
+
+
+@dataclass
+class PlannedFilter:
+    filter: str
+    # scale / crop (geometry), motion (stabilization), local (sharpen), pointwise (colour)
+    kind: str
+    in_size: Optional[tuple]
+
+
+@dataclass
+class ReelPlan:
+    """Normalization filters of the reel, in order, with the frame size each one reads."""
+
+    steps: list
+    # Size of the frames the motion filter sees (vidstab transforms must match it)
+    motion_size: Optional[tuple]
+    # Downscaled before stabilization instead of after it
+    early_scale: bool
+
+    def filters(self, motion: Optional[str] = None) -> list:
+        filters = []
+        for step in self.steps:
+            if step.filter == MOTION:
+                if motion is None:
+                    raise FilterGraphError("The plan needs a motion filter")
+                filters.append(motion)
+            else:
+                filters.append(step.filter)
+        return filters
+
+    def signature(self) -> str:
+        """The plan's filters with the motion filter left as a placeholder (for cache keys)."""
+        return ",".join(step.filter for step in self.steps)
+
+    def pixel_work(self, kinds: Optional[tuple] = None) -> int:
+        """Pixels read per frame by the filters of kinds (all by default, 0 if the size is unknown)."""
+        return sum(
+            s.in_size[0] * s.in_size[1]
+            for s in self.steps
+            if s.in_size and (kinds is None or s.kind in kinds)
+        )
+
+
+def _reel_filters(target: tuple) -> tuple:
+    target_width, target_height = target
+    return (
+        f"scale={target_width}:{target_height}:force_original_aspect_ratio=increase",
+        f"crop={target_width}:{target_height}",
+    )
+
+
+def _sized_plan(order: list, source: Optional[tuple], target: tuple, early: bool) -> ReelPlan:
+    """ReelPlan of (filter, kind) steps, tracking the frame size through scale and crop."""
+    scale, crop = _reel_filters(target)
+    known = source is not None and all(source)
+    size = tuple(source) if known else None
+    steps = []
+    for f, kind in order:
+        steps.append(PlannedFilter(f, kind, size))
+        if known and f == scale:
+            size = cover_size(source, target)
+        elif known and f == crop:
+            size = tuple(target)
+    motion_size = next((s.in_size for s in steps if s.filter == MOTION), None)
+    return ReelPlan(steps, motion_size, early)
+
+
+def legacy_reel_plan(
+    source: Optional[tuple],
+    target: tuple,
+    motion: bool = False,
+    sharpen: Optional[str] = None,
+    color: Optional[str] = None,
+) -> ReelPlan:
+    """Motion filter and sharpen on the source frames, then scale, crop and colour."""
+    scale, crop = _reel_filters(target)
+    order = [(MOTION, "motion")] if motion else []
+    order += [(sharpen, "local")] if sharpen else []
+    order += [(scale, "geometry"), (crop, "geometry")]
+    order += [(color, "pointwise")] if color else []
+    return _sized_plan(order, source, target, False)
+
+
+def plan_reel_video(
+    source: Optional[tuple],
+    target: tuple,
+    motion: bool = False,
+    sharpen: Optional[str] = None,
+    color: Optional[str] = None,
+    early_scale: bool = True,
+) -> ReelPlan:
+    """Order scale + crop to target, the motion filter, sharpen and colour.
+
+    The motion filter must see the whole frame (it shifts it and zooms to
+    hide the borders), so it always runs before the crop. When the frame is
+    downscaled (source covers more pixels than the scaled frame), the scale
+    goes first and the motion filter runs at the scaled size; its
+    transforms must then be rescaled to motion_size. Colour is pointwise
+    and goes wherever the frame has the fewest pixels (before the scale
+    when upscaling, else after the crop).
+
+    Motion filter, sharpen and colour always keep their legacy relative
+    order: sharpen reads the stabilized frame. With an early scale it runs
+    after the crop, on the 1080x1920 frame, so it sharpens scaled pixels
+    rather than source ones (benchmark_filter_graph.py --run reports the
+    SSIM against the legacy order); early_scale=False keeps the legacy
+    pixels. An unknown source size keeps the legacy order (legacy_reel_plan).
+    """
+    if source is None or not all(source):
+        return legacy_reel_plan(source, target, motion, sharpen, color)
+
+    scale, crop = _reel_filters(target)
+    cover = cover_size(source, target)
+    early = early_scale and cover[0] * cover[1] < source[0] * source[1]
+    sharpen_step = [(sharpen, "local")] if sharpen else []
+    color_step = [(color, "pointwise")] if color else []
+    motion_step = [(MOTION, "motion")] if motion else []
+    if early:
+        # After the crop the frame is the smallest it gets
+        order = [(scale, "geometry")] + motion_step + [(crop, "geometry")]
+        order += sharpen_step + color_step
+    elif source[0] * source[1] <= target[0] * target[1]:
+        # Upscaled: the source is the smallest frame
+        order = motion_step + sharpen_step + color_step + [(scale, "geometry"), (crop, "geometry")]
+    else:
+        order = motion_step + sharpen_step + [(scale, "geometry"), (crop, "geometry")] + color_step
+    return _sized_plan(order, source, target, early)
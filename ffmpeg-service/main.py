@@ -1,6 +1,11 @@
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Optional
+from typing import Callable, Optional
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import uvicorn
 import subprocess
 import os
@@ -13,63 +18,957 @@ import edge_tts
 import re
 import emoji
 import time
-
-app = FastAPI()
+import json
+import asyncio
+import hashlib
+import multiprocessing
+import wave
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multipart.multipart import MultipartParser, parse_options_header
+import subtitle_aligner
+from filter_graph import FilterGraph, ReelPlan, plan_reel_video
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup / shutdown hooks are defined with the subsystems they belong to
+    start_job_workers()
+    start_aligner_pool()
+    start_environment_warm_up()
+    yield
+    await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
+# /ready reports how long the process took from import to ready
+PROCESS_STARTED_AT = time.time()
 
 API_KEY = os.environ.get("API_KEY", "default-key")
 TEMP_DIR = Path("/tmp/ffmpeg_processing")
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
+# Reject uploads larger than this (0 disables the limit)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 1024 * 1024 * 1024))
+
+# Rendered reels kept for output_mode="handle", fetched later via GET /outputs/{id}
+OUTPUT_DIR = Path(os.environ.get("OUTPUT_DIR", "/tmp/ffmpeg_outputs"))
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_TTL_SECONDS = int(os.environ.get("OUTPUT_TTL_SECONDS", 3600))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Remote asset downloads (video_url, music_url, watermark_url)
+DOWNLOAD_CONNECT_TIMEOUT = float(os.environ.get("DOWNLOAD_CONNECT_TIMEOUT", 10))
+DOWNLOAD_READ_TIMEOUT = float(os.environ.get("DOWNLOAD_READ_TIMEOUT", 30))
+# Hard deadline for one asset, whatever the transfer rate
+DOWNLOAD_DEADLINE = float(os.environ.get("DOWNLOAD_DEADLINE", 300))
+DOWNLOAD_MAX_BYTES = int(os.environ.get("DOWNLOAD_MAX_BYTES", 1024 * 1024 * 1024))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 32))
+
+# Persistent content-addressed cache for downloaded assets (0 disables it)
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", "/tmp/ffmpeg_cache"))
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("ASSET_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+# A cached URL is reused without any request for this long, then revalidated
+# with If-None-Match / If-Modified-Since
+ASSET_CACHE_FRESH_SECONDS = int(os.environ.get("ASSET_CACHE_FRESH_SECONDS", 3600))
+
+# Cache of generated TTS audio + subtitles, shared by /preview-tts and /process-reel
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+TTS_CACHE_TTL_SECONDS = int(os.environ.get("TTS_CACHE_TTL_SECONDS", 24 * 3600))
+# Number of ffprobe results kept in memory, keyed by file content hash
+PROBE_CACHE_SIZE = int(os.environ.get("PROBE_CACHE_SIZE", 512))
+# Stabilization detection runs on a proxy whose longest side is this many
+# pixels (0 = analyze the source); its transforms are cached by source hash
+STABILIZE_PROXY_MAX_SIDE = int(os.environ.get("STABILIZE_PROXY_MAX_SIDE", 960))
+TRANSFORM_CACHE_MAX_BYTES = int(os.environ.get("TRANSFORM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Normalized 1080x1920 mezzanine (stabilized, scaled, colour-adjusted, no audio)
+# kept per source, so re-renders only redo captions, overlays and the mix (0 disables it)
+MEZZANINE_CACHE_MAX_BYTES = int(
+    os.environ.get("MEZZANINE_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024)
+)
+# The mezzanine is an extra encode: it is only written on the Nth render of the
+# same source and plan since startup (1 = on every render)
+MEZZANINE_WRITE_AFTER = int(os.environ.get("MEZZANINE_WRITE_AFTER", 2))
+# Neither intra nor lossless: x264 ultrafast at CRF 12 is visually transparent
+# and stays a fraction of the size of -qp 0 / -g 1, which would fill the cache
+# with a few clips. One keyframe per second keeps segment seeks cheap
+MEZZANINE_CRF = os.environ.get("MEZZANINE_CRF", "12")
+# Ending effect: transparent large logo + store name layer, rendered once per
+# (watermark, store, style) and overlaid on the last OUTRO_SECONDS of the reel
+OUTRO_CACHE_MAX_BYTES = int(os.environ.get("OUTRO_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+OUTRO_SECONDS = 5.0
+# Part of the outro cache key: bump "version" when changing how the outro is drawn
+OUTRO_STYLE = {
+    "version": 2,
+    "logo_height": 300,
+    "font_size": 70,
+}
+
+# Render worker pool: at most JOB_WORKERS reels are rendered at once,
+# up to JOB_QUEUE_SIZE more wait in the queue (POST /jobs answers 503 beyond that)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Each worker owns a render slot: an even share of the usable CPUs. Its child
+# processes are pinned to those CPUs (RENDER_CPU_AFFINITY=0 only caps threads)
+RENDER_CPU_AFFINITY = os.environ.get("RENDER_CPU_AFFINITY", "1") != "0"
+# Children are pinned through taskset, which sets the mask before exec
+TASKSET = shutil.which("taskset")
+# Edge TTS: long captions are synthesized sentence by sentence, this many at once
+EDGE_TTS_PARALLELISM = int(os.environ.get("EDGE_TTS_PARALLELISM", 4))
+# TTS circuit breaker: a backend (Gemini, or one Edge voice) failing this many
+# times in a row is skipped for TTS_BREAKER_COOLDOWN_SECONDS
+TTS_BREAKER_FAILURES = int(os.environ.get("TTS_BREAKER_FAILURES", 3))
+TTS_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("TTS_BREAKER_COOLDOWN_SECONDS", 300))
+# Start the same Edge voice again on a fresh connection when no audio chunk has
+# arrived after this many seconds (0 disables hedged requests)
+TTS_HEDGE_AFTER_SECONDS = float(os.environ.get("TTS_HEDGE_AFTER_SECONDS", 6))
+MAX_TTS_FALLBACK_VOICES = int(os.environ.get("MAX_TTS_FALLBACK_VOICES", 6))
+VOICE_CATALOG_TTL_SECONDS = int(os.environ.get("VOICE_CATALOG_TTL_SECONDS", 24 * 3600))
+# Warm subtitle aligner processes (0 = spawn the ffsubsync CLI for every alignment)
+ALIGNER_WORKERS = int(os.environ.get("ALIGNER_WORKERS", 1))
+# Sample rate of the PCM decoded for the aligner (webrtcvad: 8/16/32/48 kHz)
+ALIGNER_SAMPLE_RATE = 16000
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 20))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+# Finished jobs kept for GET /jobs/{id}, the oldest are forgotten first
+MAX_FINISHED_JOBS = int(os.environ.get("MAX_FINISHED_JOBS", 1000))
+# Completed renders kept by request fingerprint: an identical request (a retry,
+# a duplicate schedule) gets the same output without re-encoding. Identical
+# requests arriving while one renders wait for it. 0 disables both.
+OUTPUT_CACHE_SIZE = int(os.environ.get("OUTPUT_CACHE_SIZE", 32))
+OUTPUT_CACHE_TTL_SECONDS = int(os.environ.get("OUTPUT_CACHE_TTL_SECONDS", 900))
+
+# Encoding profile used when the request does not pick one (see ENCODING_PROFILES)
+DEFAULT_ENCODING_PROFILE = os.environ.get("DEFAULT_ENCODING_PROFILE", "archive")
+# Step profiles down one level per this many queued jobs (0 disables it)
+ENCODING_DOWNGRADE_QUEUE_DEPTH = int(os.environ.get("ENCODING_DOWNGRADE_QUEUE_DEPTH", 4))
+
+# Segmented encoding (segmented_encoding=true): the reel is cut into at most
+# ENCODE_SEGMENTS pieces of at least SEGMENT_MIN_SECONDS, encoded in parallel
+ENCODE_SEGMENTS = int(os.environ.get("ENCODE_SEGMENTS", max(1, (os.cpu_count() or 1) // 4)))
+SEGMENT_MIN_SECONDS = float(os.environ.get("SEGMENT_MIN_SECONDS", 10))
+OUTPUT_FPS = 30
+# Scale & crop to fill 1080x1920 (vertical reel), then enhance brightness/contrast
+# slightly for Facebook optimization (color_adjust). The filter order is planned
+# per source by filter_graph.plan_reel_video
+REEL_SIZE = (1080, 1920)
+COLOR_ADJUST_FILTER = "eq=brightness=0.05:contrast=1.1"
+# smoothing=30 -> Heavy smoothing (default is 10) for handheld feel
+# relative=1 -> Transforms relative to previous frame
+# zoom=5 -> Fixed 5% zoom to avoid black borders from stabilization
+VIDSTAB_TRANSFORM_PARAMS = "smoothing=30:relative=1:zoom=5"
+SHARPEN_FILTER = "unsharp=5:5:1.0:5:5:0.0"
+# The poster variant is grabbed at this time (at most mid-reel)
+POSTER_AT_SECONDS = float(os.environ.get("POSTER_AT_SECONDS", 3))
+
 # Set HOME for libass/fontconfig to ensure cache can be written
 os.environ["HOME"] = "/tmp"
 os.environ["XDG_CACHE_HOME"] = "/tmp/.cache"
 
 
-# List available filters and fonts for debugging
-def run_diagnostics():
+class RenderSlot:
+    """A share of the machine owned by one render worker."""
+
+    def __init__(self, slot_id: int, cpus: list):
+        self.id = slot_id
+        self.cpus = cpus
+        self.threads = len(cpus)
+        self.job_id = None
+        self.busy_since = None
+        self.jobs_done = 0
+
+    def status(self) -> dict:
+        return {
+            "slot": self.id,
+            "cpus": self.cpus,
+            "threads": self.threads,
+            "job_id": self.job_id,
+            "busy_seconds": round(time.time() - self.busy_since, 1) if self.busy_since else None,
+            "jobs_done": self.jobs_done,
+        }
+
+
+def usable_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_render_slots(count: int) -> list:
+    """Split the usable CPUs into `count` disjoint slots (shared round-robin if fewer CPUs than slots)."""
+    cpus = usable_cpus()
+    count = max(1, count)
+    if count >= len(cpus):
+        return [RenderSlot(i, [cpus[i % len(cpus)]]) for i in range(count)]
+    size, extra = divmod(len(cpus), count)
+    slots, first = [], 0
+    for i in range(count):
+        last = first + size + (1 if i < extra else 0)
+        slots.append(RenderSlot(i, cpus[first:last]))
+        first = last
+    return slots
+
+
+render_slots: list = []
+# CPU seconds of the child processes started by the current pipeline stage
+stage_cpu_seconds: ContextVar[Optional[list]] = ContextVar("stage_cpu_seconds", default=None)
+# Slot of the worker running the current task; child processes inherit its CPUs
+current_render_slot: ContextVar[Optional[RenderSlot]] = ContextVar(
+    "current_render_slot", default=None
+)
+
+
+def slot_thread_count(share: int = 1) -> int:
+    """Threads for one of `share` processes running side by side in the current slot."""
+    slot = current_render_slot.get()
+    total = slot.threads if slot else (os.cpu_count() or 1)
+    return max(1, total // max(1, share))
+
+
+def ffmpeg_thread_args(share: int = 1) -> list:
+    """-threads / -filter_complex_threads budget, to be placed before the first -i.
+
+    The encoder needs its own "-threads" after the inputs (see encoder_thread_args).
+    """
+    if current_render_slot.get() is None:
+        return []
+    threads = str(slot_thread_count(share))
+    return ["-filter_complex_threads", threads, "-threads", threads]
+
+
+def encoder_thread_args(share: int = 1) -> list:
+    if current_render_slot.get() is None:
+        return []
+    return ["-threads", str(slot_thread_count(share))]
+
+
+def read_process_cpu(pid: int) -> Optional[float]:
+    """utime + stime of a process and of its waited-for children, from /proc."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return sum(int(v) for v in fields[11:15]) / os.sysconf("SC_CLK_TCK")
+
+
+async def sample_process_cpu(pid: int, counter: list):
+    """Poll the CPU time of pid until cancelled, then add the last value to counter[0]."""
+    seen = 0.0
+    try:
+        while True:
+            seen = max(seen, read_process_cpu(pid) or 0.0)
+            await asyncio.sleep(0.2)
+    finally:
+        counter[0] += seen
+
+
+def slot_cpus() -> Optional[list]:
+    """CPUs of the current render slot when its processes are pinned, else None."""
+    slot = current_render_slot.get()
+    if slot is None or not RENDER_CPU_AFFINITY or not hasattr(os, "sched_setaffinity"):
+        return None
+    return sorted(slot.cpus)
+
+
+async def run_process(
+    cmd: list,
+    timeout: Optional[float] = None,
+    on_stdout_line: Optional[Callable[[str], None]] = None,
+) -> subprocess.CompletedProcess:
+    """Run a command without blocking the event loop.
+
+    Returns a CompletedProcess with stdout/stderr as bytes, like
+    subprocess.run(capture_output=True). If on_stdout_line is given, stdout is
+    consumed line by line as the process runs (e.g. ffmpeg -progress pipe:1)
+    instead of being returned. The child is killed on timeout or cancellation.
+    Inside a render worker the child is pinned to the worker's render slot;
+    inside a pipeline stage its CPU time is added to the stage's counter.
+    """
+    # No preexec_fn: it can deadlock the child of a process running threads
+    cpus = slot_cpus()
+    if cpus and TASKSET:
+        cmd = [TASKSET, "-c", ",".join(map(str, cpus)), *cmd]
+
+    proc = await asyncio.create_subprocess_exec(
+        *[str(c) for c in cmd],
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    if cpus and not TASKSET:
+        # Without taskset, pin right after the spawn (threads started before keep all CPUs)
+        try:
+            os.sched_setaffinity(proc.pid, cpus)
+        except ProcessLookupError:
+            pass
+
+    cpu_counter = stage_cpu_seconds.get()
+    sampler = None
+    if cpu_counter is not None:
+        sampler = asyncio.create_task(sample_process_cpu(proc.pid, cpu_counter))
+
+    async def read_stdout() -> bytes:
+        if on_stdout_line is None:
+            return await proc.stdout.read()
+        async for line in proc.stdout:
+            on_stdout_line(line.decode(errors="replace").rstrip())
+        return b""
+
+    try:
+        stdout, stderr, _ = await asyncio.wait_for(
+            asyncio.gather(read_stdout(), proc.stderr.read(), proc.wait()),
+            timeout=timeout,
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    finally:
+        if sampler is not None:
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+_http_client = None
+
+
+def get_http_client():
+    """Shared pooled HTTP client (keep-alive connections reused across jobs)."""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(DOWNLOAD_READ_TIMEOUT, connect=DOWNLOAD_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS // 2,
+            ),
+            # Add User-Agent to avoid 403 on some CDNs
+            headers={"User-Agent": "Mozilla/5.0"},
+        )
+    return _http_client
+
+
+async def download_to_file(
+    url: str,
+    dest_path: Path,
+    headers: Optional[dict] = None,
+    max_bytes: int = DOWNLOAD_MAX_BYTES,
+    deadline: float = DOWNLOAD_DEADLINE,
+) -> int:
+    """Stream an HTTP(S) resource to dest_path without blocking the event loop.
+
+    Connect/read timeouts come from the shared client; deadline bounds the
+    whole transfer and max_bytes the downloaded size (0 disables it).
+    """
+
+    async def fetch() -> int:
+        async with get_http_client().stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            written, _ = await stream_response_to_file(response, dest_path, max_bytes)
+        return written
+
+    try:
+        return await asyncio.wait_for(fetch(), timeout=deadline)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Download of {url} exceeded {deadline:.0f}s deadline")
+
+
+async def stream_response_to_file(response, dest_path: Path, max_bytes: int):
+    """Write a streamed httpx response to dest_path, returning (size, sha256 hex)."""
+    url = str(response.url)
+    content_length = int(response.headers.get("content-length") or 0)
+    if max_bytes and content_length > max_bytes:
+        raise ValueError(f"{url} is {content_length} bytes (limit {max_bytes})")
+    written = 0
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as f:
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if max_bytes and written > max_bytes:
+                raise ValueError(f"{url} exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            f.write(chunk)
+    return written, digest.hexdigest()
+
+
+def link_or_copy(src: Path, dest: Path):
+    """Hard-link src to dest (no data written), copying across filesystems."""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def remember_content_hash(path: Path, sha256: str):
+    """Record the sha256 of a file we just wrote, next to it (<name>.sha256)."""
+    path.with_name(path.name + ".sha256").write_text(sha256)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def content_hash_of(path: Path) -> str:
+    """sha256 of a file, from its sidecar when known, else hashed off the loop."""
+    sidecar = path.with_name(path.name + ".sha256")
+    try:
+        return sidecar.read_text().strip()
+    except OSError:
+        pass
+    sha256 = await asyncio.to_thread(file_sha256, path)
+    remember_content_hash(path, sha256)
+    return sha256
+
+
+class AssetCache:
+    """Content-addressed on-disk cache for downloaded assets.
+
+    Blobs are stored once under blobs/<sha256>. index.json maps each URL to
+    its blob plus the ETag / Last-Modified validators sent by the server.
+    Within fresh_seconds a cached URL costs no request at all, after that a
+    conditional GET revalidates it (304 -> reuse). Jobs receive a hard link
+    to the blob, so a hit writes no asset data to disk. Least recently used
+    entries are evicted once the blobs exceed max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, fresh_seconds: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.blob_dir = root / "blobs"
+        self.tmp_dir = root / "tmp"
+        self.index_path = root / "index.json"
+        self.counters = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+        }
+        # url -> {"lock", "users"}, dropped with its last user
+        self._locks = {}
+        self.index = {}
+        if self.enabled:
+            self.blob_dir.mkdir(parents=True, exist_ok=True)
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        # Drop entries whose blob disappeared (e.g. /tmp cleaned)
+        self.index = {
+            url: entry
+            for url, entry in self.index.items()
+            if (self.blob_dir / entry["sha256"]).exists()
+        }
+
+    def _save_index(self):
+        tmp_path = self.tmp_dir / f"index-{uuid.uuid4().hex}.json"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _total_bytes(self) -> int:
+        sizes = {entry["sha256"]: entry["size"] for entry in self.index.values()}
+        return sum(sizes.values())
+
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            self.counters["evictions"] += 1
+            # Blobs are shared by URLs with identical content
+            if not any(e["sha256"] == entry["sha256"] for e in self.index.values()):
+                (self.blob_dir / entry["sha256"]).unlink(missing_ok=True)
+                total -= entry["size"]
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "entries": len(self.index),
+            "bytes": self._total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+    async def fetch(self, url: str, dest_path: Path) -> dict:
+        """Materialize url at dest_path, returning {"bytes", "cache", "sha256"}."""
+        if not self.enabled:
+            size = await download_to_file(url, dest_path)
+            return {"bytes": size, "cache": "disabled", "sha256": None}
+
+        # One fetch per URL at a time: the second one is then a cache hit
+        slot = self._locks.setdefault(url, {"lock": asyncio.Lock(), "users": 0})
+        slot["users"] += 1
+        try:
+            async with slot["lock"]:
+                try:
+                    return await asyncio.wait_for(
+                        self._fetch(url, dest_path), timeout=DOWNLOAD_DEADLINE
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(
+                        f"Download of {url} exceeded {DOWNLOAD_DEADLINE:.0f}s deadline"
+                    )
+        finally:
+            slot["users"] -= 1
+            if not slot["users"]:
+                del self._locks[url]
+
+    async def content_hash(self, url: str) -> Optional[str]:
+        """sha256 of what url serves now, through the cache (None if it cannot be fetched).
+
+        Costs nothing within fresh_seconds and a conditional GET after; the
+        render that follows then finds the asset in the cache.
+        """
+        if not self.enabled:
+            return None
+        probe_path = self.tmp_dir / f"probe-{uuid.uuid4().hex}"
+        try:
+            return (await self.fetch(url, probe_path))["sha256"]
+        except Exception as e:
+            print(f"⚠️ Could not hash {url}: {e}")
+            return None
+        finally:
+            probe_path.unlink(missing_ok=True)
+            probe_path.with_name(probe_path.name + ".sha256").unlink(missing_ok=True)
+
+    async def _fetch(self, url: str, dest_path: Path) -> dict:
+        now = time.time()
+        entry = self.index.get(url)
+        blob_path = self.blob_dir / entry["sha256"] if entry else None
+
+        if entry and blob_path.exists() and now - entry["checked_at"] < self.fresh_seconds:
+            entry["last_used"] = now
+            self.counters["hits"] += 1
+            self.counters["bytes_saved"] += entry["size"]
+            link_or_copy(blob_path, dest_path)
+            remember_content_hash(dest_path, entry["sha256"])
+            return {"bytes": entry["size"], "cache": "hit", "sha256": entry["sha256"]}
+
+        headers = {}
+        if entry and blob_path.exists():
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            elif entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        tmp_path = self.tmp_dir / uuid.uuid4().hex
+        try:
+            async with get_http_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and headers:
+                    entry["checked_at"] = entry["last_used"] = now
+                    self.counters["revalidated"] += 1
+                    self.counters["bytes_saved"] += entry["size"]
+                    self._save_index()
+                    link_or_copy(blob_path, dest_path)
+                    remember_content_hash(dest_path, entry["sha256"])
+                    return {
+                        "bytes": entry["size"], "cache": "revalidated", "sha256": entry["sha256"]
+                    }
+
+                response.raise_for_status()
+                size, sha256 = await stream_response_to_file(
+                    response, tmp_path, DOWNLOAD_MAX_BYTES
+                )
+                validators = {
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                }
+
+            self.counters["misses"] += 1
+            if size > self.max_bytes:
+                # Too large to ever fit, hand the file to the job uncached
+                os.replace(tmp_path, dest_path)
+                remember_content_hash(dest_path, sha256)
+                return {"bytes": size, "cache": "miss", "sha256": sha256}
+
+            blob_path = self.blob_dir / sha256
+            if blob_path.exists():
+                # Same content already cached under another URL
+                tmp_path.unlink()
+            else:
+                os.replace(tmp_path, blob_path)
+
+            self.index[url] = {
+                "sha256": sha256,
+                "size": size,
+                "checked_at": now,
+                "last_used": now,
+                **validators,
+            }
+            self._evict()
+            self._save_index()
+            link_or_copy(blob_path, dest_path)
+            remember_content_hash(dest_path, sha256)
+            return {"bytes": size, "cache": "miss", "sha256": sha256}
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+asset_cache = AssetCache(
+    CACHE_DIR / "assets", ASSET_CACHE_MAX_BYTES, ASSET_CACHE_FRESH_SECONDS
+)
+
+
+async def fetch_assets(downloads: dict) -> dict:
+    """Download {name: (url, dest_path)} concurrently.
+
+    Never raises: returns {name: {"bytes", "duration"}} per asset, with an
+    "error" entry instead of "bytes" for the ones that failed.
+    """
+
+    async def fetch_one(name: str, url: str, dest_path: Path) -> dict:
+        start = time.time()
+        try:
+            result = await asset_cache.fetch(url, dest_path)
+            print(
+                f"📥 Fetched {name}: {result['bytes']} bytes in {time.time() - start:.2f}s "
+                f"(cache {result['cache']})"
+            )
+        except Exception as e:
+            dest_path.unlink(missing_ok=True)
+            result = {"error": str(e) or type(e).__name__}
+            print(f"⚠️ Failed to download {name}: {result['error']}")
+        result["duration"] = round(time.time() - start, 3)
+        return result
+
+    names = list(downloads)
+    results = await asyncio.gather(
+        *(fetch_one(name, *downloads[name]) for name in names)
+    )
+    return dict(zip(names, results))
+
+
+class MediaInfo(BaseModel):
+    """What the pipeline needs to know about a media file (one ffprobe run)."""
+
+    duration: float = 0.0
+    size: int = 0
+    format_name: str = ""
+    bit_rate: int = 0
+    has_video: bool = False
+    has_audio: bool = False
+    video_codec: Optional[str] = None
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    pix_fmt: Optional[str] = None
+    sample_aspect_ratio: Optional[str] = None
+    rotation: int = 0
+    audio_codec: Optional[str] = None
+    sample_rate: int = 0
+    channels: int = 0
+
+    @classmethod
+    def from_ffprobe(cls, data: dict) -> "MediaInfo":
+        fmt = data.get("format", {})
+        info = cls(
+            duration=float(fmt.get("duration") or 0),
+            size=int(fmt.get("size") or 0),
+            format_name=fmt.get("format_name", ""),
+            bit_rate=int(fmt.get("bit_rate") or 0),
+        )
+        for stream in data.get("streams", []):
+            codec_type = stream.get("codec_type")
+            if codec_type == "video" and not info.has_video:
+                # Cover art in audio files is reported as a single-frame video stream
+                if stream.get("disposition", {}).get("attached_pic"):
+                    continue
+                info.has_video = True
+                info.video_codec = stream.get("codec_name")
+                info.width = int(stream.get("width") or 0)
+                info.height = int(stream.get("height") or 0)
+                info.pix_fmt = stream.get("pix_fmt")
+                info.sample_aspect_ratio = stream.get("sample_aspect_ratio")
+                rate = stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "0/0"
+                num, _, den = rate.partition("/")
+                try:
+                    info.fps = float(num) / float(den or 1)
+                except (ValueError, ZeroDivisionError):
+                    info.fps = 0.0
+                rotation = stream.get("tags", {}).get("rotate")
+                for side_data in stream.get("side_data_list", []):
+                    if "rotation" in side_data:
+                        rotation = side_data["rotation"]
+                info.rotation = int(float(rotation or 0)) % 360
+                if not info.duration:
+                    info.duration = float(stream.get("duration") or 0)
+            elif codec_type == "audio" and not info.has_audio:
+                info.has_audio = True
+                info.audio_codec = stream.get("codec_name")
+                info.sample_rate = int(stream.get("sample_rate") or 0)
+                info.channels = int(stream.get("channels") or 0)
+                if not info.duration:
+                    info.duration = float(stream.get("duration") or 0)
+        return info
+
+    @property
+    def square_pixels(self) -> bool:
+        # ffprobe reports 0:1 when the stream does not say
+        return self.sample_aspect_ratio in (None, "1:1", "0:1")
+
+
+_probe_cache: "OrderedDict[str, MediaInfo]" = OrderedDict()
+probe_counters = {"hits": 0, "misses": 0}
+
+
+async def probe_media(path: Path) -> MediaInfo:
+    """Probe format + streams of a media file in a single ffprobe run.
+
+    Results are cached in memory by content hash, so the same music track,
+    logo or re-sent source video is only probed once.
+    """
+    content_hash = await content_hash_of(path)
+    cached = _probe_cache.get(content_hash)
+    if cached is not None:
+        _probe_cache.move_to_end(content_hash)
+        probe_counters["hits"] += 1
+        return cached.model_copy()
+
+    probe_counters["misses"] += 1
+    result = await run_process(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_format",
+            "-show_streams",
+            "-of",
+            "json",
+            str(path),
+        ]
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"ffprobe failed on {path.name}: {result.stderr.decode(errors='replace')[:300]}"
+        )
+    info = MediaInfo.from_ffprobe(json.loads(result.stdout.decode() or "{}"))
+
+    _probe_cache[content_hash] = info
+    while len(_probe_cache) > PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+    return info.model_copy()
+
+
+# Startup checks (ffmpeg capabilities, fonts) run in the background once the server
+# is up; their results are kept on disk and reused while ffmpeg and the fonts are unchanged
+ENVIRONMENT_CACHE_FILE = CACHE_DIR / "environment.json"
+FONT_DIRS = ["/usr/share/fonts", "/usr/share/fonts/truetype/noto", "/tmp/.fonts"]
+
+environment = {
+    "ready": False,
+    "started_at": None,
+    "ready_at": None,
+    "from_cache": False,
+    "emoji_font": None,
+    "steps": {},
+    "error": None,
+}
+environment_task: Optional[asyncio.Task] = None
+
+
+class CapabilityRegistry:
+    """What the local ffmpeg build and font setup can do, built once per binary.
+
+    Filters and encoders come from `ffmpeg -filters` / `-encoders`, the
+    options of OPTION_PROBED_FILTERS from `ffmpeg -h filter=<name>`, the font
+    index (family -> files) from fc-list. The render pipeline asks it which
+    filter variant to use and fails fast on missing capabilities.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.version: Optional[str] = None
+        self.filters: set = set()
+        self.encoders: set = set()
+        self.filter_options: dict = {}
+        self.fonts: dict = {}
+
+    def has_filter(self, name: str) -> bool:
+        return name in self.filters
+
+    def has_filter_option(self, name: str, option: str) -> bool:
+        return option in self.filter_options.get(name, ())
+
+    def has_encoder(self, name: str) -> bool:
+        return name in self.encoders
+
+    def font_files(self, family: str) -> list:
+        return self.fonts.get(family.lower(), [])
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "filters": sorted(self.filters),
+            "encoders": sorted(self.encoders),
+            "filter_options": {k: sorted(v) for k, v in self.filter_options.items()},
+            "fonts": self.fonts,
+        }
+
+    def restore(self, data: dict):
+        self.version = data.get("version")
+        self.filters = set(data.get("filters", []))
+        self.encoders = set(data.get("encoders", []))
+        self.filter_options = {k: set(v) for k, v in data.get("filter_options", {}).items()}
+        self.fonts = data.get("fonts", {})
+        self.loaded = True
+
+    def summary(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "ffmpeg_version": self.version,
+            "filters": len(self.filters),
+            "encoders": len(self.encoders),
+            "font_families": len(self.fonts),
+            "features": {
+                "subtitles": self.has_filter("subtitles"),
+                "drawtext": self.has_filter("drawtext"),
+                "vidstab": self.has_filter("vidstabdetect") and self.has_filter("vidstabtransform"),
+                "deshake": self.has_filter("deshake"),
+                "libx264": self.has_encoder("libx264"),
+                "aac": self.has_encoder("aac"),
+            },
+        }
+
+
+capabilities = CapabilityRegistry()
+
+# Filters whose options the pipeline depends on (vidstabdetect: fileformat)
+OPTION_PROBED_FILTERS = ("vidstabdetect",)
+
+
+def _ffmpeg_listing(kind: str) -> set:
+    """Names from `ffmpeg -filters` / `-encoders`: the word after the flags column."""
+    out = subprocess.run(
+        ["ffmpeg", "-hide_banner", f"-{kind}"], capture_output=True, text=True
+    ).stdout
+    names = set()
+    past_header = False
+    for line in out.splitlines():
+        if line.strip().startswith("---"):
+            past_header = True
+            continue
+        parts = line.split()
+        if past_header and len(parts) >= 2:
+            names.add(parts[1])
+    return names
+
+
+def _ffmpeg_filter_options(name: str) -> set:
+    """Option names from `ffmpeg -h filter=<name>` ("   result   <string>  ..FV... ")."""
+    out = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-h", f"filter={name}"], capture_output=True, text=True
+    ).stdout
+    options = set()
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[1].startswith("<"):
+            options.add(parts[0])
+    return options
+
+
+# List available filters, encoders and the ffmpeg version
+def run_diagnostics() -> bool:
+    """Fill the registry from the local ffmpeg; False if the listings could not be read."""
     print("📋 Checking FFmpeg environment...")
     try:
-        filters_out = subprocess.run(
-            ["ffmpeg", "-filters"], capture_output=True, text=True
+        version_out = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-version"], capture_output=True, text=True
         ).stdout
-        has_subtitles = "subtitles" in filters_out
-        has_drawtext = "drawtext" in filters_out
-        print(f"✅ Filters found: subtitles={has_subtitles}, drawtext={has_drawtext}")
-
-        print("📋 Available fonts (fc-list):")
-        subprocess.run(["fc-list"], check=True)
+        capabilities.version = (version_out.splitlines() or [None])[0]
+        capabilities.filters = _ffmpeg_listing("filters")
+        capabilities.encoders = _ffmpeg_listing("encoders")
+        capabilities.filter_options = {
+            name: _ffmpeg_filter_options(name)
+            for name in OPTION_PROBED_FILTERS
+            if name in capabilities.filters
+        }
+        if not (capabilities.version and capabilities.filters and capabilities.encoders):
+            print("⚠️ FFmpeg returned no version, filters or encoders, capabilities unknown")
+            return False
+        features = capabilities.summary()["features"]
+        print(
+            f"✅ {capabilities.version}: {len(capabilities.filters)} filters, "
+            f"{len(capabilities.encoders)} encoders ({', '.join(k for k, v in features.items() if v)})"
+        )
     except Exception as e:
         print(f"⚠️ Failed to check FFmpeg environment: {e}")
+        return False
+    return True
 
 
-run_diagnostics()
+def index_fonts() -> dict:
+    """Font files by lowercased family name, from fc-list (or the font dirs without it)."""
+    fonts = {}
+    try:
+        out = subprocess.run(
+            ["fc-list", "--format", "%{family}\t%{file}\n"], capture_output=True, text=True
+        ).stdout
+        for line in out.splitlines():
+            families, _, path = line.partition("\t")
+            for family in families.split(","):
+                if family and path:
+                    fonts.setdefault(family.strip().lower(), []).append(path)
+    except FileNotFoundError:
+        for font_dir in FONT_DIRS:
+            for root, dirs, files in os.walk(font_dir):
+                for file in files:
+                    if file.endswith((".ttf", ".otf")):
+                        family = file.rsplit(".", 1)[0].split("-")[0].lower()
+                        fonts.setdefault(family, []).append(os.path.join(root, file))
+    for paths in fonts.values():
+        paths.sort()
+    print(f"📋 {len(fonts)} font families indexed")
+    return fonts
 
 
 @app.get("/debug-ffmpeg")
 async def debug_ffmpeg():
     try:
-        filters = subprocess.run(
-            ["ffmpeg", "-filters"], capture_output=True, text=True
-        ).stdout
-        fonts = subprocess.run(["fc-list"], capture_output=True, text=True).stdout
+        if not environment["ready"] and environment_task is not None:
+            await asyncio.shield(environment_task)
+        summary = capabilities.summary()
         return {
-            "filters_summary": {
-                "subtitles": "subtitles" in filters,
-                "drawtext": "drawtext" in filters,
-            },
+            "filters_summary": summary["features"],
+            "capabilities": summary,
             "env": {k: v for k, v in os.environ.items() if "API" not in k},
-            "fonts": fonts.splitlines()[:50],  # First 50
-            "raw_filters_hint": filters[:500],
+            "fonts": sorted(p for paths in capabilities.fonts.values() for p in paths)[:50],  # First 50
+            "font_path": FONT_PATH,
         }
     except Exception as e:
         return {"error": str(e)}
 
 
-# ... (existing imports)
+def ensure_fonts() -> Optional[str]:
+    """Ensure Noto Color Emoji and other essential fonts are available.
 
-
-def ensure_fonts():
-    """Ensure Noto Color Emoji and other essential fonts are available."""
+    Returns the emoji font path, or None when it could not be installed.
+    """
     print("🎨 Checking for Emoji fonts...")
 
     # Target directory for user fonts
@@ -89,7 +988,7 @@ def ensure_fonts():
         print("📥 Downloading Noto Color Emoji font...")
         try:
             url = "https://github.com/googlefonts/noto-emoji/raw/main/fonts/NotoColorEmoji.ttf"
-            response = requests.get(url, stream=True)
+            response = requests.get(url, stream=True, timeout=60)
             response.raise_for_status()
             with open(emoji_font_path, "wb") as f:
                 shutil.copyfileobj(response.raw, f)
@@ -105,17 +1004,14 @@ def ensure_fonts():
             print("✅ Font cache updated")
         except Exception as e:
             print(f"⚠️ Failed to download emoji font: {e}")
+            return None
     else:
         print(f"✅ Emoji font already present at {emoji_font_path}")
-
-
-# Run font setup
-ensure_fonts()
+    return str(emoji_font_path)
 
 
 # Robust font detection
 def get_font_path():
-    # ...
     possible_paths = [
         "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
         "/usr/share/fonts/truetype/dejavu-core/DejaVuSans.ttf",
@@ -126,24 +1022,131 @@ def get_font_path():
             print(f"✅ Found font at: {path}")
             return path
 
-    # Fallback search
-    print("⚠️ Specific font not found, searching recursively in /usr/share/fonts...")
-    try:
-        found = []
-        for root, dirs, files in os.walk("/usr/share/fonts"):
-            for file in files:
-                if file.endswith(".ttf"):
-                    found.append(os.path.join(root, file))
-        if found:
-            print(f"✅ Found {len(found)} fonts, using first: {found[0]}")
-            return found[0]
-    except Exception as e:
-        print(f"⚠️ Error searching for fonts: {e}")
+    # Fallback to the font index instead of walking /usr/share/fonts
+    print("⚠️ Specific font not found, looking it up in the font index...")
+    candidates = capabilities.font_files("DejaVu Sans") or sorted(
+        p for paths in capabilities.fonts.values() for p in paths if p.endswith(".ttf")
+    )
+    if candidates:
+        print(f"✅ Found {len(candidates)} fonts, using first: {candidates[0]}")
+        return candidates[0]
 
     return "Sans"  # Generic fallback
 
 
-FONT_PATH = get_font_path()
+# Generic fallback until the background warm-up has resolved the real font
+FONT_PATH = "Sans"
+
+
+def _stat_stamp(path: Optional[str]) -> Optional[list]:
+    try:
+        st = os.stat(path)
+        return [st.st_mtime, st.st_size]
+    except (OSError, TypeError):
+        return None
+
+
+def environment_fingerprint() -> dict:
+    """What the cached environment depends on: the ffmpeg binary and the font dirs."""
+    ffmpeg = shutil.which("ffmpeg")
+    return {
+        "ffmpeg": ffmpeg,
+        "ffmpeg_stat": _stat_stamp(ffmpeg),
+        "font_dirs": {d: _stat_stamp(d) for d in FONT_DIRS},
+    }
+
+
+def load_cached_environment() -> Optional[dict]:
+    """Cached warm-up results, if ffmpeg, the fonts and the files they name are unchanged."""
+    try:
+        cached = json.loads(ENVIRONMENT_CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        return None
+    if cached.get("fingerprint") != environment_fingerprint() or "capabilities" not in cached:
+        return None
+    # Written by a failed diagnostics run before those were no longer cached
+    if not (cached["capabilities"].get("filters") and cached["capabilities"].get("encoders")):
+        return None
+    # Written before filter options were probed
+    if "filter_options" not in cached["capabilities"]:
+        return None
+    if cached.get("font_path") != "Sans" and not os.path.exists(cached.get("font_path") or ""):
+        return None
+    # A failed emoji font download is retried on the next start
+    if not cached.get("emoji_font") or not os.path.exists(cached["emoji_font"]):
+        return None
+    return cached
+
+
+def prepare_environment() -> dict:
+    """Blocking warm-up: ffmpeg capabilities, emoji font install, font index and lookup.
+
+    Runs in a thread from the startup handler. A previous run's results are
+    reused from ENVIRONMENT_CACHE_FILE when nothing they depend on changed.
+    """
+    cached = load_cached_environment()
+    if cached is not None:
+        capabilities.restore(cached["capabilities"])
+        print("✅ Environment loaded from cache (capabilities, fonts)")
+        return {**cached, "from_cache": True, "steps": {}}
+
+    steps = {}
+    start = time.time()
+    # Renders only rely on the filter / encoder lists once they were read: an
+    # empty registry would fail every render with 501 (check_capabilities)
+    diagnosed = run_diagnostics()
+    capabilities.loaded = diagnosed
+    steps["capabilities"] = round(time.time() - start, 3)
+
+    start = time.time()
+    emoji_font = ensure_fonts()
+    steps["fonts"] = round(time.time() - start, 3)
+
+    start = time.time()
+    capabilities.fonts = index_fonts()
+    font_path = get_font_path()
+    steps["font_index"] = round(time.time() - start, 3)
+
+    result = {
+        "capabilities": capabilities.to_dict(),
+        "emoji_font": emoji_font,
+        "font_path": font_path,
+    }
+    if not diagnosed:
+        # Not cached either, the next start runs the diagnostics again
+        return {**result, "from_cache": False, "steps": steps}
+    try:
+        # Fingerprint taken after ensure_fonts, which may have added a font
+        ENVIRONMENT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ENVIRONMENT_CACHE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**result, "fingerprint": environment_fingerprint()}))
+        os.replace(tmp, ENVIRONMENT_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not cache environment: {e}")
+    return {**result, "from_cache": False, "steps": steps}
+
+
+async def warm_up_environment():
+    global FONT_PATH
+    environment["started_at"] = time.time()
+    try:
+        result = await asyncio.to_thread(prepare_environment)
+    except Exception as e:
+        environment["error"] = str(e)
+        print(f"❌ Environment warm-up failed: {e}")
+        return
+    FONT_PATH = result["font_path"]
+    environment.update(
+        ready=True,
+        ready_at=time.time(),
+        from_cache=result["from_cache"],
+        emoji_font=result["emoji_font"],
+        steps=result["steps"],
+    )
+    print(
+        f"✅ Environment ready in {environment['ready_at'] - environment['started_at']:.2f}s "
+        f"({environment['ready_at'] - PROCESS_STARTED_AT:.2f}s since start)"
+    )
 
 
 class ReelRequest(BaseModel):
@@ -163,7 +1166,114 @@ class ReelRequest(BaseModel):
     gemini_api_key: Optional[str] = None  # Google Cloud API key for Gemini TTS
     draw_text: bool = True
     stabilize: bool = False  # Stabilisation vidéo via vidstab
+    color_adjust: bool = True  # Slight brightness/contrast boost (eq)
     enable_ending_effect: bool = True
+    # Token returned by /preview-tts, reuses the previewed audio + subtitles
+    tts_token: Optional[str] = None
+    # "base64" (legacy JSON), "file" (MP4 streamed in the response body)
+    # or "handle" (JSON with an id to fetch from GET /outputs/{id})
+    output_mode: str = "base64"
+    encoding_profile: Optional[str] = None  # "draft", "balanced" or "archive"
+    # Let the server pick a faster profile under load. Off until the draft/balanced
+    # speed/quality trade-off is measured (see ENCODING_PROFILES)
+    allow_profile_downgrade: bool = False
+    segmented_encoding: bool = False  # Encode long reels as parallel segments
+    # Extra renditions from the same encode, names from OUTPUT_VARIANTS
+    variants: list[str] = []
+
+
+# x264 settings per encoding profile, from highest quality to fastest.
+# "archive" is the service's original encode, unchanged. The "balanced" and
+# "draft" values are NOT measured: they are starting guesses (common x264
+# preset / CRF steps with VBV caps scaled down from archive). Run
+# benchmark_profiles.py on real hardware and record its table in the docs
+# before relying on them, or before changing DEFAULT_ENCODING_PROFILE.
+ENCODING_PROFILES = {
+    "archive": {
+        "preset": "slow",
+        "crf": "18",
+        "b:v": "10M",
+        "maxrate": "12M",
+        "bufsize": "20M",
+    },
+    "balanced": {
+        "preset": "medium",
+        "crf": "21",
+        "maxrate": "8M",
+        "bufsize": "16M",
+    },
+    "draft": {
+        "preset": "veryfast",
+        "crf": "26",
+        "maxrate": "5M",
+        "bufsize": "10M",
+    },
+}
+ENCODING_PROFILE_ORDER = list(ENCODING_PROFILES)
+
+
+def video_encoding_args(profile_name: str) -> list:
+    """libx264 arguments for a profile (1080x1920 @ 30 fps, High@4.1)."""
+    profile = ENCODING_PROFILES[profile_name]
+    args = ["-c:v", "libx264", "-profile:v", "high", "-r", "30"]
+    args += ["-preset", profile["preset"], "-level", "4.1", "-crf", profile["crf"]]
+    for option in ("b:v", "maxrate", "bufsize"):
+        if option in profile:
+            args += [f"-{option}", profile[option]]
+    return args
+
+
+def select_encoding_profile(request: ReelRequest, queued_jobs: int = 0) -> str:
+    """Pick the profile for a render, stepping down one level per
+    ENCODING_DOWNGRADE_QUEUE_DEPTH queued jobs when the request allows it."""
+    requested = request.encoding_profile or DEFAULT_ENCODING_PROFILE
+    if requested not in ENCODING_PROFILES:
+        raise ValueError(
+            f"Unknown encoding_profile '{requested}' "
+            f"(expected one of {', '.join(ENCODING_PROFILE_ORDER)})"
+        )
+    level = ENCODING_PROFILE_ORDER.index(requested)
+    if request.allow_profile_downgrade and ENCODING_DOWNGRADE_QUEUE_DEPTH > 0:
+        level += queued_jobs // ENCODING_DOWNGRADE_QUEUE_DEPTH
+    return ENCODING_PROFILE_ORDER[min(level, len(ENCODING_PROFILE_ORDER) - 1)]
+
+
+# Renditions a request can add with `variants`. They are cut from the final
+# 1080x1920 stream (scale, then centre crop) in the same ffmpeg run as the reel.
+# "profile": encoding profile of the variant, None = same as the reel
+OUTPUT_VARIANTS = {
+    "preview_720": {"width": 720, "height": 1280, "format": "mp4", "profile": "draft"},
+    "square": {"width": 1080, "height": 1080, "format": "mp4", "profile": None},
+    "feed_4_5": {"width": 1080, "height": 1350, "format": "mp4", "profile": None},
+    "poster": {"width": 1080, "height": 1920, "format": "jpg", "profile": None},
+}
+
+
+def check_variants(request: ReelRequest):
+    unknown = [name for name in request.variants if name not in OUTPUT_VARIANTS]
+    if unknown:
+        raise ValueError(
+            f"Unknown variants {', '.join(unknown)} "
+            f"(expected some of {', '.join(OUTPUT_VARIANTS)})"
+        )
+    if len(set(request.variants)) != len(request.variants):
+        raise ValueError("Each variant can only be requested once")
+
+
+def variant_filter_graph(graph: FilterGraph, names: list, poster_at: float):
+    """Add chains splitting the finished [vmain] stream into [vout] and one [vo_<name>] per variant."""
+    graph.chain(
+        ["vmain"], [f"split={len(names) + 1}"], ["vout", *(f"vs_{name}" for name in names)]
+    )
+    for name in names:
+        spec = OUTPUT_VARIANTS[name]
+        filters = [f"select='gte(t,{poster_at})'"] if spec["format"] == "jpg" else []
+        width, height = spec["width"], spec["height"]
+        filters += [
+            f"scale={width}:{height}:force_original_aspect_ratio=increase",
+            f"crop={width}:{height}",
+        ]
+        graph.chain([f"vs_{name}"], filters, [f"vo_{name}"])
 
 
 def clean_text_for_display(text: str) -> str:
@@ -203,7 +1313,11 @@ async def generate_tts_gemini(
     display_text: Optional[str] = None,
     delay: float = 0.0,
 ):
-    """Generate TTS audio using Gemini native TTS API (gemini-2.5-flash-preview-tts)."""
+    """Generate TTS audio using Gemini native TTS API (gemini-2.5-flash-preview-tts).
+
+    The returned PCM is written to audio_path as WAV and subtitle timing is
+    estimated from it directly (see estimate_word_timings).
+    """
     try:
         import httpx
 
@@ -253,52 +1367,37 @@ async def generate_tts_gemini(
         if rate_match:
             sample_rate = int(rate_match.group(1))
 
-        pcm_path = audio_path.with_suffix(".pcm")
-        with open(pcm_path, "wb") as f:
-            f.write(audio_bytes)
-
-        convert_cmd = [
-            "ffmpeg", "-y",
-            "-f", "s16le",
-            "-ar", str(sample_rate),
-            "-ac", "1",
-            "-i", str(pcm_path),
-            "-codec:a", "libmp3lame",
-            "-qscale:a", "2",
-            str(audio_path),
-        ]
-        result = subprocess.run(convert_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"❌ ffmpeg PCM->MP3 conversion failed (rc={result.returncode}):")
-            print(result.stderr[-1000:])
-            raise RuntimeError(f"ffmpeg conversion failed: {result.stderr[-500:]}")
-        pcm_path.unlink(missing_ok=True)
+        # Keep the PCM in memory: WAV container for the mux, no lossy re-encode
+        with wave.open(str(audio_path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(audio_bytes)
 
+        audio_duration = len(audio_bytes) / (2 * sample_rate)
         print(f"\u2705 Gemini TTS audio saved: {audio_path.stat().st_size} bytes")
+        print(f"\u23f1\ufe0f TTS Audio Duration: {audio_duration:.2f}s")
 
-        # Measure total audio duration
-        audio_duration = None
-        try:
-            duration_cmd = [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(audio_path),
-            ]
-            dur_proc = subprocess.run(duration_cmd, stdout=subprocess.PIPE, text=True)
-            audio_duration = float(dur_proc.stdout.strip())
-            print(f"\u23f1\ufe0f TTS Audio Duration: {audio_duration:.2f}s")
-        except Exception as e:
-            print(f"\u26a0\ufe0f Could not measure TTS duration: {e}")
-
-        # Gemini TTS does not return word boundaries — sync with ffsubsync
+        # Gemini does not return word boundaries: estimate them from the audio energy
         text_to_display = display_text if display_text else text
-        unsynced_srt_path = audio_path.with_suffix(".unsynced.srt")
-        synced_srt_path = audio_path.with_suffix(".synced.srt")
-        generate_unsynced_srt(text_to_display, unsynced_srt_path, total_duration=audio_duration)
-        run_ffsubsync(audio_path, unsynced_srt_path, synced_srt_path)
-        convert_srt_to_ass(synced_srt_path, ass_path, font_size=65, delay=delay)
-        print("\u2705 TTS synchronisation completed with ffsubsync")
+        word_boundaries = estimate_word_timings(
+            audio_bytes, sample_rate, text_to_display.split()
+        )
+        if word_boundaries:
+            generate_ass_from_word_boundaries(
+                word_boundaries,
+                text_to_display,
+                ass_path,
+                font_size=65,
+                total_duration=audio_duration,
+                delay=delay,
+            )
+            print("\u2705 TTS synchronisation completed with energy-based word timing")
+        else:
+            generate_simple_ass(
+                text_to_display, ass_path, font_size=65, total_duration=audio_duration, delay=delay
+            )
+            print("\u26a0\ufe0f No speech detected in Gemini audio, using proportional timing")
         return
 
     except Exception as e:
@@ -306,158 +1405,679 @@ async def generate_tts_gemini(
         raise
 
 
-async def generate_tts_with_subs(
-    text: str,
-    voice: str,
-    audio_path: Path,
-    ass_path: Path,
-    display_text: Optional[str] = None,
-    delay: float = 0.0,
-):
-    """Generate TTS audio with word-level synchronized subtitles.
+class TTSHealth:
+    """Per-backend health of the TTS engines ("gemini", "edge:<voice>").
 
-    Uses edge_tts.Communicate.stream() to capture WordBoundary events,
-    providing millisecond-accurate subtitle timing.
+    Tracks successes, failures and recent latencies. After
+    TTS_BREAKER_FAILURES consecutive failures a backend's breaker opens and
+    the backend is skipped for TTS_BREAKER_COOLDOWN_SECONDS; the first
+    attempt after the cool-down closes it again on success.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.backends = {}
+
+    def _get(self, key: str) -> dict:
+        return self.backends.setdefault(
+            key,
+            {
+                "successes": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "open_until": 0.0,
+                "last_error": None,
+                "latencies": deque(maxlen=50),
+            },
+        )
+
+    def available(self, key: str) -> bool:
+        backend = self.backends.get(key)
+        return backend is None or time.time() >= backend["open_until"]
+
+    def record_success(self, key: str, latency: float):
+        backend = self._get(key)
+        backend["successes"] += 1
+        backend["consecutive_failures"] = 0
+        backend["open_until"] = 0.0
+        backend["latencies"].append(latency)
+
+    def record_failure(self, key: str, error: Exception):
+        backend = self._get(key)
+        backend["failures"] += 1
+        backend["consecutive_failures"] += 1
+        backend["last_error"] = str(error)[:200]
+        if backend["consecutive_failures"] >= self.failure_threshold:
+            backend["open_until"] = time.time() + self.cooldown_seconds
+            print(f"🔌 TTS breaker open for {key} ({self.cooldown_seconds:.0f}s)")
+
+    def stats(self) -> dict:
+        now = time.time()
+        result = {}
+        for key, backend in sorted(self.backends.items()):
+            latencies = sorted(backend["latencies"])
+            result[key] = {
+                "state": "open" if now < backend["open_until"] else "closed",
+                "open_for_seconds": round(max(0.0, backend["open_until"] - now), 1),
+                "successes": backend["successes"],
+                "failures": backend["failures"],
+                "consecutive_failures": backend["consecutive_failures"],
+                "last_error": backend["last_error"],
+                "latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "latency_p95": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            }
+        return result
+
+
+tts_health = TTSHealth(TTS_BREAKER_FAILURES, TTS_BREAKER_COOLDOWN_SECONDS)
+
+_voice_catalog = {"voices": {}, "loaded_at": 0.0, "retry_at": 0.0}
+_voice_catalog_lock = asyncio.Lock()
+
+
+async def get_voice_catalog() -> dict:
+    """Edge TTS voices by ShortName, from memory, then disk, then the network.
+
+    The list is kept VOICE_CATALOG_TTL_SECONDS. If it cannot be loaded an
+    empty dict is returned and loading is retried 5 minutes later.
+    """
+    now = time.time()
+    if _voice_catalog["voices"] and now - _voice_catalog["loaded_at"] < VOICE_CATALOG_TTL_SECONDS:
+        return _voice_catalog["voices"]
+    if now < _voice_catalog["retry_at"]:
+        return _voice_catalog["voices"]
+
+    async with _voice_catalog_lock:
+        if _voice_catalog["voices"] and time.time() - _voice_catalog["loaded_at"] < VOICE_CATALOG_TTL_SECONDS:
+            return _voice_catalog["voices"]
+        catalog_path = CACHE_DIR / "edge_voices.json"
+        try:
+            if catalog_path.exists() and now - catalog_path.stat().st_mtime < VOICE_CATALOG_TTL_SECONDS:
+                voices = json.loads(catalog_path.read_text(encoding="utf-8"))
+                loaded_at = catalog_path.stat().st_mtime
+            else:
+                voices = {
+                    v["ShortName"]: {"Gender": v.get("Gender"), "Locale": v.get("Locale")}
+                    for v in await edge_tts.list_voices()
+                }
+                CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                catalog_path.write_text(json.dumps(voices), encoding="utf-8")
+                loaded_at = time.time()
+                print(f"📚 Loaded Edge TTS voice catalog: {len(voices)} voices")
+            _voice_catalog.update(voices=voices, loaded_at=loaded_at)
+        except Exception as e:
+            print(f"⚠️ Could not load the Edge TTS voice catalog: {e}")
+            _voice_catalog["retry_at"] = time.time() + 300
+    return _voice_catalog["voices"]
+
+
+async def edge_fallback_voices(voice: str) -> list:
+    """Voices to try for an Edge TTS request, best first, known-bad ones skipped.
+
+    The requested voice, then the preferred voices of the same gender, then
+    the other catalog voices of the same locale and gender; voices missing
+    from the catalog are dropped. en-US-JennyNeural is the last resort.
     """
-    # Determine gender of requested voice to choose appropriate fallbacks
-    is_male = any(name in voice for name in ["Remy", "Henri", "Paul"])
+    catalog = await get_voice_catalog()
+    info = catalog.get(voice)
+    if info:
+        is_male = info["Gender"] == "Male"
+    else:
+        is_male = any(name in voice for name in ["Remy", "Henri", "Paul"])
 
     if is_male:
-        fallback_voices = [
-            voice,
-            "fr-FR-RemyMultilingualNeural",
-            "fr-FR-HenriNeural",
-            "fr-FR-PaulNeural",
-        ]
+        voices = [voice, "fr-FR-RemyMultilingualNeural", "fr-FR-HenriNeural", "fr-FR-PaulNeural"]
     else:
-        fallback_voices = [
+        voices = [
             voice,
             "fr-FR-VivienneMultilingualNeural",
             "fr-FR-VivienneNeural",
             "fr-FR-DeniseNeural",
         ]
 
-    fallback_voices.append("en-US-JennyNeural")
-    fallback_voices = list(dict.fromkeys(fallback_voices))
+    if catalog:
+        locale = info["Locale"] if info else "fr-FR"
+        gender = "Male" if is_male else "Female"
+        voices += sorted(
+            name for name, v in catalog.items() if v["Locale"] == locale and v["Gender"] == gender
+        )
+        voices = [v for v in voices if v in catalog]
 
-    last_error = None
+    voices = list(dict.fromkeys(voices))[:MAX_TTS_FALLBACK_VOICES]
+    voices.append("en-US-JennyNeural")
+    voices = list(dict.fromkeys(voices))
+    # Skip voices whose breaker is open, unless that leaves nothing to try
+    return [v for v in voices if tts_health.available(f"edge:{v}")] or voices
 
-    for attempt_voice in fallback_voices:
-        try:
-            print(f"🔊 TTS attempt with voice: {attempt_voice}")
-            communicate = edge_tts.Communicate(text, attempt_voice)
-
-            # Stream audio + word boundaries simultaneously
-            word_boundaries = []
-            audio_chunks = []
-
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_chunks.append(chunk["data"])
-                elif chunk["type"] == "WordBoundary":
-                    # Offsets are in 100-nanosecond ticks, convert to seconds
-                    offset_sec = chunk["offset"] / 10_000_000
-                    duration_sec = chunk["duration"] / 10_000_000
-                    word_boundaries.append(
-                        {
-                            "text": chunk["text"],
-                            "offset": offset_sec,
-                            "duration": duration_sec,
-                        }
-                    )
 
-            # Write audio to file
-            if audio_chunks:
-                with open(audio_path, "wb") as f:
-                    for audio_data in audio_chunks:
-                        f.write(audio_data)
+async def first_successful(candidates: list, attempt: Callable, hedge_after: float):
+    """Run attempt(candidate, first_chunk) for candidates in order until one succeeds.
+
+    attempt sets the first_chunk event when its first audio chunk arrives.
+    When no chunk has arrived hedge_after seconds after a candidate started
+    (0 = never hedge), the same candidate is started once more, on a fresh
+    connection: a slow handshake is retried, a long synthesis is not raced
+    by another voice. The next candidate starts once every attempt of the
+    current one failed. The first success wins and the other attempts are
+    cancelled. Returns (candidate, result); raises if all of them fail.
+    """
+    remaining = list(candidates)
+    pending = {}
+    last_error = None
 
-            if audio_path.exists() and audio_path.stat().st_size > 0:
-                print(f"✅ TTS audio saved: {audio_path.stat().st_size} bytes")
-                print(f"📍 Captured {len(word_boundaries)} word boundaries")
+    def launch(candidate):
+        first_chunk = asyncio.Event()
+        pending[asyncio.create_task(attempt(candidate, first_chunk))] = (candidate, first_chunk)
 
-                # Log a few boundaries for debugging
-                for wb in word_boundaries[:5]:
+    launch(remaining.pop(0))
+    hedged = False
+    try:
+        while pending:
+            timeout = hedge_after if not hedged and hedge_after > 0 else None
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                hedged = True
+                candidate, first_chunk = next(iter(pending.values()))
+                if not first_chunk.is_set():
                     print(
-                        f"   → '{wb['text']}' at {wb['offset']:.2f}s (dur: {wb['duration']:.2f}s)"
+                        f"⏱️ No TTS audio after {hedge_after:.1f}s, "
+                        f"hedging {candidate} on a new connection"
                     )
+                    launch(candidate)
+                continue
+            for task in done:
+                candidate, _ = pending.pop(task)
+                if task.exception() is None:
+                    return candidate, task.result()
+                last_error = task.exception()
+            if not pending and remaining:
+                launch(remaining.pop(0))
+                hedged = False
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    raise Exception(f"All TTS voices failed. Last error: {last_error}")
 
-                # Measure total audio duration via ffprobe for safety
-                audio_duration = None
-                try:
-                    duration_cmd = [
-                        "ffprobe",
-                        "-v",
-                        "error",
-                        "-show_entries",
-                        "format=duration",
-                        "-of",
-                        "default=noprint_wrappers=1:nokey=1",
-                        str(audio_path),
-                    ]
-                    dur_proc = subprocess.run(
-                        duration_cmd, stdout=subprocess.PIPE, text=True
-                    )
-                    audio_duration = float(dur_proc.stdout.strip())
-                    print(f"⏱️ TTS Audio Duration: {audio_duration:.2f}s")
-                except Exception as e:
-                    print(f"⚠️ Could not measure TTS duration: {e}")
-
-                # Use display_text for subtitle content if provided
-                text_to_display = display_text if display_text else text
-
-                if len(word_boundaries) == 0:
-                    print("⚠️ No word boundaries captured, falling back to ffsubsync")
-                    unsynced_srt_path = audio_path.with_suffix(".unsynced.srt")
-                    synced_srt_path = audio_path.with_suffix(".synced.srt")
-                    generate_unsynced_srt(text_to_display, unsynced_srt_path, total_duration=audio_duration)
-                    run_ffsubsync(audio_path, unsynced_srt_path, synced_srt_path)
-                    convert_srt_to_ass(synced_srt_path, ass_path, font_size=65, delay=delay)
-                    print(f"✅ TTS synchronisation completed with ffsubsync fallback")
-                    return
-
-                print("🎯 Using precise word-boundary timing from TTS engine")
-                generate_ass_from_word_boundaries(
-                    word_boundaries,
-                    text_to_display,
-                    ass_path,
-                    font_size=65,
-                    total_duration=audio_duration,
-                    delay=delay,
+
+# Edge TTS streams constant bitrate MP3 (audio-24khz-48kbitrate-mono-mp3)
+EDGE_MP3_BITRATE = 48000
+
+
+def split_sentences(text: str) -> list:
+    """Split text after sentence-ending punctuation, keeping the punctuation."""
+    return [part for part in re.split(r"(?<=[.!?…])\s+", text.strip()) if part]
+
+
+async def stream_edge_tts(
+    text: str, voice: str, dest_path: Path, first_chunk: Optional[asyncio.Event] = None
+) -> list:
+    """Stream one Edge TTS synthesis to dest_path; returns its word boundaries.
+
+    first_chunk is set when the first audio chunk arrives.
+    """
+    communicate = edge_tts.Communicate(text, voice)
+    word_boundaries = []
+    with open(dest_path, "wb") as f:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                if first_chunk is not None:
+                    first_chunk.set()
+                f.write(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                # Offsets are in 100-nanosecond ticks, convert to seconds
+                word_boundaries.append(
+                    {
+                        "text": chunk["text"],
+                        "offset": chunk["offset"] / 10_000_000,
+                        "duration": chunk["duration"] / 10_000_000,
+                    }
                 )
-                print(f"✅ TTS synchronisation completed with word-boundary timing")
-                return
-            else:
-                print(f"⚠️ Audio file empty or missing with voice: {attempt_voice}")
+    return word_boundaries
 
-        except Exception as e:
-            print(f"⚠️ TTS failed with voice {attempt_voice}: {e}")
-            last_error = e
 
-    raise Exception(f"All TTS voices failed. Last error: {last_error}")
+async def synthesize_edge_sentences(
+    text: str, voice: str, audio_path: Path, first_chunk: Optional[asyncio.Event] = None
+) -> list:
+    """Edge TTS for text, one request per sentence with bounded parallelism.
 
+    The MP3 parts are appended into audio_path in order and each part's word
+    boundaries are shifted by the duration of the audio before it (from the
+    part size, the stream being CBR). Returns the merged word boundaries.
+    first_chunk is set by the first part to receive audio.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        return await stream_edge_tts(text, voice, audio_path, first_chunk)
 
-def generate_ass_from_word_boundaries(
-    word_boundaries: list,
-    display_text: str,
+    semaphore = asyncio.Semaphore(max(1, EDGE_TTS_PARALLELISM))
+    part_paths = [
+        audio_path.with_name(f"{audio_path.stem}.part{i:03d}.mp3") for i in range(len(sentences))
+    ]
+
+    async def synthesize_part(sentence: str, part_path: Path) -> list:
+        async with semaphore:
+            return await stream_edge_tts(sentence, voice, part_path, first_chunk)
+
+    try:
+        # A failed sentence cancels the others, and they are awaited before the
+        # parts are removed, so none can write a part file after the cleanup
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [
+                    group.create_task(synthesize_part(sentence, path))
+                    for sentence, path in zip(sentences, part_paths)
+                ]
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+        part_boundaries = [task.result() for task in tasks]
+        word_boundaries = []
+        offset = 0.0
+        with open(audio_path, "wb") as out:
+            for part_path, boundaries in zip(part_paths, part_boundaries):
+                for wb in boundaries:
+                    word_boundaries.append({**wb, "offset": wb["offset"] + offset})
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+                offset += part_path.stat().st_size * 8 / EDGE_MP3_BITRATE
+        print(f"🧩 Edge TTS: {len(sentences)} sentences synthesized in parallel")
+        return word_boundaries
+    finally:
+        for part_path in part_paths:
+            part_path.unlink(missing_ok=True)
+
+
+async def generate_tts_with_subs(
+    text: str,
+    voice: str,
+    audio_path: Path,
     ass_path: Path,
-    font_size: int = 65,
-    total_duration: float = None,
+    display_text: Optional[str] = None,
     delay: float = 0.0,
 ):
-    """Generate ASS subtitles using precise word-level timing from TTS engine.
+    """Generate TTS audio with word-level synchronized subtitles.
 
-    Groups words into readable chunks (~3 words or at punctuation) and uses
-    the real start/end timestamps from the TTS engine for each chunk.
-    Includes karaoke fill tags for word-level visual highlighting.
+    Uses edge_tts.Communicate.stream() to capture WordBoundary events,
+    providing millisecond-accurate subtitle timing. Long captions are split
+    into sentences synthesized concurrently (see synthesize_edge_sentences).
+    Voices come from edge_fallback_voices and are raced with hedged requests
+    (see first_successful). Returns the voice that produced the audio.
     """
-    if not word_boundaries:
-        return
+    fallback_voices = await edge_fallback_voices(voice)
+
+    async def attempt(attempt_voice: str, first_chunk: asyncio.Event) -> tuple:
+        # Each attempt has its own file: hedged attempts of a voice run side by side
+        attempt_path = audio_path.with_name(f"{audio_path.stem}.{uuid.uuid4().hex[:8]}.mp3")
+        backend = f"edge:{attempt_voice}"
+        start = time.time()
+        print(f"🔊 TTS attempt with voice: {attempt_voice}")
+        try:
+            # Audio is streamed to disk, sentence by sentence for long captions
+            word_boundaries = await synthesize_edge_sentences(
+                text, attempt_voice, attempt_path, first_chunk
+            )
+            if not attempt_path.exists() or attempt_path.stat().st_size == 0:
+                raise Exception(f"Audio file empty or missing with voice: {attempt_voice}")
+        except asyncio.CancelledError:
+            attempt_path.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            print(f"⚠️ TTS failed with voice {attempt_voice}: {e}")
+            tts_health.record_failure(backend, e)
+            attempt_path.unlink(missing_ok=True)
+            raise
+        tts_health.record_success(backend, time.time() - start)
+        return attempt_path, word_boundaries
+
+    # Cancelled and failed attempts remove their own file
+    attempt_voice, (attempt_path, word_boundaries) = await first_successful(
+        fallback_voices, attempt, TTS_HEDGE_AFTER_SECONDS
+    )
+    os.replace(attempt_path, audio_path)
 
-    # Group word boundaries into chunks of ~3 words, or split at punctuation
-    chunks = []
-    current_words = []
-    current_boundaries = []
+    print(f"✅ TTS audio saved with {attempt_voice}: {audio_path.stat().st_size} bytes")
+    print(f"📍 Captured {len(word_boundaries)} word boundaries")
+
+    # Log a few boundaries for debugging
+    for wb in word_boundaries[:5]:
+        print(
+            f"   → '{wb['text']}' at {wb['offset']:.2f}s (dur: {wb['duration']:.2f}s)"
+        )
+
+    # Measure total audio duration via ffprobe for safety
+    audio_duration = None
+    try:
+        audio_duration = (await probe_media(audio_path)).duration
+        print(f"⏱️ TTS Audio Duration: {audio_duration:.2f}s")
+    except Exception as e:
+        print(f"⚠️ Could not measure TTS duration: {e}")
+
+    # Use display_text for subtitle content if provided
+    text_to_display = display_text if display_text else text
+
+    if len(word_boundaries) == 0:
+        print("⚠️ No word boundaries captured, falling back to ffsubsync")
+        unsynced_srt_path = audio_path.with_suffix(".unsynced.srt")
+        synced_srt_path = audio_path.with_suffix(".synced.srt")
+        generate_unsynced_srt(text_to_display, unsynced_srt_path, total_duration=audio_duration)
+        await run_ffsubsync(audio_path, unsynced_srt_path, synced_srt_path)
+        convert_srt_to_ass(synced_srt_path, ass_path, font_size=65, delay=delay)
+        print(f"✅ TTS synchronisation completed with ffsubsync fallback")
+        return attempt_voice
+
+    print("🎯 Using precise word-boundary timing from TTS engine")
+    generate_ass_from_word_boundaries(
+        word_boundaries,
+        text_to_display,
+        ass_path,
+        font_size=65,
+        total_duration=audio_duration,
+        delay=delay,
+    )
+    print(f"✅ TTS synchronisation completed with word-boundary timing")
+    return attempt_voice
+
+
+# TTS voice starts this many seconds into the reel (subtitles are shifted too)
+TTS_DELAY = 2.0
+
+
+def resolve_tts_voice(voice: str) -> str:
+    if voice == "male":
+        return "fr-FR-RemyMultilingualNeural"
+    if voice == "female" or not voice:
+        return "fr-FR-VivienneMultilingualNeural"
+    # Note: Gemini voices (fr-FR-Standard-A etc.) are valid Edge voices too,
+    # so we don't check for "Neural" - let edge_tts handle voice resolution
+    return voice
+
+
+def resolve_tts_engine(engine: Optional[str], api_key: Optional[str]) -> str:
+    """Gemini when requested (the default) and an API key is given, else Edge TTS."""
+    return "gemini" if (engine or "gemini") == "gemini" and api_key else "edge"
+
+
+def tts_cache_key(
+    engine: str, voice: str, clean_text: str, display_text: str, delay: float
+) -> str:
+    payload = json.dumps([engine, voice, clean_text, display_text, delay])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """On-disk cache of TTS artifacts (audio + ASS) keyed by tts_cache_key().
+
+    Each entry is a directory <key>/ holding the audio (tts.mp3 or tts.wav)
+    and tts.ass, published with an atomic rename. Entries expire after ttl_seconds and the oldest
+    ones are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, ttl_seconds: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entries(self):
+        entries = []
+        for entry_dir in self.root.iterdir():
+            if entry_dir.is_dir() and not entry_dir.name.startswith("tmp-"):
+                size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, entry_dir in entries:
+            if now - mtime > self.ttl_seconds or total > self.max_bytes:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+                self.counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Path]:
+        if not self.enabled or not re.fullmatch(r"[0-9a-f]{64}", key or ""):
+            return None
+        entry_dir = self.root / key
+        if not entry_dir.is_dir() or self.audio_file(entry_dir) is None:
+            return None
+        if time.time() - entry_dir.stat().st_mtime > self.ttl_seconds:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        # Touch so that recently used entries are evicted last
+        os.utime(entry_dir)
+        return entry_dir
+
+    @staticmethod
+    def audio_file(entry_dir: Path) -> Optional[Path]:
+        for name in ("tts.wav", "tts.mp3"):
+            if (entry_dir / name).exists():
+                return entry_dir / name
+        return None
+
+    def put(self, key: str, audio_path: Path, ass_path: Path):
+        if not self.enabled:
+            return
+        tmp_dir = self.root / f"tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            shutil.copyfile(audio_path, tmp_dir / f"tts{audio_path.suffix}")
+            if ass_path.exists():
+                shutil.copyfile(ass_path, tmp_dir / "tts.ass")
+            os.replace(tmp_dir, self.root / key)
+        except OSError:
+            # Another job stored the same key first
+            pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._evict()
+
+    def stats(self) -> dict:
+        entries = self._entries() if self.enabled else []
+        return {
+            **self.counters,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+tts_cache = TTSCache(CACHE_DIR / "tts", TTS_CACHE_MAX_BYTES, TTS_CACHE_TTL_SECONDS)
+
+
+async def synthesize_tts(
+    text: str,
+    voice: str,
+    engine: str,
+    api_key: Optional[str],
+    audio_path: Path,
+    ass_path: Path,
+    delay: float = TTS_DELAY,
+    token: Optional[str] = None,
+) -> dict:
+    """Produce TTS audio + ASS subtitles for text, going through tts_cache.
+
+    Gemini is used when requested and an API key is given, with Edge TTS as
+    fallback. Gemini audio is WAV and Edge audio MP3, so the audio is written
+    to audio_path with the matching suffix. Returns {"token", "cache",
+    "audio_path", "engine", "voice"}; the token can be passed back as
+    tts_token to reuse the exact same artifacts. A fallback (Edge instead of
+    Gemini, another Edge voice) is cached under the engine and voice that
+    produced it, never under the requested ones.
+    """
+    clean_text = clean_text_for_tts(text)
+    display_text = clean_text_for_display(text)
+    voice = resolve_tts_voice(voice)
+    engine = resolve_tts_engine(engine, api_key)
+    key = tts_cache_key(engine, voice, clean_text, display_text, delay)
+    use_gemini = engine == "gemini" and tts_health.available("gemini")
+
+    if token and token != key:
+        print("⚠️ tts_token does not match the requested text/voice, ignoring it")
+
+    if not clean_text:
+        raise ValueError("TTS text is empty after cleaning")
+
+    cached_dir = tts_cache.get(key)
+    if cached_dir is not None:
+        tts_cache.counters["hits"] += 1
+        print(f"♻️ TTS cache hit ({key[:12]})")
+        cached_audio = tts_cache.audio_file(cached_dir)
+        audio_path = audio_path.with_suffix(cached_audio.suffix)
+        shutil.copyfile(cached_audio, audio_path)
+        if (cached_dir / "tts.ass").exists():
+            shutil.copyfile(cached_dir / "tts.ass", ass_path)
+        return {
+            "token": key,
+            "cache": "hit",
+            "audio_path": audio_path,
+            "engine": engine,
+            "voice": voice,
+        }
+
+    tts_cache.counters["misses"] += 1
+    print(f"🔊 Using voice: {voice} (engine: {engine})")
+
+    # Primary: Gemini TTS. Fallback: Edge TTS
+    if engine == "gemini" and not use_gemini:
+        print("🔌 Gemini TTS breaker is open, using Edge TTS")
+    if use_gemini:
+        gemini_start = time.time()
+        try:
+            await generate_tts_gemini(
+                clean_text,
+                voice,
+                api_key,
+                audio_path.with_suffix(".wav"),
+                ass_path,
+                display_text=display_text,
+                delay=delay,
+            )
+            audio_path = audio_path.with_suffix(".wav")
+            tts_health.record_success("gemini", time.time() - gemini_start)
+            used_engine, used_voice = "gemini", voice
+        except Exception as gemini_err:
+            tts_health.record_failure("gemini", gemini_err)
+            print(f"⚠️ Gemini TTS failed ({gemini_err}), falling back to Edge TTS")
+            used_engine = "edge"
+            used_voice = await generate_tts_with_subs(
+                clean_text,
+                voice,
+                audio_path,
+                ass_path,
+                display_text=display_text,
+                delay=delay,
+            )
+    else:
+        used_engine = "edge"
+        used_voice = await generate_tts_with_subs(
+            clean_text,
+            voice,
+            audio_path,
+            ass_path,
+            display_text=display_text,
+            delay=delay,
+        )
+
+    if (used_engine, used_voice) != (engine, voice):
+        print(f"⚠️ TTS produced by {used_engine}:{used_voice}, cached under that voice only")
+        key = tts_cache_key(used_engine, used_voice, clean_text, display_text, delay)
+    if audio_path.exists() and audio_path.stat().st_size > 0:
+        tts_cache.put(key, audio_path, ass_path)
+    return {
+        "token": key,
+        "cache": "miss",
+        "audio_path": audio_path,
+        "engine": used_engine,
+        "voice": used_voice,
+    }
+
+
+def fill_short_gaps(mask: np.ndarray, max_frames: int) -> np.ndarray:
+    """Set to True the runs of False shorter than max_frames between two True runs."""
+    padded = np.concatenate(([True], mask, [True])).astype(np.int8)
+    edges = np.diff(padded)
+    gap_starts = np.flatnonzero(edges == -1)
+    gap_ends = np.flatnonzero(edges == 1)
+    short = (gap_ends - gap_starts <= max_frames) & (gap_starts > 0) & (gap_ends < len(mask))
+    delta = np.zeros(len(mask) + 1, dtype=np.int32)
+    np.add.at(delta, gap_starts[short], 1)
+    np.add.at(delta, gap_ends[short], -1)
+    return mask | (np.cumsum(delta)[:-1] > 0)
+
+
+def estimate_word_timings(
+    pcm: bytes, sample_rate: int, words: list, hop_seconds: float = 0.01
+) -> list:
+    """Word boundaries (same shape as Edge TTS WordBoundary) from mono s16le PCM.
+
+    Frames of hop_seconds are classified as speech by RMS energy against a
+    threshold between the noise floor and the loud frames; pauses shorter
+    than 120 ms (stops, plosives) count as speech. Words are spread over the
+    voiced time in proportion to their length, so silences fall between
+    words instead of inside them. Returns [] if no speech is found.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    hop = max(1, int(sample_rate * hop_seconds))
+    frame_count = len(samples) // hop
+    if frame_count == 0 or not words:
+        return []
+
+    frames = samples[: frame_count * hop].reshape(frame_count, hop)
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    rms = np.convolve(rms, np.ones(5) / 5, mode="same")  # 50 ms smoothing
+    floor, loud = np.percentile(rms, [10, 95])
+    if loud <= floor:
+        return []
+    speech = fill_short_gaps(rms > floor + 0.1 * (loud - floor), int(0.12 / hop_seconds))
+
+    # Voiced seconds up to the end of each frame
+    voiced = np.cumsum(speech) * hop_seconds
+    # +1 per word for the transition between words
+    weights = np.array([len(word) + 1 for word in words], dtype=np.float64)
+    bounds = np.concatenate(([0.0], np.cumsum(weights))) / weights.sum() * voiced[-1]
+    start_frames = np.searchsorted(voiced, bounds[:-1], side="right")
+    end_frames = np.minimum(np.searchsorted(voiced, bounds[1:], side="left") + 1, frame_count)
+
+    starts = start_frames * hop_seconds
+    ends = np.maximum(end_frames * hop_seconds, starts + hop_seconds)
+    return [
+        {"text": word, "offset": round(float(start), 3), "duration": round(float(end - start), 3)}
+        for word, start, end in zip(words, starts, ends)
+    ]
+
+
+def generate_ass_from_word_boundaries(
+    word_boundaries: list,
+    display_text: str,
+    ass_path: Path,
+    font_size: int = 65,
+    total_duration: float = None,
+    delay: float = 0.0,
+):
+    """Generate ASS subtitles using precise word-level timing from TTS engine.
+
+    Groups words into readable chunks (~3 words or at punctuation) and uses
+    the real start/end timestamps from the TTS engine for each chunk.
+    Includes karaoke fill tags for word-level visual highlighting.
+    """
+    if not word_boundaries:
+        return
+
+    # Group word boundaries into chunks of ~3 words, or split at punctuation
+    chunks = []
+    current_words = []
+    current_boundaries = []
     current_start = word_boundaries[0]["offset"]
 
     for i, wb in enumerate(word_boundaries):
@@ -699,8 +2319,8 @@ def generate_unsynced_srt(text: str, srt_path: Path, total_duration: float = 30.
             f.write(f"{format_srt_time(start)} --> {format_srt_time(end)}\n")
             f.write(f"{chunk}\n\n")
 
-def run_ffsubsync(audio_path: Path, unsynced_srt: Path, synced_srt: Path):
-    print(f"🔄 Running ffsubsync on {audio_path.name}...")
+async def run_ffsubsync_cli(audio_path: Path, unsynced_srt: Path, synced_srt: Path):
+    print(f"🔄 Running ffsubsync CLI on {audio_path.name}...")
     cmd = [
         "ffsubsync",
         str(audio_path),
@@ -708,16 +2328,86 @@ def run_ffsubsync(audio_path: Path, unsynced_srt: Path, synced_srt: Path):
         "-o", str(synced_srt)
     ]
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        proc = await run_process(cmd)
         if proc.returncode == 0:
             print("✅ ffsubsync success")
         else:
-            print(f"⚠️ ffsubsync error: {proc.stderr[:200]}")
+            print(f"⚠️ ffsubsync error: {proc.stderr.decode(errors='replace')[:200]}")
             shutil.copy(unsynced_srt, synced_srt)
     except Exception as e:
         print(f"⚠️ ffsubsync exception: {e}")
         shutil.copy(unsynced_srt, synced_srt)
 
+
+aligner_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_aligner_pool():
+    """Start the warm aligner processes (forkserver: workers never import main.py)."""
+    global aligner_pool
+    if ALIGNER_WORKERS <= 0:
+        return
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["subtitle_aligner"])
+    aligner_pool = ProcessPoolExecutor(
+        max_workers=ALIGNER_WORKERS,
+        mp_context=context,
+        initializer=subtitle_aligner.warm_up,
+    )
+    # Workers start on demand: submit one warm-up each so the first job does not wait
+    for _ in range(ALIGNER_WORKERS):
+        aligner_pool.submit(subtitle_aligner.warm_up)
+    print(f"🧵 Started {ALIGNER_WORKERS} subtitle aligner worker(s)")
+
+
+async def decode_pcm(audio_path: Path, sample_rate: int = ALIGNER_SAMPLE_RATE) -> bytes:
+    """Decode the first audio stream of a file to mono s16le PCM."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", str(audio_path),
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "-",
+    ]
+    proc = await run_process(cmd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"PCM decode failed: {proc.stderr.decode(errors='replace')[-300:]}")
+    return proc.stdout
+
+
+async def run_ffsubsync(audio_path: Path, unsynced_srt: Path, synced_srt: Path):
+    """Align unsynced_srt on the speech of audio_path into synced_srt.
+
+    Runs in the warm aligner pool on audio_path decoded to PCM. Without a
+    pool the ffsubsync CLI is used. On failure the unsynced subtitles are kept.
+    """
+    if aligner_pool is None:
+        return await run_ffsubsync_cli(audio_path, unsynced_srt, synced_srt)
+
+    print(f"🔄 Aligning subtitles on {audio_path.name}...")
+    try:
+        pcm = await decode_pcm(audio_path)
+        result = await asyncio.get_running_loop().run_in_executor(
+            aligner_pool,
+            subtitle_aligner.align_srt,
+            pcm,
+            ALIGNER_SAMPLE_RATE,
+            str(unsynced_srt),
+            str(synced_srt),
+            slot_cpus(),
+        )
+        if result.get("sync_was_successful") and synced_srt.exists():
+            print(f"✅ Subtitles aligned (offset {result['offset_seconds']:.2f}s)")
+        else:
+            print("⚠️ Subtitle alignment found no match, keeping unsynced subtitles")
+            shutil.copy(unsynced_srt, synced_srt)
+    except BrokenProcessPool:
+        print("⚠️ Aligner pool is broken, falling back to the ffsubsync CLI")
+        await run_ffsubsync_cli(audio_path, unsynced_srt, synced_srt)
+    except Exception as e:
+        print(f"⚠️ Subtitle alignment exception: {e}")
+        shutil.copy(unsynced_srt, synced_srt)
+
+
 def parse_srt_time(s: str) -> float:
     s = s.strip()
     parts = s.split(",")
@@ -793,6 +2483,145 @@ class ReelResponse(BaseModel):
     duration: Optional[float] = None
     detail: Optional[str] = None
     processing_stats: Optional[dict] = None
+    output_id: Optional[str] = None
+    download_url: Optional[str] = None
+
+
+def parse_range_header(range_header: Optional[str], file_size: int):
+    """Parse a single "bytes=start-end" Range header.
+
+    Returns (start, end) inclusive, None when the whole file should be sent,
+    or raises HTTPException(416) when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Multiple ranges are not supported, send the whole file
+        return None
+    try:
+        start_str, end_str = spec.split("-", 1)
+        if start_str == "":
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start = max(0, file_size - length)
+            end = file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+            end = min(end, file_size - 1)
+    except ValueError:
+        return None
+
+    if start >= file_size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
+    return start, end
+
+
+def iter_file_range(path: Path, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def video_file_response(
+    path: Path,
+    range_header: Optional[str] = None,
+    headers: Optional[dict] = None,
+    background: Optional[BackgroundTask] = None,
+    media_type: str = "video/mp4",
+) -> StreamingResponse:
+    """Stream an MP4 (or poster) from disk in chunks, honouring a single Range request."""
+    file_size = path.stat().st_size
+    byte_range = parse_range_header(range_header, file_size)
+    response_headers = {"Accept-Ranges": "bytes"}
+    if headers:
+        response_headers.update(headers)
+
+    if byte_range is None:
+        start, end = 0, file_size - 1
+        status_code = 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    response_headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=response_headers,
+        background=background,
+    )
+
+
+def purge_expired_outputs():
+    now = time.time()
+    for entry in [*OUTPUT_DIR.glob("*.mp4"), *OUTPUT_DIR.glob("*.jpg")]:
+        try:
+            if now - entry.stat().st_mtime > OUTPUT_TTL_SECONDS:
+                entry.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def get_output_path(output_id: str, variant: Optional[str] = None) -> Path:
+    # Output ids are uuid4 strings, reject anything else (path traversal)
+    try:
+        uuid.UUID(output_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Output not found")
+    if variant is None:
+        path = OUTPUT_DIR / f"{output_id}.mp4"
+    elif variant in OUTPUT_VARIANTS:
+        path = OUTPUT_DIR / f"{output_id}.{variant}.{OUTPUT_VARIANTS[variant]['format']}"
+    else:
+        raise HTTPException(status_code=404, detail="Output not found")
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Output not found")
+    return path
+
+
+@app.get("/cache/stats")
+def cache_stats(x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    return {
+        "assets": asset_cache.stats(),
+        "tts": tts_cache.stats(),
+        "stabilize": transform_cache.stats(),
+        "mezzanine": mezzanine_cache.stats(),
+        "outro": outro_cache.stats(),
+        "outputs": output_cache.stats(),
+        "probe": {**probe_counters, "entries": len(_probe_cache)},
+    }
+
+
+@app.get("/tts/health")
+def tts_health_status(x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    return {
+        "backends": tts_health.stats(),
+        "voice_catalog": {
+            "voices": len(_voice_catalog["voices"]),
+            "loaded_at": _voice_catalog["loaded_at"] or None,
+        },
+        "hedge_after_seconds": TTS_HEDGE_AFTER_SECONDS,
+    }
 
 
 @app.get("/health")
@@ -802,11 +2631,456 @@ def health_check(x_api_key: str = Header(None)):
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 503 until fonts and the capability registry are ready.
+
+    No API key, so orchestrators can probe it; it exposes nothing sensitive.
+    """
+    body = {
+        "ready": environment["ready"],
+        "from_cache": environment["from_cache"],
+        "capabilities": capabilities.summary()["features"] if capabilities.loaded else {},
+        "font_path": FONT_PATH,
+        "emoji_font": environment["emoji_font"],
+        "steps": environment["steps"],
+        "error": environment["error"],
+    }
+    if environment["ready"]:
+        body["warm_up_seconds"] = round(environment["ready_at"] - environment["started_at"], 3)
+        body["startup_seconds"] = round(environment["ready_at"] - PROCESS_STARTED_AT, 3)
+    return JSONResponse(body, status_code=200 if environment["ready"] else 503)
+
+
 @app.post("/process-reel")
 async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
 
+    try:
+        fingerprint = await request_fingerprint(request)
+        job_id = str(uuid.uuid4())
+        job_dir = TEMP_DIR / job_id
+        job_dir.mkdir()
+
+        return await submit_and_wait(request, job_dir, fingerprint=fingerprint)
+
+    except Exception as e:
+        if "job_dir" in locals():
+            shutil.rmtree(job_dir, ignore_errors=True)
+        return {"success": False, "detail": str(e)}
+
+
+async def save_upload_stream(chunks, dest_path: Path) -> int:
+    """Write an async iterator of byte chunks to dest_path, enforcing MAX_UPLOAD_BYTES.
+
+    Chunks are written as they arrive so peak memory stays at one chunk,
+    whatever the size of the uploaded clip. The content hash is computed on
+    the way and recorded for probe_media().
+    """
+    written = 0
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as f:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if MAX_UPLOAD_BYTES and written > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes",
+                )
+            digest.update(chunk)
+            f.write(chunk)
+    remember_content_hash(dest_path, digest.hexdigest())
+    return written
+
+
+# Form fields next to the video part (the "options" JSON) are kept in memory
+MAX_FORM_FIELD_BYTES = 1024 * 1024
+
+
+def parse_upload_options(options_json: Optional[str]) -> ReelRequest:
+    """ReelRequest from the options sent with an upload, 400 when they are missing or invalid."""
+    if options_json is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Send the options (X-Reel-Options header or an \"options\" part before the video part)",
+        )
+    try:
+        request = ReelRequest.model_validate_json(options_json)
+        check_variants(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid options: {e}")
+    # The uploaded file is the source, ignore any other video source in the options
+    request.video_base64 = None
+    request.video_url = None
+    return request
+
+
+async def iter_multipart_video(
+    http_request: Request, fields: dict, before_video: Callable[[], None] = lambda: None
+):
+    """Yield the "video" part of a multipart/form-data body as it arrives.
+
+    The body is parsed incrementally, so nothing is spooled to disk before
+    save_upload_stream() has checked MAX_UPLOAD_BYTES, and the clip is only
+    written once. The other parts are small text fields, stored in fields;
+    before_video() runs once the fields sent before the video part are
+    parsed, so it can reject the request before any of the video is read.
+    """
+    _, params = parse_options_header(http_request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+
+    part = {"name": None, "header": b"", "value": b"", "headers": {}, "data": []}
+    video_chunks = []
+    seen_video = False
+
+    def on_part_begin():
+        part.update(name=None, headers={}, data=[])
+
+    def on_header_field(data, start, end):
+        part["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header"].lower()] = part["value"]
+        part.update(header=b"", value=b"")
+
+    def on_headers_finished():
+        nonlocal seen_video
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == "options" and seen_video:
+            raise HTTPException(status_code=400, detail="The options part must come before the video part")
+        if part["name"] == "video" and not seen_video:
+            seen_video = True
+            before_video()
+
+    def on_part_data(data, start, end):
+        if part["name"] == "video":
+            video_chunks.append(bytes(data[start:end]))
+            return
+        part["data"].append(bytes(data[start:end]))
+        if sum(len(d) for d in part["data"]) > MAX_FORM_FIELD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Form field '{part['name']}' is too large")
+
+    def on_part_end():
+        if part["name"] and part["name"] != "video":
+            fields[part["name"]] = b"".join(part["data"]).decode("utf-8")
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    async for chunk in http_request.stream():
+        parser.write(chunk)
+        if video_chunks:
+            yield b"".join(video_chunks)
+            video_chunks.clear()
+    parser.finalize()
+    if not seen_video:
+        raise HTTPException(status_code=400, detail="No video file part provided")
+
+
+@app.post("/process-reel-upload")
+async def process_reel_upload(
+    http_request: Request,
+    x_api_key: str = Header(None),
+    x_reel_options: Optional[str] = Header(None),
+):
+    """Binary/multipart variant of /process-reel.
+
+    Accepts either:
+      - a raw body (Content-Type: video/* or application/octet-stream) with the
+        ReelRequest options as JSON in the X-Reel-Options header, or
+      - multipart/form-data with an "options" JSON field followed by a "video"
+        file part (or the options in X-Reel-Options).
+
+    The options are validated before the video is read, which is then
+    streamed to the job directory as it arrives instead of travelling as
+    base64 inside a JSON body.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+    try:
+        job_id = str(uuid.uuid4())
+        job_dir = TEMP_DIR / job_id
+        job_dir.mkdir()
+        input_video_path = job_dir / "input.mp4"
+
+        start_upload = time.time()
+        content_type = http_request.headers.get("content-type", "")
+
+        if content_type.startswith("multipart/form-data"):
+            # Streamed part by part, the size limit applies as the video arrives
+            fields = {}
+            parsed = {}
+
+            def before_video():
+                parsed["request"] = parse_upload_options(fields.get("options") or x_reel_options)
+
+            size = await save_upload_stream(
+                iter_multipart_video(http_request, fields, before_video), input_video_path
+            )
+            request = parsed["request"]
+        else:
+            # The header always arrives before the body: no options means the defaults
+            request = parse_upload_options(x_reel_options or "{}")
+            size = await save_upload_stream(http_request.stream(), input_video_path)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="No video source provided")
+
+        upload_duration = time.time() - start_upload
+        print(f"📥 Upload streamed to disk: {size} bytes in {upload_duration:.2f}s")
+
+        fingerprint = await request_fingerprint(
+            request, source_hash=await content_hash_of(input_video_path)
+        )
+        return await submit_and_wait(
+            request,
+            job_dir,
+            extra_stats={"upload_duration": upload_duration},
+            fingerprint=fingerprint,
+        )
+
+    except HTTPException:
+        # 400 / 413 from the upload itself keep their status code
+        if "job_dir" in locals():
+            shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        if "job_dir" in locals():
+            shutil.rmtree(job_dir, ignore_errors=True)
+        return {"success": False, "detail": str(e)}
+
+
+def required_capabilities(request: ReelRequest) -> tuple:
+    """(filters, encoders) a render of this request needs, stabilization aside."""
+    filters = {"scale", "crop"}
+    encoders = {"libx264", "aac"}
+    if request.color_adjust:
+        filters.add("eq")
+    if request.text and request.draw_text:
+        filters.add("subtitles")
+    if request.watermark_url:
+        filters.add("overlay")
+        if request.store_name and request.enable_ending_effect:
+            filters |= {"subtitles", "color", "setpts"}
+    if request.enable_ending_effect:
+        filters.add("fade")
+    if request.music_url or (request.tts_enabled and request.text):
+        filters |= {"volume", "amix", "afade"}
+    if request.tts_enabled and request.text:
+        filters.add("adelay")
+    return filters, encoders
+
+
+def check_capabilities(request: ReelRequest):
+    """Fail before any download or TTS when this ffmpeg build cannot render request.
+
+    Does nothing while the registry is still being built at startup, the
+    encode then reports the problem as before.
+    """
+    if not capabilities.loaded:
+        return
+    filters, encoders = required_capabilities(request)
+    missing = [f"filter '{f}'" for f in sorted(filters) if not capabilities.has_filter(f)]
+    missing += [f"encoder '{e}'" for e in sorted(encoders) if not capabilities.has_encoder(e)]
+    if missing:
+        raise HTTPException(
+            status_code=501, detail=f"FFmpeg build is missing {', '.join(missing)}"
+        )
+
+
+def video_copy_blockers(request: ReelRequest, info: MediaInfo, has_watermark: bool) -> list:
+    """Reasons the source video stream cannot be copied untouched into the reel.
+
+    Empty when the video chain would be a no-op: the source is already a
+    1080x1920 H.264 yuv420p stream at OUTPUT_FPS and nothing is drawn on it.
+    """
+    blockers = []
+    if request.text and request.draw_text:
+        blockers.append("captions")
+    if has_watermark:
+        blockers.append("watermark")
+    if request.enable_ending_effect:
+        blockers.append("ending_effect")
+    if request.stabilize:
+        blockers.append("stabilize")
+    if request.color_adjust:
+        blockers.append("color_adjust")
+    if request.variants:
+        blockers.append("variants")
+    if info.video_codec != "h264" or info.pix_fmt != "yuv420p":
+        blockers.append("codec")
+    if (info.width, info.height) != REEL_SIZE or info.rotation or not info.square_pixels:
+        blockers.append("geometry")
+    if abs(info.fps - OUTPUT_FPS) > 0.01:
+        blockers.append("fps")
+    return blockers
+
+
+async def copy_video_and_mux_audio(
+    input_args: list,
+    audio_graph: FilterGraph,
+    audio_map: Optional[str],
+    duration: float,
+    output_path: Path,
+    stats: dict,
+    report: Callable[[str, float], None],
+) -> float:
+    """Fast path: keep the source H.264 stream (-c:v copy), only encode the audio."""
+    print("⚡ Video chain is a no-op, copying the video stream")
+    cmd = ["ffmpeg", "-y", *ffmpeg_thread_args(), *input_args]
+    if audio_graph.chains:
+        cmd.extend(["-filter_complex", audio_graph.render()])
+    cmd.extend(["-map", "0:v:0"])
+    if audio_map:
+        cmd.extend(["-map", audio_map, "-c:a", "aac", "-b:a", "128k"])
+    cmd.extend(["-t", str(duration), "-c:v", "copy", "-movflags", "+faststart"])
+    cmd.extend(["-progress", "pipe:1", "-nostats", str(output_path)])
+
+    encoded = {"seconds": 0.0}
+
+    def on_progress(line: str):
+        if line.startswith("out_time_us="):
+            try:
+                encoded["seconds"] = int(line.split("=", 1)[1]) / 1_000_000
+            except ValueError:
+                return
+            if duration > 0:
+                report("encode", 0.4 + 0.55 * min(encoded["seconds"] / duration, 1.0))
+
+    process = await run_process(cmd, on_stdout_line=on_progress)
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg stream copy failed: {process.stderr.decode()}")
+    stats["encoding_profile"] = "copy"
+    stats["video_copy"] = {"used": True}
+    return round(min(encoded["seconds"], duration) or duration, 3)
+
+
+def stabilization_variant() -> Optional[str]:
+    """'vidstab' (two passes), 'deshake' on builds without libvidstab, or None."""
+    if not capabilities.loaded or (
+        capabilities.has_filter("vidstabdetect") and capabilities.has_filter("vidstabtransform")
+    ):
+        return "vidstab"
+    if capabilities.has_filter("deshake"):
+        return "deshake"
+    return None
+
+
+class StageGraph:
+    """Runs named async stages concurrently, each once its dependencies are done.
+
+    Every stage gets wall-clock and child-process CPU timings; stats() also
+    reports the critical path, i.e. the chain of stages that set the total
+    latency, next to the time a strictly sequential run would have taken.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+        self.started_at = time.time()
+
+    def add(self, name: str, fn: Callable, deps: tuple = ()):
+        self.stages[name] = (fn, deps)
+
+    async def run_stage(self, name: str, fn: Callable):
+        counter = [0.0]
+        token = stage_cpu_seconds.set(counter)
+        start = time.time()
+        try:
+            return await fn()
+        finally:
+            stage_cpu_seconds.reset(token)
+            self.timings[name] = {
+                "start": round(start - self.started_at, 3),
+                "wall": round(time.time() - start, 3),
+                "cpu": round(counter[0], 3),
+            }
+
+    async def run(self) -> dict:
+        """Run all added stages and return their results by name.
+
+        The first failure cancels the other stages and is raised.
+        """
+        tasks = {}
+
+        async def run_after_deps(name: str, fn: Callable, deps: tuple):
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+            return await self.run_stage(name, fn)
+
+        for name, (fn, deps) in self.stages.items():
+            tasks[name] = asyncio.create_task(run_after_deps(name, fn, deps))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return dict(zip(tasks, results))
+
+    def stats(self) -> dict:
+        ends = {
+            name: t["start"] + t["wall"] for name, t in self.timings.items()
+        }
+        path = []
+        name = max(ends, key=ends.get) if ends else None
+        while name is not None:
+            path.insert(0, name)
+            deps = [d for d in self.stages.get(name, (None, ()))[1] if d in ends]
+            name = max(deps, key=ends.get) if deps else None
+        return {
+            "stages": self.timings,
+            "critical_path": path,
+            "critical_path_seconds": round(sum(self.timings[n]["wall"] for n in path), 3),
+            "sequential_seconds": round(sum(t["wall"] for t in self.timings.values()), 3),
+            "wall_seconds": round(max(ends.values(), default=0.0), 3),
+        }
+
+
+async def render_reel(
+    request: ReelRequest,
+    job_dir: Path,
+    extra_stats: Optional[dict] = None,
+    on_progress: Optional[Callable[[str, float], None]] = None,
+    fingerprint: Optional[str] = None,
+):
+    """Run the full reel pipeline inside job_dir and return the response dict.
+
+    With a request fingerprint, the output is also stored in output_cache.
+
+    If job_dir/input.mp4 already exists (streamed upload), the video source
+    fields of the request are not used. on_progress(stage, fraction) is called
+    at each stage boundary.
+    """
+
+    check_capabilities(request)
+    check_variants(request)
+    progress_reached = {"value": 0.0}
+
+    def report(stage: str, progress: float):
+        # Stages overlap: only ever move the progress forward
+        if on_progress and progress >= progress_reached["value"]:
+            progress_reached["value"] = progress
+            on_progress(stage, progress)
+
     start_total = time.time()
     stats = {
         "download_duration": 0,
@@ -815,93 +3089,96 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
         "encoding_duration": 0,
         "total_duration": 0,
     }
+    if extra_stats:
+        stats.update(extra_stats)
+
+    input_video_path = job_dir / "input.mp4"
+    input_audio_path = job_dir / "music.mp3"
+    tts_audio_path = job_dir / "tts.mp3"
+    tts_ass_path = job_dir / "tts.ass"
+    output_video_path = job_dir / "output.mp4"
+    watermark_path = job_dir / "watermark.png"
+    variant_paths = {
+        name: job_dir / f"variant_{name}.{OUTPUT_VARIANTS[name]['format']}"
+        for name in request.variants
+    }
 
-    try:
-        job_id = str(uuid.uuid4())
-        job_dir = TEMP_DIR / job_id
-        job_dir.mkdir()
+    # Results shared between the pipeline stages below
+    has_music = has_watermark = has_tts = False
+    input_info = MediaInfo()
+    video_duration = 30.0
+    fade_duration = 2.0
+    fade_start = logo_start_time = 0.0
+    # Stabilization, scale, crop, sharpen and colour, ordered for the source size
+    video_plan: Optional[ReelPlan] = None
+    motion_filter: Optional[str] = None
+    text_filter: Optional[str] = None
+    # Cached mezzanine used as video input, or key to store this render's one under
+    mezzanine_path: Optional[Path] = None
+    mezzanine_store_key: Optional[str] = None
+    # Pre-rendered transparent logo + store name layer, overlaid on the reel's ending
+    outro_path: Optional[Path] = None
+    # Why the source video cannot be stream-copied (empty = copy it)
+    copy_blockers: list = ["not probed"]
+
+    async def download():
+        nonlocal has_music, has_watermark
+        report("download", 0.0)
+        # 1. Save Input Video (already on disk for streamed uploads)
+        downloads = {}
+        if not input_video_path.exists():
+            if request.video_base64:
+                video_bytes = base64.b64decode(request.video_base64)
+                with open(input_video_path, "wb") as f:
+                    f.write(video_bytes)
+                remember_content_hash(input_video_path, hashlib.sha256(video_bytes).hexdigest())
+                del video_bytes
+            elif request.video_url:
+                downloads["video"] = (request.video_url, input_video_path)
+            else:
+                raise HTTPException(status_code=400, detail="No video source provided")
 
-        input_video_path = job_dir / "input.mp4"
-        input_audio_path = job_dir / "music.mp3"
-        tts_audio_path = job_dir / "tts.mp3"
-        tts_ass_path = job_dir / "tts.ass"
-        output_video_path = job_dir / "output.mp4"
-
-        start_step = time.time()
-        # 1. Save Input Video
-        if request.video_base64:
-            with open(input_video_path, "wb") as f:
-                f.write(base64.b64decode(request.video_base64))
-        elif request.video_url:
-            response = requests.get(request.video_url, stream=True)
-            response.raise_for_status()
-            with open(input_video_path, "wb") as f:
-                shutil.copyfileobj(response.raw, f)
-        else:
-            raise HTTPException(status_code=400, detail="No video source provided")
+        # 2. Download video, music and watermark concurrently
+        if request.music_url:
+            downloads["music"] = (request.music_url, input_audio_path)
+        if request.watermark_url:
+            downloads["watermark"] = (request.watermark_url, watermark_path)
 
+        asset_stats = await fetch_assets(downloads)
+        stats["assets"] = asset_stats
+        if "error" in asset_stats.get("video", {}):
+            raise Exception(f"Failed to download video: {asset_stats['video']['error']}")
+
+        # We continue without music / watermark if they failed
+        has_music = "bytes" in asset_stats.get("music", {})
+        has_watermark = "bytes" in asset_stats.get("watermark", {})
+
+    async def probe():
+        nonlocal input_info, video_duration, fade_start, logo_start_time, copy_blockers
         # --- Get Video Duration for Fade Out ---
         try:
-            video_dur_cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                str(input_video_path),
-            ]
-            dur_proc = subprocess.run(video_dur_cmd, stdout=subprocess.PIPE, text=True)
-            video_duration = float(dur_proc.stdout.strip() or 0)
+            input_info = await probe_media(input_video_path)
         except Exception as e:
-            print(f"⚠️ Could not measure original video duration: {e}")
-            video_duration = 30.0  # Fallback
+            print(f"⚠️ Could not probe original video: {e}")
+            input_info = MediaInfo()
+        video_duration = input_info.duration or 30.0  # Fallback
+        stats["input_media"] = input_info.model_dump(
+            include={"duration", "width", "height", "fps", "video_codec", "has_audio"}
+        )
 
-        fade_duration = 2.0
         fade_start = max(0, video_duration - fade_duration)
+        copy_blockers = video_copy_blockers(request, input_info, has_watermark)
 
         # Le logo doit apparaitre à 5 secondes de la fin (3 secondes avant le fondu au noir)
-        logo_start_time = max(0, video_duration - 5.0)
+        logo_start_time = max(0, video_duration - OUTRO_SECONDS)
         print(
             f"🎬 Video Duration: {video_duration:.2f}s | Logo Start: {logo_start_time:.2f}s | Fade Out Start: {fade_start:.2f}s"
         )
 
-        # 2. Download Music (if present)
-        has_music = False
-        if request.music_url:
-            try:
-                # Add User-Agent to avoid 403 on some CDNs
-                headers = {"User-Agent": "Mozilla/5.0"}
-                response = requests.get(request.music_url, headers=headers, stream=True)
-                response.raise_for_status()
-                with open(input_audio_path, "wb") as f:
-                    shutil.copyfileobj(response.raw, f)
-                has_music = True
-            except Exception as e:
-                print(f"Failed to download music: {e}")
-                # We continue without music if it fails
-
-        has_watermark = False
-        if request.watermark_url:
-            try:
-                # Add User-Agent to avoid 403 on some CDNs
-                headers = {"User-Agent": "Mozilla/5.0"}
-                response = requests.get(
-                    request.watermark_url, headers=headers, stream=True
-                )
-                response.raise_for_status()
-                with open(job_dir / "watermark.png", "wb") as f:
-                    shutil.copyfileobj(response.raw, f)
-                has_watermark = True
-            except Exception as e:
-                print(f"Failed to download watermark: {e}")
-
-        stats["download_duration"] = time.time() - start_step
-        start_step = time.time()
-
+    async def tts():
+        nonlocal has_tts, tts_audio_path
+        report("tts", 0.1)
         # 3. Generate TTS (if enabled)
-        has_tts = False
         tts_clean_text = ""
 
         if request.tts_enabled and request.text:
@@ -911,52 +3188,20 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
                 print(f"🔊 TTS enabled. Original: '{request.text}'")
                 print(f"🔊 TTS cleaned: '{tts_clean_text}'")
 
-                # Determine voice
-                voice = request.tts_voice
-                if voice == "male":
-                    voice = "fr-FR-RemyMultilingualNeural"
-                elif voice == "female":
-                    voice = "fr-FR-VivienneMultilingualNeural"
-                elif not voice:
-                    voice = "fr-FR-VivienneMultilingualNeural"
-                # Note: Gemini voices (fr-FR-Standard-A etc.) are valid Edge voices too
-                print(f"🔊 Using voice: {voice}")
-
                 if tts_clean_text:
                     print(f"🔊 Generating TTS audio to: {tts_audio_path}")
-                    engine = request.tts_engine or "gemini"
-
-                    # Primary: Gemini TTS. Fallback: Edge TTS
-                    if engine == "gemini" and request.gemini_api_key:
-                        try:
-                            await generate_tts_gemini(
-                                tts_clean_text,
-                                voice,
-                                request.gemini_api_key,
-                                tts_audio_path,
-                                tts_ass_path,
-                                display_text=clean_text_for_display(request.text),
-                                delay=2.0,
-                            )
-                        except Exception as gemini_err:
-                            print(f"⚠️ Gemini TTS failed ({gemini_err}), falling back to Edge TTS")
-                            await generate_tts_with_subs(
-                                tts_clean_text,
-                                voice,
-                                tts_audio_path,
-                                tts_ass_path,
-                                display_text=clean_text_for_display(request.text),
-                                delay=2.0,
-                            )
-                    else:
-                        await generate_tts_with_subs(
-                            tts_clean_text,
-                            voice,
-                            tts_audio_path,
-                            tts_ass_path,
-                            display_text=clean_text_for_display(request.text),
-                            delay=2.0,
-                        )
+                    tts_result = await synthesize_tts(
+                        request.text,
+                        request.tts_voice,
+                        request.tts_engine,
+                        request.gemini_api_key,
+                        tts_audio_path,
+                        tts_ass_path,
+                        token=request.tts_token,
+                    )
+                    stats["tts_cache"] = tts_result["cache"]
+                    stats["tts_voice"] = f"{tts_result['engine']}:{tts_result['voice']}"
+                    tts_audio_path = tts_result["audio_path"]
 
                     # Verify files were created
                     if tts_audio_path.exists() and tts_audio_path.stat().st_size > 0:
@@ -973,76 +3218,149 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
                 print(f"❌ Failed to generate TTS: {e}")
                 traceback.print_exc()
 
-        stats["tts_duration"] = time.time() - start_step
-        start_step = time.time()
+    async def stabilize():
+        nonlocal video_plan, motion_filter, mezzanine_path, mezzanine_store_key
+        report("stabilize", 0.25)
+        variant = stabilization_variant() if request.stabilize else None
+        source_size = filter_frame_size(input_info)
+
+        def plan(motion: bool, early_scale: bool = True) -> ReelPlan:
+            return plan_reel_video(
+                source_size,
+                REEL_SIZE,
+                motion=motion,
+                sharpen=SHARPEN_FILTER if motion else None,
+                color=COLOR_ADJUST_FILTER if request.color_adjust else None,
+                early_scale=early_scale,
+            )
 
-        # 4. Build FFmpeg Command with Unified filter_complex
-        cmd = ["ffmpeg", "-y", "-i", str(input_video_path)]
+        video_plan = plan(variant is not None)
+
+        # A previous render of this source already stabilized and normalized it
+        # (not needed when the video is copied as-is). With vidstab, the transforms
+        # may not have been rescalable, which stores it under the legacy-order plan
+        if mezzanine_cache.enabled and copy_blockers:
+            plans = [video_plan]
+            if variant == "vidstab" and video_plan.early_scale:
+                plans.append(plan(True, early_scale=False))
+            cached = None
+            for index, candidate in enumerate(plans):
+                cached = mezzanine_cache.get(
+                    await mezzanine_key(input_video_path, variant, candidate),
+                    count_miss=index == len(plans) - 1,
+                )
+                if cached is not None:
+                    break
+            if cached is not None:
+                mezzanine_path = job_dir / "mezzanine.mp4"
+                link_or_copy(cached, mezzanine_path)
+                stats["mezzanine"] = {"cache": "hit"}
+                print("♻️ Normalized mezzanine found in cache, skipping stabilization and scaling")
+                return
 
         # --- Stability Pass 1 (if requested) ---
-        vidstab_filter = ""
-        if request.stabilize:
+        if request.stabilize and variant is None:
+            print("⚠️ No stabilization filter in this FFmpeg build, skipping stabilization")
+            stats["stabilize"] = {"variant": None}
+        elif variant == "deshake":
+            # Single-pass fallback for builds without libvidstab
+            print("📐 vidstab unavailable, stabilizing with deshake")
+            stats["stabilize"] = {"variant": "deshake"}
+            motion_filter = "deshake"
+        elif request.stabilize:
             print("📐 Starting video stabilization (Pass 1: Detection)...")
-            transforms_path = job_dir / "transforms.trf"
-
-            # Run detection pass
-            # Aggressive stabilization settings:
-            # - shakiness=10: Max sensitivity to shake
-            # - accuracy=15: High accuracy
-            # - stepsize=32: Larger search window for bigger shakes
-            detect_cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(input_video_path),
-                "-vf",
-                f"vidstabdetect=stepsize=32:shakiness=10:accuracy=15:result={transforms_path}",
-                "-f",
-                "null",
-                "-",
-            ]
-
-            detect_proc = subprocess.run(
-                detect_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            transforms_path, stats["stabilize"] = await detect_stabilization(
+                input_video_path, input_info, job_dir
             )
-
-            if detect_proc.returncode == 0 and transforms_path.exists():
+            stats["stabilize"]["variant"] = "vidstab"
+
+            if transforms_path is not None and video_plan.early_scale:
+                # The transforms are in source pixels, vidstabtransform runs on the downscaled frames
+                (width, height), (scaled_width, scaled_height) = source_size, video_plan.motion_size
+                scaled_path = job_dir / "transforms_scaled.trf"
+                if rescale_transforms(
+                    transforms_path, scaled_path, scaled_width / width, scaled_height / height
+                ):
+                    transforms_path = scaled_path
+                else:
+                    print("⚠️ Unknown transforms format, stabilizing before the downscale")
+                    video_plan = plan(True, early_scale=False)
+            if transforms_path is not None:
                 print(
-                    "✅ Stabilization Pass 1 complete. Integrating Pass 2 into main filter chain."
+                    f"✅ Stabilization Pass 1 complete ({stats['stabilize']['cache']}, "
+                    f"proxy {stats['stabilize']['proxy']}). Integrating Pass 2 into main filter chain."
                 )
                 # We will add vidstabtransform to the video chain below
-                # smoothing=30 -> Heavy smoothing (default is 10) for handheld feel
-                # relative=1 -> Transforms relative to previous frame
-                # zoom=5 -> Fixed 5% zoom to avoid black borders from stabilization
-                vidstab_filter = f"vidstabtransform=input={transforms_path}:smoothing=30:relative=1:zoom=5,unsharp=5:5:1.0:5:5:0.0,"
+                motion_filter = f"vidstabtransform=input={transforms_path}:{VIDSTAB_TRANSFORM_PARAMS}"
+
+        if motion_filter is None and variant is not None:
+            # The detection failed, nothing to stabilize with
+            video_plan = plan(False)
+        stats["video_plan"] = {
+            "filters": video_plan.filters(motion_filter),
+            "early_scale": video_plan.early_scale,
+            "megapixels_per_frame": round(video_plan.pixel_work() / 1e6, 2),
+        }
+
+        if mezzanine_cache.enabled and copy_blockers:
+            # Keyed by the stabilization actually applied (a failed detection applies none)
+            key = await mezzanine_key(
+                input_video_path, variant if motion_filter else None, video_plan
+            )
+            sightings = mezzanine_cache.sightings(key)
+            stats["mezzanine"] = {"cache": "miss", "sightings": sightings}
+            # A one-off render does not pay for the extra encode
+            if sightings >= MEZZANINE_WRITE_AFTER:
+                mezzanine_store_key = key
+
+    async def subtitles():
+        nonlocal text_filter
+        report("subtitles", 0.3)
+        if request.text and request.draw_text:
+            if has_tts:
+                # Subtitles (TikTok style) using ASS (already generated in TTS block)
+                print(f"🎬 Overlaying subtitles from TTS ASS: {tts_ass_path}")
+                ass_path_str = str(tts_ass_path).replace("\\", "/").replace(":", "\\:")
+                text_filter = f"subtitles='{ass_path_str}'"
             else:
-                print(
-                    f"⚠️ Stabilization Pass 1 failed: {detect_proc.stderr.decode()[:500]}"
-                )
+                # Standard Text (without TTS) synchronisé via ffsubsync
+                print(f"🎬 Overlaying subtitles from standard text using ffsubsync...")
+                unsynced_srt_path = job_dir / "unsynced.srt"
+                synced_srt_path = job_dir / "synced.srt"
+                std_ass_path = job_dir / "std_text.ass"
+
+                # Choose an audio reference
+                ref_audio = input_video_path
+                if has_music and not input_info.has_audio:
+                    ref_audio = input_audio_path
+
+                # Subtitle syncing pipeline
+                generate_unsynced_srt(request.text, unsynced_srt_path, total_duration=video_duration)
+                await run_ffsubsync(ref_audio, unsynced_srt_path, synced_srt_path)
+                convert_srt_to_ass(synced_srt_path, std_ass_path, font_size=40, delay=0.0)
+
+                ass_path_str = str(std_ass_path).replace("\\", "/").replace(":", "\\:")
+                text_filter = f"subtitles='{ass_path_str}'"
+
+    async def outro():
+        nonlocal outro_path
+        if not (
+            has_watermark
+            and request.store_name
+            and request.enable_ending_effect
+            and outro_cache.enabled
+        ):
+            return
+        outro_path, stats["outro"] = await render_outro(
+            watermark_path, request.store_name, job_dir
+        )
 
-        stats["stabilize_duration"] = time.time() - start_step
-        start_step = time.time()
+    async def encode():
+        report("encode", 0.4)
+        input_args = ["-i", str(input_video_path)]
 
         # --- Audio Checks ---
-        has_original_audio = False
-        try:
-            probe_cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-select_streams",
-                "a:0",
-                "-show_entries",
-                "stream=codec_type",
-                "-of",
-                "csv=p=0",
-                str(input_video_path),
-            ]
-            probe_out = subprocess.check_output(probe_cmd).decode().strip()
-            if probe_out == "audio":
-                has_original_audio = True
-        except Exception:
-            pass
+        has_original_audio = input_info.has_audio
 
         # --- Inputs ---
         # 0: Video (already added)
@@ -1054,87 +3372,126 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
         tts_idx = -1
 
         if has_music:
-            cmd.extend(["-i", str(input_audio_path)])
+            input_args.extend(["-i", str(input_audio_path)])
             music_idx = input_count
             input_count += 1
 
         if has_tts:
-            cmd.extend(["-i", str(tts_audio_path)])
+            input_args.extend(["-i", str(tts_audio_path)])
             tts_idx = input_count
             input_count += 1
 
         watermark_idx = -1
         if has_watermark:
-            cmd.extend(["-i", str(job_dir / "watermark.png")])
+            input_args.extend(["-i", str(watermark_path)])
             watermark_idx = input_count
             input_count += 1
 
-        # --- Filter Complex Construction ---
-        fc_parts = []
-
-        # A. Video Chain
-        # Chain: [0:v] -> [stabilize] -> [scale/crop] -> [text] -> [vout]
-
-        # 1. Stabilization (if enabled) + Scaling/Cropping
-        # We apply stabilization FIRST on raw video, THEN crop to 9:16
-
-        # Start of video chain
-        v_chain = "[0:v]"
-
-        if vidstab_filter:
-            v_chain += vidstab_filter
-            # Note: vidstabtransform output is same res as input
+        outro_idx = -1
+        if outro_path is not None:
+            input_args.extend(["-i", str(outro_path)])
+            outro_idx = input_count
+            input_count += 1
 
-        # Scale & Crop to Fill 1080x1920 (Vertical Reel)
-        # Then enhance brightness/contrast slightly for Facebook optimization
-        v_chain += "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,eq=brightness=0.05:contrast=1.1"
+        mezzanine_idx = -1
+        if mezzanine_path is not None:
+            # Video comes from the mezzanine, input 0 is only read for its audio
+            input_args.extend(["-i", str(mezzanine_path)])
+            mezzanine_idx = input_count
+            input_count += 1
 
-        # 2. Text Overlay
-        if request.text and request.draw_text:
-            text_filter = ""
-            if has_tts:
-                # Subtitles (TikTok style) using ASS (already generated in TTS block)
-                print(f"🎬 Overlaying subtitles from TTS ASS: {tts_ass_path}")
-                ass_path_str = str(tts_ass_path).replace("\\", "/").replace(":", "\\:")
-                text_filter = f",subtitles='{ass_path_str}'"
-            else:
-                # Standard Text (without TTS) synchronisé via ffsubsync
-                print(f"🎬 Overlaying subtitles from standard text using ffsubsync...")
-                unsynced_srt_path = job_dir / "unsynced.srt"
-                synced_srt_path = job_dir / "synced.srt"
-                std_ass_path = job_dir / "std_text.ass"
-                
-                # Choose an audio reference
-                ref_audio = input_video_path
-                if has_music and not has_original_audio:
-                    ref_audio = input_audio_path
+        use_segments = (
+            request.segmented_encoding
+            and ENCODE_SEGMENTS > 1
+            and video_duration >= 2 * SEGMENT_MIN_SECONDS
+        )
+        if use_segments and motion_filter:
+            # vidstabtransform indexes transforms by frame number from the start
+            print("⚠️ Segmented encoding is not available with stabilization, using a single encode")
+            use_segments = False
+        if use_segments and request.variants:
+            print("⚠️ Segmented encoding does not produce variants, using a single encode")
+            use_segments = False
+        if use_segments and outro_idx >= 0:
+            # Segments seek input 0 and the mezzanine, not the outro layer
+            print("⚠️ Segmented encoding is not available with the outro, using a single encode")
+            use_segments = False
+        # The mezzanine is written by the single encode, next to the reel
+        write_mezzanine = mezzanine_store_key is not None and not use_segments
 
-                # Subtitle syncing pipeline
-                generate_unsynced_srt(request.text, unsynced_srt_path, total_duration=video_duration)
-                run_ffsubsync(ref_audio, unsynced_srt_path, synced_srt_path)
-                convert_srt_to_ass(synced_srt_path, std_ass_path, font_size=40, delay=0.0)
+        # --- Filter Complex Construction ---
+        # Video and audio graphs are kept apart so segmented encoding can run them separately
+        video_graph = FilterGraph()
+        audio_graph = FilterGraph()
 
-                ass_path_str = str(std_ass_path).replace("\\", "/").replace(":", "\\:")
-                text_filter = f",subtitles='{ass_path_str}'"
+        # A. Video Chain
+        # Chain: [0:v] -> [stabilize/scale/crop/sharpen/colour] -> [text] -> [vout]
+        # video_plan orders the normalization so that stabilization and sharpening
+        # run on downscaled frames rather than on the full source resolution
+        if mezzanine_idx >= 0:
+            # Already stabilized, scaled and colour-adjusted
+            v_chain = video_graph.chain([f"{mezzanine_idx}:v"])
+        elif write_mezzanine:
+            video_graph.chain(
+                ["0:v"], video_plan.filters(motion_filter) + ["split=2"], ["vbase", "vmezz"]
+            )
+            v_chain = video_graph.chain(["vbase"])
+        else:
+            v_chain = video_graph.chain(["0:v"], video_plan.filters(motion_filter))
 
-            # Combine formatting + text
-            v_chain += text_filter
+        # 2. Text Overlay (subtitles prepared by the subtitles stage)
+        if text_filter:
+            v_chain.filters.append(text_filter)
 
         if has_watermark:
-            if request.store_name and request.enable_ending_effect:
+            if outro_idx >= 0:
+                # Small logo bottom right until logo_start_time, then the cached
+                # layer (large logo, store name) over the video's last seconds
+                video_graph.chain([f"{watermark_idx}:v"], ["scale=200:-1"], ["wm"])
+                v_chain = video_graph.then(
+                    v_chain,
+                    "v_pre_small",
+                    [f"overlay=W-w-20:H-h-20:enable='between(t,0,{logo_start_time})'"],
+                    extra_inputs=["wm"],
+                )
+                video_graph.chain(
+                    [f"{outro_idx}:v"],
+                    [f"setpts=PTS-STARTPTS+{logo_start_time}/TB"],
+                    ["v_outro"],
+                )
+                v_chain = video_graph.then(
+                    v_chain,
+                    "v_pre_outro",
+                    ["overlay=0:0:eof_action=pass"],
+                    extra_inputs=["v_outro"],
+                )
+            elif request.store_name and request.enable_ending_effect:
                 # Ouro Party Mode + Persistent bottom right
-                
-                # We need two scaled versions of the logo
+
+                # We need two scaled versions of the logo (the input is read twice)
                 # [wm_small]: Bottom right persistent logo
-                fc_parts.append(f"[{watermark_idx}:v]scale=200:-1,split=2[wm_small_base][wm_large_base]")
-                fc_parts.append(f"[wm_large_base]scale=-1:300[wm_large]")
+                video_graph.chain([f"{watermark_idx}:v"], ["scale=200:-1"], ["wm_small_base"])
+                video_graph.chain([f"{watermark_idx}:v"], ["scale=-1:300"], ["wm_large"])
 
                 # 1. Place small logo in bottom right until logo_start_time (5s before the end)
-                v_chain += f"[v_pre_small];[v_pre_small][wm_small_base]overlay=W-w-20:H-h-20:enable='between(t,0,{logo_start_time})'"
-                
+                v_chain = video_graph.then(
+                    v_chain,
+                    "v_pre_small",
+                    [f"overlay=W-w-20:H-h-20:enable='between(t,0,{logo_start_time})'"],
+                    extra_inputs=["wm_small_base"],
+                )
+
                 # 2. Place large logo in the center, and fading it IN during the last 5 seconds
-                v_chain += f"[v_pre_large];[v_pre_large][wm_large]overlay=(W-w)/2:(H-h)/2-100:enable='between(t,{logo_start_time},{video_duration})'"
-                
+                v_chain = video_graph.then(
+                    v_chain,
+                    "v_pre_large",
+                    [
+                        "overlay=(W-w)/2:(H-h)/2-100:"
+                        f"enable='between(t,{logo_start_time},{video_duration})'"
+                    ],
+                    extra_inputs=["wm_large"],
+                )
+
                 # 3. Drawing the Store Name below the logo using ASS subtitles
                 outro_ass_path = job_dir / "outro.ass"
                 generate_outro_ass(
@@ -1143,26 +3500,25 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
                 ass_path_str_2 = (
                     str(outro_ass_path).replace("\\", "/").replace(":", "\\:")
                 )
-                v_chain += f",subtitles='{ass_path_str_2}'"
+                v_chain.filters.append(f"subtitles='{ass_path_str_2}'")
             else:
                 # Normal watermark (bottom right)
-                fc_parts.append(f"[{watermark_idx}:v]scale=200:-1[wm]")
-                v_chain += "[v_pre_wm];[v_pre_wm][wm]overlay=W-w-20:H-h-20"
+                video_graph.chain([f"{watermark_idx}:v"], ["scale=200:-1"], ["wm"])
+                v_chain = video_graph.then(
+                    v_chain, "v_pre_wm", ["overlay=W-w-20:H-h-20"], extra_inputs=["wm"]
+                )
 
         # Add Video Fade Out
         if request.enable_ending_effect:
-            v_chain += f",fade=t=out:st={fade_start}:d={fade_duration}"
+            v_chain.filters.append(f"fade=t=out:st={fade_start}:d={fade_duration}")
 
 
-        # End of video chain
-        v_chain += "[vout]"
-        fc_parts.append(v_chain)
+        # End of video chain (its output label is set when the command is built)
 
         # B. Audio Chain
         audio_mapped = False
 
-        inputs_for_mix = 0
-        audio_mix_str = ""
+        mix_inputs = []
 
         # Strategy:
         # If no music and no TTS -> Copy original audio (if exists) or silent
@@ -1175,25 +3531,27 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
 
             if has_music:
                 # Adjust volume
-                fc_parts.append(
-                    f"[{music_idx}:a]volume={request.music_volume}[a_music]"
+                audio_graph.chain(
+                    [f"{music_idx}:a"], [f"volume={request.music_volume}"], ["a_music"]
                 )
-                audio_mix_str += "[a_music]"
-                inputs_for_mix += 1
+                mix_inputs.append("a_music")
 
             if has_tts:
                 # TTS louder and delayed by 2 seconds (2s) on all channels
-                fc_parts.append(f"[{tts_idx}:a]adelay=2s:all=1,volume=1.5[a_tts]")
-                audio_mix_str += "[a_tts]"
-                inputs_for_mix += 1
-
-            # Mix
-            if inputs_for_mix > 0:
-                fc_parts.append(
-                    f"{audio_mix_str}amix=inputs={inputs_for_mix}:duration=first:dropout_transition=2:normalize=0[amixout]"
+                audio_graph.chain(
+                    [f"{tts_idx}:a"], [f"adelay={TTS_DELAY}s:all=1", "volume=1.5"], ["a_tts"]
                 )
-                fc_parts.append(
-                    f"[amixout]afade=t=out:st={fade_start}:d={fade_duration}[aout]"
+                mix_inputs.append("a_tts")
+
+            # Mix, then fade out in the same chain
+            if mix_inputs:
+                audio_graph.chain(
+                    mix_inputs,
+                    [
+                        f"amix=inputs={len(mix_inputs)}:duration=first:dropout_transition=2:normalize=0",
+                        f"afade=t=out:st={fade_start}:d={fade_duration}",
+                    ],
+                    ["aout"],
                 )
                 audio_mapped = True
         else:
@@ -1203,107 +3561,1182 @@ async def process_reel(request: ReelRequest, x_api_key: str = Header(None)):
             audio_mapped = False
 
 
-        # Apply Filter Complex
-        cmd.extend(["-filter_complex", ";".join(fc_parts)])
-
-        # Maps
-        cmd.extend(["-map", "[vout]"])  # Map processed video
-
         if audio_mapped:
-            cmd.extend(["-map", "[aout]"])  # Map mixed audio
+            audio_map = "[aout]"  # Map mixed audio
         elif has_original_audio:
-            cmd.extend(["-map", "0:a"])  # Map original audio directly
+            audio_map = "0:a"  # Map original audio directly
+        else:
+            audio_map = None
 
-        # Cut EXACTLY at video length (better than -shortest which can cause issues with amix)
-        cmd.extend(["-t", str(video_duration)])
+        if not copy_blockers:
+            audio_graph.validate(input_count, [audio_map] if audio_map else [])
+            return await copy_video_and_mux_audio(
+                input_args, audio_graph, audio_map, video_duration, output_video_path, stats, report
+            )
+        stats["video_copy"] = {"used": False, "blocked_by": copy_blockers}
 
         # Quality settings
-        cmd.extend(
-            [
-                "-c:v",
-                "libx264",
-                "-profile:v",
-                "high",
-                "-r",
-                "30",
-                "-preset",
-                "slow",
-                "-level",
-                "4.1",
-                "-crf",
-                "18",
-                "-b:v",
-                "10M",
-                "-maxrate",
-                "12M",
-                "-bufsize",
-                "20M",
-                "-c:a",
-                "aac",
-                "-b:a",
-                "128k",
-                "-pix_fmt",
-                "yuv420p",
-                "-movflags",
-                "+faststart",
-            ]
+        encoding_profile = select_encoding_profile(
+            request, job_queue.qsize() if job_queue is not None else 0
         )
+        stats["encoding_profile"] = encoding_profile
+        slot = current_render_slot.get()
+        if slot is not None:
+            stats["render_slot"] = {"slot": slot.id, "cpus": slot.cpus, "threads": slot.threads}
+        if encoding_profile != (request.encoding_profile or DEFAULT_ENCODING_PROFILE):
+            print(f"⚡ Queue busy, encoding profile downgraded to '{encoding_profile}'")
+
+        def on_encode_fraction(done: float):
+            report("encode", 0.4 + 0.55 * min(max(done, 0.0), 1.0))
+
+        if use_segments:
+            stats.update(
+                await encode_segmented(
+                    input_args,
+                    video_graph,
+                    audio_graph,
+                    audio_map,
+                    video_duration,
+                    encoding_profile,
+                    job_dir,
+                    output_video_path,
+                    on_progress=on_encode_fraction,
+                    seek_inputs=(0, mezzanine_idx) if mezzanine_idx >= 0 else (0,),
+                )
+            )
+            return round(video_duration, 3)
+        else:
+            cmd = ["ffmpeg", "-y", *ffmpeg_thread_args(), *input_args]
+
+            # Variants: the finished stream is split once and every rendition
+            # is encoded by this same process, the inputs are decoded only once
+            mp4_variants = [n for n in request.variants if OUTPUT_VARIANTS[n]["format"] == "mp4"]
+            encoders = 1 + len(mp4_variants)
+            if request.variants:
+                poster_at = min(POSTER_AT_SECONDS, video_duration / 2)
+                v_chain.outputs = ["vmain"]
+                variant_filter_graph(video_graph, request.variants, poster_at)
+            else:
+                v_chain.outputs = ["vout"]
+            # A filter output can only be mapped once, split the mixed audio per MP4
+            audio_maps = [audio_map] * encoders
+            if audio_map == "[aout]" and encoders > 1:
+                audio_maps = [f"[aout_{i}]" for i in range(encoders)]
+                audio_graph.chain(
+                    ["aout"], [f"asplit={encoders}"], [f"aout_{i}" for i in range(encoders)]
+                )
 
-        cmd.append(str(output_video_path))
-        print(f"🚀 Executing FFmpeg command: {' '.join(cmd)}")
-
-        # execute
-        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Apply Filter Complex (checked first: a miswired label fails here, not in ffmpeg)
+            graph = video_graph.merged(audio_graph)
+            mapped = ["[vout]", *(f"[vo_{name}]" for name in request.variants)]
+            mapped += [label for label in audio_maps if label]
+            if write_mezzanine:
+                mapped.append("[vmezz]")
+            graph.validate(input_count, mapped)
+            cmd.extend(["-filter_complex", graph.render()])
+
+            def mp4_output_args(video_label: str, audio_label: Optional[str], profile: str) -> list:
+                args = ["-map", video_label]
+                if audio_label:
+                    args.extend(["-map", audio_label])
+                # Cut EXACTLY at video length (better than -shortest which can cause issues with amix)
+                args.extend(["-t", str(video_duration)])
+                args.extend(video_encoding_args(profile))
+                args.extend(encoder_thread_args(encoders + write_mezzanine))
+                args.extend(
+                    [
+                        "-c:a",
+                        "aac",
+                        "-b:a",
+                        "128k",
+                        "-pix_fmt",
+                        "yuv420p",
+                        "-movflags",
+                        "+faststart",
+                    ]
+                )
+                return args
 
-        # Log detailed output on failure OR success for debugging font issues
-        if process.returncode != 0:
-            print(f"❌ FFmpeg failed. Stderr:\n{process.stderr.decode()}")
-        else:
-            # Check stderr for font warnings even on success
-            stderr_last_lines = "\n".join(process.stderr.decode().splitlines()[-20:])
-            print(f"✅ FFmpeg executed. Stderr (last 20 lines):\n{stderr_last_lines}")
+            # Machine-readable progress on stdout, used to report encode progress
+            cmd.extend(["-progress", "pipe:1", "-nostats"])
 
-        stats["encoding_duration"] = time.time() - start_step
-        stats["total_duration"] = time.time() - start_total
+            cmd.extend(mp4_output_args("[vout]", audio_maps[0], encoding_profile))
+            cmd.append(str(output_video_path))
 
-        if process.returncode != 0:
-            raise Exception(f"FFmpeg encoding failed: {process.stderr.decode()}")
+            for name in request.variants:
+                spec = OUTPUT_VARIANTS[name]
+                if spec["format"] == "jpg":
+                    cmd.extend(["-map", f"[vo_{name}]", "-frames:v", "1", "-q:v", "3"])
+                else:
+                    audio_label = audio_maps[1 + mp4_variants.index(name)]
+                    cmd.extend(
+                        mp4_output_args(
+                            f"[vo_{name}]", audio_label, spec["profile"] or encoding_profile
+                        )
+                    )
+                cmd.append(str(variant_paths[name]))
+
+            mezzanine_out = job_dir / "mezzanine_out.mp4"
+            if write_mezzanine:
+                cmd.extend(["-map", "[vmezz]", *mezzanine_encoding_args(encoders + 1)])
+                cmd.append(str(mezzanine_out))
+            print(f"🚀 Executing FFmpeg command: {' '.join(cmd)}")
+
+            encoded = {"seconds": 0.0}
+
+            def on_encode_progress(line: str):
+                # out_time_us is the current output timestamp in microseconds
+                if line.startswith("out_time_us="):
+                    try:
+                        encoded["seconds"] = int(line.split("=", 1)[1]) / 1_000_000
+                    except ValueError:
+                        return
+                    if video_duration > 0:
+                        on_encode_fraction(encoded["seconds"] / video_duration)
+
+            # execute
+            process = await run_process(cmd, on_stdout_line=on_encode_progress)
+
+            # Log detailed output on failure OR success for debugging font issues
+            if process.returncode != 0:
+                print(f"❌ FFmpeg failed. Stderr:\n{process.stderr.decode()}")
+            else:
+                # Check stderr for font warnings even on success
+                stderr_last_lines = "\n".join(process.stderr.decode().splitlines()[-20:])
+                print(f"✅ FFmpeg executed. Stderr (last 20 lines):\n{stderr_last_lines}")
+
+            if process.returncode != 0:
+                raise Exception(f"FFmpeg encoding failed: {process.stderr.decode()}")
+
+            if write_mezzanine and mezzanine_out.exists():
+                stats["mezzanine"]["bytes"] = mezzanine_out.stat().st_size
+                mezzanine_cache.put(mezzanine_store_key, mezzanine_out, move=True)
+
+            if request.variants:
+                stats["variants"] = {}
+                for name, path in variant_paths.items():
+                    spec = OUTPUT_VARIANTS[name]
+                    size = path.stat().st_size if path.exists() else 0
+                    variant_stats = {
+                        "format": spec["format"],
+                        "width": spec["width"],
+                        "height": spec["height"],
+                        "bytes": size,
+                    }
+                    if spec["format"] == "mp4":
+                        variant_stats["profile"] = spec["profile"] or encoding_profile
+                        variant_stats["kbps"] = round(size * 8 / 1000 / max(video_duration, 0.001))
+                    else:
+                        variant_stats["at_seconds"] = round(poster_at, 3)
+                    stats["variants"][name] = variant_stats
+
+            # 4. Output duration: last timestamp reported by the encoder, bounded by -t
+            return round(min(encoded["seconds"], video_duration) or video_duration, 3)
+
+    # Stage graph: TTS (network) runs alongside the download and the
+    # stabilization detection (CPU); subtitles wait for TTS to know if
+    # ffsubsync is needed; the encode waits for everything
+    graph = StageGraph()
+    graph.add("download", download)
+    graph.add("probe", probe, deps=("download",))
+    graph.add("tts", tts)
+    graph.add("stabilize", stabilize, deps=("probe",))
+    graph.add("subtitles", subtitles, deps=("probe", "tts"))
+    graph.add("outro", outro, deps=("probe",))
+    graph.add("encode", encode, deps=("stabilize", "subtitles", "outro"))
+    duration = (await graph.run())["encode"]
+
+    stage_stats = graph.stats()
+    walls = {name: t["wall"] for name, t in stage_stats["stages"].items()}
+    stats["download_duration"] = walls["download"] + walls["probe"]
+    stats["tts_duration"] = walls["tts"]
+    stats["stabilize_duration"] = walls["stabilize"]
+    stats["encoding_duration"] = walls["encode"]
+    stats["total_duration"] = time.time() - start_total
+    stats["pipeline"] = stage_stats
+
+    print(f"📊 Processing Stats: {stats}")
+    report("finalize", 0.95)
+
+    # A render downgraded on a busy queue is not what the fingerprint asked for:
+    # it is only handed to the identical requests already waiting for it
+    requested_profile = request.encoding_profile or DEFAULT_ENCODING_PROFILE
+    downgraded = stats.get("encoding_profile", requested_profile) not in (requested_profile, "copy")
+    if fingerprint is not None and output_cache.enabled:
+        stats["output_cache"] = "miss"
+        output_cache.put(
+            fingerprint, output_video_path, variant_paths, duration, stats, reusable=not downgraded
+        )
 
-        # 4. Get Duration (ffprobe)
-        duration_cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(output_video_path),
-        ]
-        dur_proc = subprocess.run(duration_cmd, stdout=subprocess.PIPE)
-        duration = float(dur_proc.stdout.decode().strip() or 0)
+    return deliver_output(request, job_dir, output_video_path, variant_paths, duration, stats)
 
-        # 5. Read Output
-        with open(output_video_path, "rb") as f:
-            out_bytes = f.read()
-            out_b64 = base64.b64encode(out_bytes).decode("utf-8")
 
-        # Cleanup
+def deliver_output(
+    request: ReelRequest,
+    job_dir: Path,
+    output_video_path: Path,
+    variant_paths: dict,
+    duration: float,
+    stats: dict,
+):
+    """Response for request.output_mode from the rendered files; job_dir is removed."""
+    # 5. Return Output
+    variants = {}
+    if request.output_mode in ("file", "handle"):
+        # Keep the MP4 on disk instead of loading it in memory
+        purge_expired_outputs()
+        output_id = job_dir.name
+        stored_path = OUTPUT_DIR / f"{output_id}.mp4"
+        shutil.move(str(output_video_path), stored_path)
+        # Variants are always kept as handles, even when the reel is streamed back
+        for name, path in variant_paths.items():
+            shutil.move(str(path), OUTPUT_DIR / f"{output_id}.{name}.{OUTPUT_VARIANTS[name]['format']}")
+            variants[name] = {
+                "download_url": f"/outputs/{output_id}/{name}",
+                "stats": stats["variants"][name],
+            }
         shutil.rmtree(job_dir)
 
-        print(f"📊 Processing Stats: {stats}")
+        if request.output_mode == "file":
+            headers = {
+                "X-Reel-Duration": str(duration),
+                "X-Encoding-Profile": str(stats.get("encoding_profile")),
+                "X-Processing-Stats": json.dumps(stats),
+            }
+            if variants:
+                headers["X-Output-Variants"] = json.dumps(
+                    {name: v["download_url"] for name, v in variants.items()}
+                )
+            return video_file_response(
+                stored_path,
+                headers=headers,
+                background=BackgroundTask(stored_path.unlink, missing_ok=True),
+            )
 
-        return {
+        response = {
             "success": True,
-            "output_base64": out_b64,
+            "output_id": output_id,
+            "download_url": f"/outputs/{output_id}",
             "duration": duration,
+            "encoding_profile": stats.get("encoding_profile"),
             "processing_stats": stats,
         }
+        if variants:
+            response["variants"] = variants
+        return response
+
+    with open(output_video_path, "rb") as f:
+        out_bytes = f.read()
+        out_b64 = base64.b64encode(out_bytes).decode("utf-8")
+    for name, path in variant_paths.items():
+        variants[name] = {
+            "output_base64": base64.b64encode(path.read_bytes()).decode("utf-8"),
+            "stats": stats["variants"][name],
+        }
+
+    # Cleanup
+    shutil.rmtree(job_dir)
+
+    response = {
+        "success": True,
+        "output_base64": out_b64,
+        "duration": duration,
+        "encoding_profile": stats.get("encoding_profile"),
+        "processing_stats": stats,
+    }
+    if variants:
+        response["variants"] = variants
+    return response
+
+
+@app.get("/outputs/{output_id}")
+def download_output(
+    output_id: str, x_api_key: str = Header(None), range: Optional[str] = Header(None)
+):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    return video_file_response(get_output_path(output_id), range_header=range)
+
+
+@app.get("/outputs/{output_id}/{variant}")
+def download_output_variant(
+    output_id: str,
+    variant: str,
+    x_api_key: str = Header(None),
+    range: Optional[str] = Header(None),
+):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    path = get_output_path(output_id, variant)
+    media_type = "image/jpeg" if path.suffix == ".jpg" else "video/mp4"
+    return video_file_response(path, range_header=range, media_type=media_type)
+
+
+@app.delete("/outputs/{output_id}")
+def delete_output(output_id: str, x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    output_path = get_output_path(output_id)
+    for variant_path in OUTPUT_DIR.glob(f"{output_id}.*.*"):
+        variant_path.unlink(missing_ok=True)
+    output_path.unlink(missing_ok=True)
+    return {"success": True}
+
+
+def plan_segments(duration: float, max_segments: int, min_seconds: float) -> list:
+    """Split [0, duration) into (start, end) pieces aligned on the output frame grid."""
+    total_frames = max(1, round(duration * OUTPUT_FPS))
+    count = max(1, min(max_segments, int(duration // max(min_seconds, 1e-3))))
+    frames_per_segment = -(-total_frames // count)  # ceil
+    segments = []
+    for first in range(0, total_frames, frames_per_segment):
+        last = min(first + frames_per_segment, total_frames)
+        end = duration if last == total_frames else last / OUTPUT_FPS
+        segments.append((first / OUTPUT_FPS, end))
+    return segments
+
+
+async def encode_segmented(
+    input_args: list,
+    video_graph: FilterGraph,
+    audio_graph: FilterGraph,
+    audio_map: Optional[str],
+    duration: float,
+    encoding_profile: str,
+    job_dir: Path,
+    output_path: Path,
+    on_progress: Optional[Callable[[float], None]] = None,
+    seek_inputs: tuple = (0,),
+) -> dict:
+    """Encode the reel as parallel segments, then join them without re-encoding.
+
+    Each segment runs the complete video graph on the source seeked near its
+    start with -copyts, so fades, overlay enable= windows and subtitles see
+    the same timestamps as in a single encode. fps + trim then cut exactly
+    on the output frame grid. Audio is mixed once for the full duration and
+    muxed with the concatenated video (-c copy). seek_inputs are the indexes
+    of the video inputs to seek (input_args is a list of "-i", path pairs).
+    video_graph has one open chain, the end of the reel's video.
+    """
+    input_count = len(input_args) // 2
+    audio_graph.validate(input_count, [audio_map] if audio_map else [])
+    segments = plan_segments(duration, ENCODE_SEGMENTS, SEGMENT_MIN_SECONDS)
+    workers = min(len(segments), ENCODE_SEGMENTS)
+    threads = slot_thread_count(workers)
+    semaphore = asyncio.Semaphore(workers)
+    progress = [0.0] * len(segments)
+    timings = [0.0] * len(segments)
+
+    def segment_progress(index: int, line: str):
+        if line.startswith("out_time_us=") and on_progress:
+            try:
+                progress[index] = int(line.split("=", 1)[1]) / 1_000_000
+            except ValueError:
+                return
+            on_progress(min(sum(progress) / duration, 1.0))
+
+    async def encode_segment(index: int, start: float, end: float) -> Path:
+        segment_path = job_dir / f"segment_{index:03d}.mp4"
+        # Seek one second early: fps/trim below decide the exact first frame
+        seek = max(0.0, start - 1.0)
+        seg_inputs = []
+        for i in range(0, len(input_args), 2):
+            if i // 2 in seek_inputs:
+                seg_inputs += ["-ss", f"{seek:.3f}"]
+            seg_inputs += input_args[i : i + 2]
+        seg_graph = video_graph.copy()
+        seg_chain = seg_graph.open_chain()
+        seg_chain.filters += [
+            f"fps={OUTPUT_FPS}",
+            f"trim=start={start:.6f}:end={end:.6f}",
+            "setpts=PTS-STARTPTS",
+        ]
+        seg_chain.outputs = ["vout"]
+        seg_graph.validate(input_count, ["[vout]"])
+        cmd = ["ffmpeg", "-y", *ffmpeg_thread_args(workers), "-copyts", "-start_at_zero", *seg_inputs]
+        cmd += ["-filter_complex", seg_graph.render(), "-map", "[vout]"]
+        cmd += video_encoding_args(encoding_profile)
+        cmd += ["-threads", str(threads), "-pix_fmt", "yuv420p", "-an"]
+        cmd += ["-progress", "pipe:1", "-nostats", str(segment_path)]
+        async with semaphore:
+            seg_start = time.time()
+            result = await run_process(
+                cmd, on_stdout_line=lambda line: segment_progress(index, line)
+            )
+            timings[index] = round(time.time() - seg_start, 3)
+        if result.returncode != 0:
+            raise Exception(
+                f"Segment {index} encoding failed: {result.stderr.decode()[-2000:]}"
+            )
+        return segment_path
+
+    async def encode_audio() -> Optional[Path]:
+        if audio_map is None:
+            return None
+        audio_path = job_dir / "audio.m4a"
+        cmd = ["ffmpeg", "-y", *input_args]
+        if audio_graph.chains:
+            cmd += ["-filter_complex", audio_graph.render()]
+        cmd += ["-map", audio_map, "-t", str(duration), "-vn"]
+        cmd += ["-c:a", "aac", "-b:a", "128k", str(audio_path)]
+        result = await run_process(cmd)
+        if result.returncode != 0:
+            raise Exception(f"Audio encoding failed: {result.stderr.decode()[-2000:]}")
+        return audio_path
 
+    print(f"🧩 Segmented encoding: {len(segments)} segments, {workers} workers x {threads} threads")
+    *segment_paths, audio_path = await asyncio.gather(
+        *(encode_segment(i, start, end) for i, (start, end) in enumerate(segments)),
+        encode_audio(),
+    )
+
+    concat_list = job_dir / "segments.txt"
+    concat_list.write_text(
+        "".join(f"file '{path.name}'\n" for path in segment_paths), encoding="utf-8"
+    )
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+    if audio_path is not None:
+        cmd += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+    cmd += ["-c", "copy", "-t", str(duration), "-movflags", "+faststart", str(output_path)]
+    result = await run_process(cmd)
+    if result.returncode != 0:
+        raise Exception(f"Segment concat failed: {result.stderr.decode()[-2000:]}")
+
+    return {"segments": len(segments), "segment_durations": timings}
+
+
+class FileCache:
+    """On-disk cache of render artifacts: <key><suffix>, oldest evicted past max_bytes.
+
+    Holds vidstabdetect results (.trf) and normalized mezzanines (.mp4).
+    """
+
+    def __init__(self, root: Path, max_bytes: int, suffix: str):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        # Missed keys since startup, with how often they missed (see sightings)
+        self.missed: OrderedDict = OrderedDict()
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entries(self):
+        return sorted(
+            (f.stat().st_mtime, f.stat().st_size, f) for f in self.root.glob(f"*{self.suffix}")
+        )
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Path]:
+        if not self.enabled:
+            return None
+        path = self.root / f"{key}{self.suffix}"
+        if not path.exists():
+            if count_miss:
+                self.counters["misses"] += 1
+            return None
+        os.utime(path)
+        self.counters["hits"] += 1
+        return path
+
+    def sightings(self, key: str) -> int:
+        """Count one more miss of key and return the count (the last 4096 keys are kept)."""
+        count = self.missed.pop(key, 0) + 1
+        self.missed[key] = count
+        while len(self.missed) > 4096:
+            self.missed.popitem(last=False)
+        return count
+
+    def put(self, key: str, src_path: Path, move: bool = False):
+        if not self.enabled:
+            return
+        self.missed.pop(key, None)
+        tmp_path = self.root / f"tmp-{uuid.uuid4().hex}"
+        if move:
+            shutil.move(str(src_path), tmp_path)
+        else:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, self.root / f"{key}{self.suffix}")
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        entries = self._entries() if self.enabled else []
+        return {
+            **self.counters,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+transform_cache = FileCache(CACHE_DIR / "stabilize", TRANSFORM_CACHE_MAX_BYTES, ".trf")
+mezzanine_cache = FileCache(CACHE_DIR / "mezzanine", MEZZANINE_CACHE_MAX_BYTES, ".mp4")
+outro_cache = FileCache(CACHE_DIR / "outro", OUTRO_CACHE_MAX_BYTES, ".mov")
+
+
+async def mezzanine_key(input_path: Path, stabilization: Optional[str], plan: ReelPlan) -> str:
+    """Cache key of a source's mezzanine: content hash, filter plan and applied stabilization."""
+    parts = [await content_hash_of(input_path), plan.signature(), str(stabilization)]
+    if stabilization == "vidstab":
+        parts += [VIDSTAB_TRANSFORM_PARAMS, SHARPEN_FILTER, str(STABILIZE_PROXY_MAX_SIDE)]
+    elif stabilization == "deshake":
+        parts.append(SHARPEN_FILTER)
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def mezzanine_encoding_args(share: int = 1) -> list:
+    """Video-only output args of the mezzanine, source timestamps kept as-is."""
+    return [
+        "-an",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-tune",
+        "fastdecode",
+        "-crf",
+        MEZZANINE_CRF,
+        "-g",
+        str(OUTPUT_FPS),
+        "-pix_fmt",
+        "yuv420p",
+        "-fps_mode",
+        "passthrough",
+        *encoder_thread_args(share),
+    ]
+
+
+async def render_outro(watermark_path: Path, store_name: str, job_dir: Path) -> tuple:
+    """The OUTRO_SECONDS ending layer (large logo, store name), cached per store.
+
+    Returns (layer path or None, stats dict). The layer is transparent
+    1080x1920 / OUTPUT_FPS video (QuickTime RLE with alpha), overlaid on the
+    reel's last seconds so the video and its captions stay visible under it.
+    """
+    key = hashlib.sha256(
+        f"{await content_hash_of(watermark_path)}|{store_name}|"
+        f"{json.dumps(OUTRO_STYLE, sort_keys=True)}".encode()
+    ).hexdigest()
+    outro_path = job_dir / "outro.mov"
+    cached = outro_cache.get(key)
+    if cached is not None:
+        link_or_copy(cached, outro_path)
+        return outro_path, {"cache": "hit"}
+
+    outro_ass_path = job_dir / "outro.ass"
+    generate_outro_ass(
+        store_name, outro_ass_path, 0.0, OUTRO_SECONDS, font_size=OUTRO_STYLE["font_size"]
+    )
+    ass_path_str = str(outro_ass_path).replace("\\", "/").replace(":", "\\:")
+    # RGB overlay and alpha=1 keep the background transparent around the drawings
+    filters = (
+        f"[1:v]scale=-1:{OUTRO_STYLE['logo_height']},format=rgba[logo];"
+        f"[0:v][logo]overlay=(W-w)/2:(H-h)/2-100:format=rgb,"
+        f"subtitles='{ass_path_str}':alpha=1[vout]"
+    )
+    rendered_path = job_dir / "outro_render.mov"
+    cmd = [
+        "ffmpeg",
+        "-y",
+        *ffmpeg_thread_args(),
+        "-f",
+        "lavfi",
+        "-i",
+        f"color=c=black@0.0:s=1080x1920:r={OUTPUT_FPS}:d={OUTRO_SECONDS},format=rgba",
+        "-i",
+        str(watermark_path),
+        "-filter_complex",
+        filters,
+        "-map",
+        "[vout]",
+        "-t",
+        str(OUTRO_SECONDS),
+        "-c:v",
+        "qtrle",
+        "-pix_fmt",
+        "argb",
+        str(rendered_path),
+    ]
+    result = await run_process(cmd)
+    if result.returncode != 0 or not rendered_path.exists():
+        print(f"⚠️ Outro rendering failed, using the per-job overlays: {result.stderr.decode()[-500:]}")
+        return None, {"cache": "miss", "error": "render failed"}
+
+    shutil.copyfile(rendered_path, outro_path)
+    outro_cache.put(key, rendered_path, move=True)
+    return outro_path, {"cache": "miss"}
+
+_LOCAL_MOTION_RE = re.compile(r"\(LM (-?\d+) (-?\d+) (-?\d+) (-?\d+) (-?\d+) ")
+
+
+def rescale_transforms(src: Path, dest: Path, fx: float, fy: float) -> bool:
+    """Scale the local motions of an ASCII vid.stab file by (fx, fy).
+
+    Each "(LM vx vy x y size contrast match)" holds a motion vector, a field
+    position and a field size in pixels of the analyzed frame. Returns False
+    if the file is not in the ASCII "VID.STAB" format.
+    """
+    text = src.read_text(encoding="ascii", errors="replace")
+    if not text.startswith("VID.STAB"):
+        return False
+
+    def scale(match):
+        vx, vy, x, y, size = (int(v) for v in match.groups())
+        return (
+            f"(LM {round(vx * fx)} {round(vy * fy)} {round(x * fx)} {round(y * fy)} "
+            f"{round(size * fx)} "
+        )
+
+    dest.write_text(_LOCAL_MOTION_RE.sub(scale, text), encoding="ascii")
+    return True
+
+
+def filter_frame_size(info: MediaInfo) -> Optional[tuple]:
+    """(width, height) of the source frames as the filters see them, None if unknown."""
+    if not (info.width and info.height):
+        return None
+    if abs(info.rotation or 0) % 180 == 90:
+        # ffmpeg autorotates, the frames seen by the filters are transposed
+        return info.height, info.width
+    return info.width, info.height
+
+
+def stabilize_proxy_size(info: MediaInfo) -> Optional[tuple]:
+    """Even proxy dimensions for detection, or None to analyze the source as is."""
+    size = filter_frame_size(info)
+    if not (STABILIZE_PROXY_MAX_SIDE and size):
+        return None
+    width, height = size
+    factor = STABILIZE_PROXY_MAX_SIDE / max(width, height)
+    if factor >= 1:
+        return None
+    return (width, height), (max(2, round(width * factor / 2) * 2), max(2, round(height * factor / 2) * 2))
+
+
+async def detect_stabilization(
+    input_path: Path, info: MediaInfo, job_dir: Path
+) -> tuple:
+    """vidstabdetect pass on a downscaled proxy, cached by source hash and parameters.
+
+    Returns (transforms path or None, stats dict). The transforms are scaled
+    back to source resolution; render_reel scales them again when its video
+    plan stabilizes the downscaled frames. When the proxy detection fails or
+    its transforms cannot be rescaled (binary .trf), detection runs again on
+    the source frames.
+    """
+    sizes = stabilize_proxy_size(info)
+    transforms_path, stats = await _detect_transforms(input_path, sizes, job_dir)
+    if transforms_path is None and sizes:
+        print("⚠️ Proxy detection unusable, detecting stabilization on the source frames")
+        transforms_path, stats = await _detect_transforms(input_path, None, job_dir)
+        stats["proxy_fallback"] = True
+    return transforms_path, stats
+
+
+async def _detect_transforms(input_path: Path, sizes: Optional[tuple], job_dir: Path) -> tuple:
+    """One vidstabdetect pass, on the proxy sizes = (source, proxy) or on the source (None)."""
+    factor = sizes[1][0] / sizes[0][0] if sizes else 1.0
+    # Aggressive stabilization settings:
+    # - shakiness=10: Max sensitivity to shake
+    # - accuracy=15: High accuracy
+    # - stepsize=32: Larger search window for bigger shakes (in source pixels)
+    detect_params = f"stepsize={max(6, round(32 * factor))}:shakiness=10:accuracy=15"
+    # Binary transforms (the default of recent builds) cannot be rescaled
+    if capabilities.has_filter_option("vidstabdetect", "fileformat"):
+        detect_params += ":fileformat=ascii"
+    proxy = f"{sizes[1][0]}x{sizes[1][1]}" if sizes else "source"
+    stats = {"proxy": proxy, "cache": "miss"}
+
+    key = hashlib.sha256(
+        f"{await content_hash_of(input_path)}|{detect_params}|{proxy}".encode()
+    ).hexdigest()
+    transforms_path = job_dir / "transforms.trf"
+    cached = transform_cache.get(key)
+    if cached is not None:
+        shutil.copyfile(cached, transforms_path)
+        stats["cache"] = "hit"
+        return transforms_path, stats
+
+    raw_path = job_dir / "transforms_proxy.trf" if sizes else transforms_path
+    vf = f"vidstabdetect={detect_params}:result={raw_path}"
+    if sizes:
+        vf = f"scale={sizes[1][0]}:{sizes[1][1]}," + vf
+    detect_cmd = [
+        "ffmpeg",
+        "-y",
+        *ffmpeg_thread_args(),
+        "-i",
+        str(input_path),
+        "-an",
+        "-vf",
+        vf,
+        "-f",
+        "null",
+        "-",
+    ]
+    detect_proc = await run_process(detect_cmd)
+    if detect_proc.returncode != 0 or not raw_path.exists():
+        print(f"⚠️ Stabilization Pass 1 failed ({proxy}): {detect_proc.stderr.decode()[:500]}")
+        return None, stats
+
+    if sizes:
+        (width, height), (proxy_width, proxy_height) = sizes
+        if not rescale_transforms(
+            raw_path, transforms_path, width / proxy_width, height / proxy_height
+        ):
+            print("⚠️ Unknown transforms format, proxy transforms cannot be rescaled")
+            return None, stats
+
+    transform_cache.put(key, transforms_path)
+    return transforms_path, stats
+
+
+class OutputCache:
+    """Completed renders by request fingerprint, so a retry skips the encode.
+
+    The files are hard-linked under root/<fingerprint>/ and the index is kept
+    in memory: entries expire after ttl seconds, the oldest are evicted past
+    max_entries, and the directory is emptied at startup. An entry stored
+    with reusable=False (a render downgraded on a busy queue) only serves
+    the identical requests that waited for that render.
+    """
+
+    def __init__(self, root: Path, max_entries: int, ttl: int):
+        self.root = root
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "coalesced": 0}
+        if self.enabled:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _drop(self, fingerprint: str):
+        entry = self.entries.pop(fingerprint, None)
+        if entry is not None:
+            shutil.rmtree(entry["dir"], ignore_errors=True)
+
+    def has(self, fingerprint: str) -> bool:
+        """An entry any request may be served from (possibly expired, see get)."""
+        entry = self.entries.get(fingerprint)
+        return entry is not None and entry["reusable"]
+
+    def get(self, fingerprint: str, follower: bool = False) -> Optional[dict]:
+        """The entry for fingerprint; follower: the caller waited for its render."""
+        if not self.enabled:
+            return None
+        entry = self.entries.get(fingerprint)
+        if entry is not None and (
+            time.time() > entry["expires_at"] or not entry["files"]["output"].exists()
+        ):
+            self._drop(fingerprint)
+            entry = None
+        if entry is None or not (entry["reusable"] or follower):
+            self.counters["misses"] += 1
+            return None
+        self.entries.move_to_end(fingerprint)
+        self.counters["hits"] += 1
+        return entry
+
+    def put(
+        self,
+        fingerprint: str,
+        output_path: Path,
+        variant_paths: dict,
+        duration: float,
+        stats: dict,
+        reusable: bool = True,
+    ):
+        if not self.enabled:
+            return
+        self._drop(fingerprint)
+        entry_dir = self.root / fingerprint
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        files = {"output": entry_dir / output_path.name}
+        link_or_copy(output_path, files["output"])
+        for name, path in variant_paths.items():
+            files[name] = entry_dir / path.name
+            link_or_copy(path, files[name])
+        self.entries[fingerprint] = {
+            "dir": entry_dir,
+            "files": files,
+            "duration": duration,
+            # Plain JSON copy, the render goes on mutating its own stats
+            "stats": json.loads(json.dumps(stats)),
+            "expires_at": time.time() + self.ttl,
+            "reusable": reusable,
+        }
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+        }
+
+
+output_cache = OutputCache(CACHE_DIR / "outputs", OUTPUT_CACHE_SIZE, OUTPUT_CACHE_TTL_SECONDS)
+
+
+FINGERPRINTED_URLS = ("video_url", "music_url", "watermark_url")
+
+
+async def request_fingerprint(
+    request: ReelRequest, source_hash: Optional[str] = None
+) -> Optional[str]:
+    """Canonical identity of a render: every parameter plus the hash of each input.
+
+    URL sources count by content, hashed through the asset cache (a URL that
+    cannot be fetched counts by URL). output_mode, credentials and tts_token
+    are left out since they do not change the video; the TTS counts by what
+    it is synthesized from (engine, voice, text, delay). None when the output
+    cache is disabled, since nothing would be looked up.
+    """
+    if not output_cache.enabled:
+        return None
+    params = request.model_dump(
+        exclude={"video_base64", "output_mode", "gemini_api_key", "webhook_url", "tts_token"}
+    )
+    params["tts_engine"] = resolve_tts_engine(request.tts_engine, request.gemini_api_key)
+    params["tts_voice"] = resolve_tts_voice(request.tts_voice)
+    params["tts_delay"] = TTS_DELAY
+    urls = [name for name in FINGERPRINTED_URLS if params.get(name)]
+    hashes = await asyncio.gather(*(asset_cache.content_hash(params[name]) for name in urls))
+    for name, sha256 in zip(urls, hashes):
+        if sha256:
+            params[name] = None
+            params[f"{name}_sha256"] = sha256
+    if request.video_base64:
+        params["video_sha256"] = await asyncio.to_thread(
+            lambda: hashlib.sha256(request.video_base64.encode()).hexdigest()
+        )
+    if source_hash:
+        params["upload_sha256"] = source_hash
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Job subsystem: every render goes through a bounded queue consumed by
+# JOB_WORKERS workers. POST /jobs returns immediately, /process-reel waits.
+# ---------------------------------------------------------------------------
+
+
+class JobRequest(ReelRequest):
+    webhook_url: Optional[str] = None  # POSTed the final job status when done
+    output_mode: str = "handle"
+
+
+JOBS: dict = {}
+job_queue: Optional[asyncio.Queue] = None
+# Fingerprint -> job rendering it, followed by identical requests (single-flight)
+inflight_jobs: dict = {}
+
+
+def job_public_view(job: dict) -> dict:
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": round(job["progress"], 3),
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "queued" and job_queue is not None:
+        view["queued_jobs"] = job_queue.qsize()
+    if job.get("result") is not None:
+        view["result"] = job["result"]
+    return view
+
+
+def purge_finished_jobs():
+    """Forget jobs finished more than JOB_TTL_SECONDS ago, then the oldest beyond MAX_FINISHED_JOBS."""
+    now = time.time()
+    finished = sorted(
+        (job["finished_at"], job_id) for job_id, job in JOBS.items() if job["finished_at"]
+    )
+    for rank, (finished_at, job_id) in enumerate(finished):
+        if now - finished_at > JOB_TTL_SECONDS or len(finished) - rank > MAX_FINISHED_JOBS:
+            del JOBS[job_id]
+
+
+def create_job(
+    request: ReelRequest,
+    job_dir: Path,
+    extra_stats: Optional[dict] = None,
+    keep_result: bool = True,
+    webhook_url: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+) -> dict:
+    purge_finished_jobs()
+    job = {
+        "id": job_dir.name,
+        "request": request,
+        "fingerprint": fingerprint,
+        "job_dir": job_dir,
+        "extra_stats": extra_stats,
+        "keep_result": keep_result,
+        "webhook_url": webhook_url,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0.0,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "future": asyncio.get_running_loop().create_future(),
+    }
+    JOBS[job["id"]] = job
+    return job
+
+
+async def send_job_webhook(job: dict):
+    try:
+        response = await get_http_client().post(
+            job["webhook_url"], json=job_public_view(job), timeout=10.0
+        )
+        print(f"📨 Webhook for job {job['id']}: HTTP {response.status_code}")
     except Exception as e:
-        if "job_dir" in locals():
-            shutil.rmtree(job_dir, ignore_errors=True)
-        return {"success": False, "detail": str(e)}
+        print(f"⚠️ Webhook for job {job['id']} failed: {e}")
+
+
+async def run_job(job: dict):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+
+    def on_progress(stage: str, progress: float):
+        job["stage"] = stage
+        job["progress"] = progress
+
+    try:
+        result = await render_reel(
+            job["request"],
+            job["job_dir"],
+            extra_stats=job["extra_stats"],
+            on_progress=on_progress,
+            fingerprint=job["fingerprint"],
+        )
+    except Exception as e:
+        print(f"❌ Job {job['id']} failed: {e}")
+        shutil.rmtree(job["job_dir"], ignore_errors=True)
+        result = {"success": False, "detail": str(e)}
+    finally:
+        if inflight_jobs.get(job["fingerprint"]) is job:
+            del inflight_jobs[job["fingerprint"]]
+
+    await finish_job(job, result)
+
+
+async def finish_job(job: dict, result):
+    succeeded = not isinstance(result, dict) or result.get("success", False)
+    job["status"] = "completed" if succeeded else "failed"
+    job["stage"] = "done"
+    job["progress"] = 1.0 if succeeded else job["progress"]
+    job["finished_at"] = time.time()
+    # Only async jobs keep their result; sync callers receive it directly
+    if job["keep_result"]:
+        job["result"] = result
+    job["request"] = None
+
+    if not job["future"].done():
+        job["future"].set_result(result)
+    if job["webhook_url"]:
+        await send_job_webhook(job)
+
+
+async def job_worker(slot: RenderSlot):
+    # Tasks get their own context copy: everything this worker spawns uses its slot
+    current_render_slot.set(slot)
+    while True:
+        job = await job_queue.get()
+        slot.job_id = job["id"]
+        slot.busy_since = time.time()
+        try:
+            print(f"👷 Worker {slot.id} (CPUs {slot.cpus}) picked job {job['id']}")
+            await run_job(job)
+        except Exception as e:
+            print(f"❌ Worker {slot.id} crashed on job {job['id']}: {e}")
+        finally:
+            slot.job_id = None
+            slot.busy_since = None
+            slot.jobs_done += 1
+            job_queue.task_done()
+
+
+def start_job_workers():
+    global job_queue, render_slots
+    job_queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    render_slots = plan_render_slots(JOB_WORKERS)
+    for slot in render_slots:
+        asyncio.create_task(job_worker(slot))
+    print(
+        f"👷 Started {len(render_slots)} render workers on {len(usable_cpus())} CPUs, "
+        f"{render_slots[0].threads} threads each (queue size {JOB_QUEUE_SIZE})"
+    )
+
+
+def start_environment_warm_up():
+    global environment_task
+    environment_task = asyncio.create_task(warm_up_environment())
+
+
+async def close_http_client():
+    if _http_client is not None:
+        await _http_client.aclose()
+    if aligner_pool is not None:
+        aligner_pool.shutdown(cancel_futures=True)
+
+
+def attach_to_identical(job: dict) -> bool:
+    """Serve job from the output cache or from the identical render in flight.
+
+    Returns False when job has to be rendered; it is then the one identical
+    requests attach to until it finishes.
+    """
+    fingerprint = job["fingerprint"]
+    if fingerprint is None or not output_cache.enabled:
+        return False
+    leader = inflight_jobs.get(fingerprint)
+    if leader is None and not output_cache.has(fingerprint):
+        inflight_jobs[fingerprint] = job
+        return False
+    job["status"] = "running"
+    job["stage"] = "coalesced" if leader is not None else "cached"
+    job["started_at"] = time.time()
+    asyncio.create_task(follow_identical(job, leader))
+    return True
+
+
+async def follow_identical(job: dict, leader: Optional[dict]):
+    leader_result = None
+    if leader is not None:
+        output_cache.counters["coalesced"] += 1
+        print(f"🔗 Job {job['id']} waits for identical job {leader['id']}")
+        leader_result = await asyncio.shield(leader["future"])
+
+    entry = output_cache.get(job["fingerprint"], follower=leader is not None)
+    if entry is None:
+        if isinstance(leader_result, dict) and not leader_result.get("success", False):
+            # Same request, same failure
+            shutil.rmtree(job["job_dir"], ignore_errors=True)
+            await finish_job(job, leader_result)
+            return
+        # Not cached after all (evicted meanwhile): render it
+        job["status"] = job["stage"] = "queued"
+        job["started_at"] = None
+        if not attach_to_identical(job):
+            await job_queue.put(job)
+        return
+
+    try:
+        request = job["request"]
+        variant_paths = {}
+        for name in request.variants:
+            variant_paths[name] = job["job_dir"] / entry["files"][name].name
+            link_or_copy(entry["files"][name], variant_paths[name])
+        output_path = job["job_dir"] / entry["files"]["output"].name
+        link_or_copy(entry["files"]["output"], output_path)
+        stats = {**entry["stats"], **(job["extra_stats"] or {}), "output_cache": "hit"}
+        result = deliver_output(
+            request, job["job_dir"], output_path, variant_paths, entry["duration"], stats
+        )
+    except Exception as e:
+        shutil.rmtree(job["job_dir"], ignore_errors=True)
+        result = {"success": False, "detail": str(e)}
+    await finish_job(job, result)
+
+
+async def submit_and_wait(
+    request: ReelRequest,
+    job_dir: Path,
+    extra_stats: Optional[dict] = None,
+    fingerprint: Optional[str] = None,
+):
+    """Queue a render and wait for its result (used by the synchronous endpoints)."""
+    job = create_job(
+        request, job_dir, extra_stats=extra_stats, keep_result=False, fingerprint=fingerprint
+    )
+    if not attach_to_identical(job):
+        await job_queue.put(job)
+    return await job["future"]
+
+
+@app.post("/jobs", status_code=202)
+async def create_render_job(request: JobRequest, x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    if not request.video_base64 and not request.video_url:
+        raise HTTPException(status_code=400, detail="No video source provided")
+    check_capabilities(request)
+    try:
+        check_variants(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.output_mode in ("file", "base64"):
+        # Nobody is waiting on the connection, keep the output on disk instead
+        # (a base64 result would stay in JOBS until the job is forgotten)
+        request.output_mode = "handle"
+
+    fingerprint = await request_fingerprint(request)
+    job_dir = TEMP_DIR / str(uuid.uuid4())
+    job_dir.mkdir()
+    job = create_job(
+        request, job_dir, webhook_url=request.webhook_url, fingerprint=fingerprint
+    )
+    if attach_to_identical(job):
+        print(f"📥 Job {job['id']} served by an identical render ({job['stage']})")
+        return job_public_view(job)
+    try:
+        job_queue.put_nowait(job)
+    except asyncio.QueueFull:
+        del JOBS[job["id"]]
+        inflight_jobs.pop(fingerprint, None)
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail="Job queue full, retry later")
+
+    print(f"📥 Job {job['id']} queued ({job_queue.qsize()} waiting)")
+    return job_public_view(job)
+
+
+@app.get("/render-slots")
+def render_slots_status(x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    return {
+        "cpus": len(usable_cpus()),
+        "cpu_affinity": RENDER_CPU_AFFINITY and hasattr(os, "sched_setaffinity"),
+        "slots": [slot.status() for slot in render_slots],
+        "busy": sum(1 for slot in render_slots if slot.job_id),
+        "queued_jobs": job_queue.qsize() if job_queue is not None else 0,
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_render_job(job_id: str, x_api_key: str = Header(None)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_public_view(job)
 
 
 @app.post("/preview-tts")
@@ -1317,64 +4750,46 @@ async def preview_tts(request: ReelRequest, x_api_key: str = Header(None)):
         job_dir.mkdir()
 
         tts_audio_path = job_dir / "preview.mp3"
-        tts_srt_path = job_dir / "preview.srt"  # Consistent with rest of app
+        tts_ass_path = job_dir / "preview.ass"
 
         if not request.text:
             raise HTTPException(status_code=400, detail="Text required for preview")
 
-        clean_text = clean_text_for_tts(request.text)
-
-        # Determine voice
-        voice = request.tts_voice
-        if voice == "male":
-            voice = "fr-FR-RemyMultilingualNeural"
-        elif voice == "female":
-            voice = "fr-FR-VivienneMultilingualNeural"
-        elif not voice:
-            voice = "fr-FR-VivienneMultilingualNeural"
-        # Note: Gemini voices (fr-FR-Standard-A etc.) are valid Edge voices too,
-        # so we don't check for "Neural" - let edge_tts handle voice resolution
-
-        engine = request.tts_engine or "gemini"
-
-        # Primary: Gemini TTS. Fallback: Edge TTS
-        if engine == "gemini" and request.gemini_api_key:
-            try:
-                await generate_tts_gemini(
-                    clean_text,
-                    voice,
-                    request.gemini_api_key,
-                    tts_audio_path,
-                    tts_srt_path,
-                    display_text=clean_text_for_display(request.text),
-                )
-            except Exception as gemini_err:
-                print(f"⚠️ Gemini TTS failed ({gemini_err}), falling back to Edge TTS")
-                await generate_tts_with_subs(
-                    clean_text,
-                    voice,
-                    tts_audio_path,
-                    tts_srt_path,
-                    display_text=clean_text_for_display(request.text),
-                )
-        else:
-            await generate_tts_with_subs(
-                clean_text,
-                voice,
-                tts_audio_path,
-                tts_srt_path,
-                display_text=clean_text_for_display(request.text),
-            )
+        # Same delay as the reel so /process-reel can reuse these artifacts
+        tts_result = await synthesize_tts(
+            request.text,
+            request.tts_voice,
+            request.tts_engine,
+            request.gemini_api_key,
+            tts_audio_path,
+            tts_ass_path,
+        )
 
+        tts_audio_path = tts_result["audio_path"]
         if not tts_audio_path.exists():
             raise Exception("TTS generation failed (file missing)")
 
+        if tts_audio_path.suffix == ".wav":
+            # Clients play the preview as MP3
+            mp3_path = job_dir / "preview_encoded.mp3"
+            result = await run_process(
+                ["ffmpeg", "-y", "-i", str(tts_audio_path), "-codec:a", "libmp3lame", "-qscale:a", "2", str(mp3_path)]
+            )
+            if result.returncode != 0:
+                raise Exception(f"Preview MP3 encoding failed: {result.stderr.decode(errors='replace')[-300:]}")
+            tts_audio_path = mp3_path
+
         with open(tts_audio_path, "rb") as f:
             audio_bytes = f.read()
             audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
 
         shutil.rmtree(job_dir)
-        return {"success": True, "audio_base64": audio_b64}
+        return {
+            "success": True,
+            "audio_base64": audio_b64,
+            "tts_token": tts_result["token"],
+            "tts_voice": f"{tts_result['engine']}:{tts_result['voice']}",
+        }
 
     except Exception as e:
         if "job_dir" in locals():
@@ -0,0 +1,101 @@
+"""In-process subtitle alignment with ffsubsync, for main.py's aligner pool.
+
+The ffsubsync CLI pays interpreter startup, its imports and an ffmpeg decode
+of the reference on every call. This module is imported once by each worker
+of a process pool (warm_up is the pool initializer) and aligns an SRT file
+against PCM that the caller already decoded. It deliberately does not import
+main.py, so pool workers stay light.
+"""
+
+import argparse
+import os
+from typing import Optional
+
+import numpy as np
+
+# webrtcvad only accepts these sample rates
+VAD_RATES = (8000, 16000, 32000, 48000)
+
+_parser: Optional[argparse.ArgumentParser] = None
+# CPUs this worker may use when an alignment does not come from a render slot
+_all_cpus: Optional[set] = None
+
+
+def warm_up() -> bool:
+    """Import ffsubsync, numpy and webrtcvad ahead of the first alignment."""
+    global _parser, _all_cpus
+    if _all_cpus is None and hasattr(os, "sched_getaffinity"):
+        _all_cpus = os.sched_getaffinity(0)
+    if _parser is None:
+        import webrtcvad  # noqa: F401
+        from ffsubsync.ffsubsync import make_parser
+
+        _parser = make_parser()
+    return True
+
+
+def speech_frames(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """Speech / non-speech labels every 10 ms of mono s16le PCM (webrtcvad)."""
+    from ffsubsync.constants import DEFAULT_NON_SPEECH_LABEL, SAMPLE_RATE
+    from ffsubsync.speech_transformers import _make_webrtcvad_detector
+
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if sample_rate not in VAD_RATES:
+        # e.g. Gemini's 24 kHz: resample linearly to 16 kHz, plenty for a VAD
+        target = 16000
+        positions = np.arange(0, len(samples), sample_rate / target)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+        sample_rate = target
+
+    detector = _make_webrtcvad_detector(SAMPLE_RATE, sample_rate, DEFAULT_NON_SPEECH_LABEL)
+    return detector(samples.tobytes())
+
+
+class _PrecomputedSpeech:
+    """Stands in for ffsubsync's VideoSpeechTransformer with known speech labels."""
+
+    def __init__(self, speech: np.ndarray):
+        self.speech = speech
+
+    def fit(self, *_):
+        return self
+
+    def transform(self, *_):
+        return self.speech
+
+
+def pin(cpus: Optional[list]):
+    """Run this worker on cpus (the caller's render slot), or on all its CPUs again."""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    target = set(cpus) if cpus else _all_cpus
+    if target:
+        os.sched_setaffinity(0, target)
+
+
+def align_srt(
+    pcm: bytes, sample_rate: int, unsynced_srt: str, synced_srt: str, cpus: Optional[list] = None
+) -> dict:
+    """Align unsynced_srt on the speech found in pcm and write synced_srt.
+
+    Same search as `ffsubsync <audio> -i unsynced.srt -o synced.srt` (offset
+    and framerate ratios). Returns ffsubsync's result dict
+    (sync_was_successful, offset_seconds, framerate_scale_factor). The pool
+    is shared by the render slots, so each call pins the worker to cpus.
+    """
+    from ffsubsync.ffsubsync import try_sync
+    from ffsubsync.sklearn_shim import Pipeline
+
+    warm_up()
+    pin(cpus)
+    speech = speech_frames(pcm, sample_rate)
+    if not speech.any():
+        return {"sync_was_successful": False, "offset_seconds": None, "framerate_scale_factor": None}
+
+    # "reference.wav" only tells ffsubsync the reference is audio, it is never read
+    args = _parser.parse_args(["reference.wav", "-i", unsynced_srt, "-o", synced_srt])
+    reference_pipe = Pipeline([("speech_extract", _PrecomputedSpeech(speech))])
+    result = {"offset_seconds": None, "framerate_scale_factor": None}
+    try_sync(args, reference_pipe, result)
+    # numpy scalars -> plain floats, the result goes back through pickle / JSON
+    return {k: float(v) if isinstance(v, np.floating) else v for k, v in result.items()}
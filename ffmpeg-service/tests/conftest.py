@@ -0,0 +1,72 @@
+"""Shared setup: main.py is imported with its caches in a temporary directory."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+# main.py reads its configuration at import time
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="ffmpeg_service_tests_"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+def client() -> httpx.AsyncClient:
+    """Client calling the app in-process, on the caller's event loop."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+@pytest.fixture
+def api_headers() -> dict:
+    return {"X-API-Key": main.API_KEY}
+
+
+FAKE_FFMPEG = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/ffmpeg.log"
+for a in "$@"; do
+  case "$a" in
+    *.mp4|*.m4a|*.mov|*.jpg) [ "$prev" != "-i" ] && echo data > "$a" ;;
+  esac
+  case "$a" in
+    *fileformat=ascii*result=*)
+      printf 'VID.STAB 1\\nFrame 1 (List 1 [(LM 10 -4 100 200 64 0.5 0.1)])\\n' > "${a##*result=}" ;;
+    *result=*) printf 'TRF1\\001\\002' > "${a##*result=}" ;;
+  esac
+  prev="$a"
+done
+echo "out_time_us=5000000"
+"""
+
+FAKE_FFPROBE = """#!/bin/sh
+echo '{"format": {"duration": "24.0", "size": "10", "format_name": "mov"}, "streams": [
+  {"codec_type": "video", "codec_name": "h264", "width": 3840, "height": 2160,
+   "r_frame_rate": "30/1", "pix_fmt": "yuv420p"},
+  {"codec_type": "audio", "codec_name": "aac"}]}'
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch, tmp_path) -> Path:
+    """ffmpeg / ffprobe stand-ins on PATH (a 4K clip; outputs are placeholders).
+
+    Returns the log of ffmpeg command lines. vidstabdetect writes ASCII
+    transforms with fileformat=ascii and binary ones otherwise.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("ffmpeg", FAKE_FFMPEG), ("ffprobe", FAKE_FFPROBE)):
+        path = bin_dir / name
+        path.write_text(script)
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    for name in ("transform_cache", "mezzanine_cache", "outro_cache"):
+        cache = getattr(main, name)
+        monkeypatch.setattr(
+            main, name, main.FileCache(tmp_path / name, cache.max_bytes, cache.suffix)
+        )
+    monkeypatch.setattr(main.output_cache, "max_entries", 0)
+    return bin_dir / "ffmpeg.log"
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+
+import httpx
+
+import main
+
+
+def serve(monkeypatch, bodies: dict, requests: list, delay: float = 0):
+    """Route the shared HTTP client to bodies[url], logging (url, conditional headers)."""
+
+    async def handler(request):
+        requests.append((str(request.url), request.headers.get("if-none-match")))
+        await asyncio.sleep(delay)
+        body = bodies[str(request.url)]
+        etag = f'"{hashlib.sha256(body).hexdigest()[:8]}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, content=body, headers={"ETag": etag})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "get_http_client", lambda: client)
+
+
+def fetch_all(cache, urls, dest_dir):
+    async def scenario():
+        return await asyncio.gather(
+            *(cache.fetch(url, dest_dir / f"{i}.bin") for i, url in enumerate(urls))
+        )
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_fetches_of_a_url_download_it_once(monkeypatch, tmp_path):
+    requests = []
+    serve(monkeypatch, {"https://cdn/a.mp3": b"a" * 100}, requests, delay=0.01)
+    cache = main.AssetCache(tmp_path / "assets", 10_000, 3600)
+
+    results = fetch_all(cache, ["https://cdn/a.mp3"] * 3, tmp_path)
+
+    assert len(requests) == 1
+    assert sorted(r["cache"] for r in results) == ["hit", "hit", "miss"]
+    assert (tmp_path / "2.bin").read_bytes() == b"a" * 100
+
+
+def test_url_locks_do_not_outlive_their_fetches(monkeypatch, tmp_path):
+    bodies = {f"https://cdn/{i}.mp3": bytes([i]) * 10 for i in range(50)}
+    serve(monkeypatch, bodies, [])
+    cache = main.AssetCache(tmp_path / "assets", 10_000, 3600)
+
+    fetch_all(cache, list(bodies) * 2, tmp_path)
+
+    assert cache._locks == {}
+
+
+def test_stale_entry_is_revalidated(monkeypatch, tmp_path):
+    requests = []
+    serve(monkeypatch, {"https://cdn/a.mp3": b"a" * 100}, requests)
+    cache = main.AssetCache(tmp_path / "assets", 10_000, 0)
+
+    fetch_all(cache, ["https://cdn/a.mp3"], tmp_path)
+    (result,) = fetch_all(cache, ["https://cdn/a.mp3"], tmp_path)
+
+    assert result["cache"] == "revalidated"
+    assert requests[1][1] is not None
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch, tmp_path):
+    bodies = {f"https://cdn/{name}": name.encode() * 30 for name in "abc"}
+    serve(monkeypatch, bodies, [])
+    clock = iter(range(1000))
+    monkeypatch.setattr(main.time, "time", lambda: next(clock))
+    cache = main.AssetCache(tmp_path / "assets", 80, 3600)
+
+    for url in ("https://cdn/a", "https://cdn/b", "https://cdn/a", "https://cdn/c"):
+        fetch_all(cache, [url], tmp_path)
+
+    assert sorted(cache.index) == ["https://cdn/a", "https://cdn/c"]
+    assert cache.counters["evictions"] == 1
+    assert sorted(p.name for p in cache.blob_dir.iterdir()) == sorted(
+        entry["sha256"] for entry in cache.index.values()
+    )
+
+
+def test_content_hash_follows_the_content(monkeypatch, tmp_path):
+    bodies = {"https://cdn/a.mp4": b"first"}
+    serve(monkeypatch, bodies, [])
+    cache = main.AssetCache(tmp_path / "assets", 10_000, 0)
+
+    first = asyncio.run(cache.content_hash("https://cdn/a.mp4"))
+    bodies["https://cdn/a.mp4"] = b"second"
+    second = asyncio.run(cache.content_hash("https://cdn/a.mp4"))
+
+    assert first == hashlib.sha256(b"first").hexdigest()
+    assert second == hashlib.sha256(b"second").hexdigest()
+    assert [p.name for p in cache.tmp_dir.iterdir() if p.name.startswith("probe-")] == []
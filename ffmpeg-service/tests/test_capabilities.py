@@ -0,0 +1,92 @@
+import json
+import stat
+
+import pytest
+
+import main
+
+FAKE_FFMPEG = """#!/bin/sh
+case "$2" in
+  -version) echo "ffmpeg version 6.1-test" ;;
+  -filters) printf ' Filters:\\n ---\\n ... scale  V->V  Scale\\n ... eq  V->V  Eq\\n' ;;
+  -encoders) printf ' Encoders:\\n ------\\n V..... libx264  H.264\\n A..... aac  AAC\\n' ;;
+esac
+"""
+
+
+@pytest.fixture
+def fresh_environment(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "capabilities", main.CapabilityRegistry())
+    monkeypatch.setattr(main, "ENVIRONMENT_CACHE_FILE", tmp_path / "environment.json")
+    monkeypatch.setattr(main, "ensure_fonts", lambda: None)
+    monkeypatch.setattr(main, "index_fonts", lambda: {})
+    monkeypatch.setattr(main, "get_font_path", lambda: "Sans")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", str(bin_dir))
+    return bin_dir
+
+
+def test_failed_diagnostics_are_neither_trusted_nor_cached(fresh_environment):
+    # No ffmpeg on PATH
+    result = main.prepare_environment()
+    assert not main.capabilities.loaded
+    assert not main.ENVIRONMENT_CACHE_FILE.exists()
+    assert result["from_cache"] is False
+    # Renders are not refused with 501 on an unknown registry
+    main.check_capabilities(main.ReelRequest(text="Bonjour"))
+
+
+def test_successful_diagnostics_are_cached(fresh_environment):
+    ffmpeg = fresh_environment / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    main.prepare_environment()
+    assert main.capabilities.loaded
+    assert main.capabilities.filters == {"scale", "eq"}
+    assert main.capabilities.encoders == {"libx264", "aac"}
+    cached = json.loads(main.ENVIRONMENT_CACHE_FILE.read_text())
+    assert cached["capabilities"]["filters"] == ["eq", "scale"]
+
+
+def test_cache_with_empty_listings_is_ignored(fresh_environment, tmp_path):
+    emoji_font = tmp_path / "emoji.ttf"
+    emoji_font.write_bytes(b"font")
+    main.ENVIRONMENT_CACHE_FILE.write_text(
+        json.dumps(
+            {
+                "capabilities": {"version": None, "filters": [], "encoders": []},
+                "emoji_font": str(emoji_font),
+                "font_path": "Sans",
+                "fingerprint": main.environment_fingerprint(),
+            }
+        )
+    )
+    assert main.load_cached_environment() is None
+
+
+def test_eq_is_only_required_with_color_adjust():
+    filters, _ = main.required_capabilities(main.ReelRequest(color_adjust=False))
+    assert "eq" not in filters
+    filters, _ = main.required_capabilities(main.ReelRequest())
+    assert "eq" in filters
+
+
+def test_ending_effect_needs_no_split_or_concat():
+    request = main.ReelRequest(
+        watermark_url="http://example.com/logo.png", store_name="Boulangerie", enable_ending_effect=True
+    )
+    filters, _ = main.required_capabilities(request)
+    assert {"overlay", "subtitles", "fade"} <= filters
+    assert not filters & {"split", "concat", "trim"}
+
+
+def test_missing_filter_is_501(monkeypatch):
+    registry = main.CapabilityRegistry()
+    registry.restore({"version": "x", "filters": ["scale", "crop"], "encoders": ["libx264", "aac"]})
+    monkeypatch.setattr(main, "capabilities", registry)
+    main.check_capabilities(main.ReelRequest(color_adjust=False, enable_ending_effect=False))
+    with pytest.raises(main.HTTPException) as raised:
+        main.check_capabilities(main.ReelRequest(enable_ending_effect=False))
+    assert raised.value.status_code == 501
+    assert "'eq'" in raised.value.detail
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+
+
+def route(monkeypatch, handler):
+    """Send the shared HTTP client's requests to handler."""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "get_http_client", lambda: client)
+
+
+def test_assets_are_downloaded_concurrently(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "asset_cache", main.AssetCache(tmp_path / "assets", 10_000, 3600))
+    arrived = []
+    all_arrived = asyncio.Event()
+
+    async def handler(request):
+        arrived.append(request.url.path)
+        if len(arrived) == 3:
+            all_arrived.set()
+        # Sequential downloads would never get the three requests in flight
+        await asyncio.wait_for(all_arrived.wait(), timeout=5)
+        return httpx.Response(200, content=request.url.path.encode())
+
+    route(monkeypatch, handler)
+    downloads = {
+        name: (f"https://cdn/{name}", tmp_path / f"{name}.bin")
+        for name in ("video", "music", "watermark")
+    }
+    results = asyncio.run(main.fetch_assets(downloads))
+
+    assert all("error" not in result for result in results.values())
+    assert (tmp_path / "music.bin").read_bytes() == b"/music"
+    assert set(results["video"]) >= {"bytes", "duration", "cache"}
+
+
+def test_a_failed_asset_does_not_fail_the_others(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "asset_cache", main.AssetCache(tmp_path / "assets", 10_000, 3600))
+
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"ok")
+
+    route(monkeypatch, handler)
+    results = asyncio.run(
+        main.fetch_assets(
+            {
+                "music": ("https://cdn/missing", tmp_path / "music.bin"),
+                "watermark": ("https://cdn/logo", tmp_path / "logo.bin"),
+            }
+        )
+    )
+
+    assert "404" in results["music"]["error"]
+    assert not (tmp_path / "music.bin").exists()
+    assert results["watermark"]["bytes"] == 2
+
+
+@pytest.mark.parametrize("announced", [True, False])
+def test_download_over_the_size_cap_is_refused(monkeypatch, tmp_path, announced):
+    def handler(request):
+        if announced:
+            return httpx.Response(200, content=b"x" * 100)
+        return httpx.Response(200, stream=httpx.ByteStream(b"x" * 100))
+
+    route(monkeypatch, handler)
+    with pytest.raises(ValueError):
+        asyncio.run(main.download_to_file("https://cdn/big", tmp_path / "big.bin", max_bytes=50))
+
+
+def test_stalled_download_hits_the_deadline(monkeypatch, tmp_path):
+    async def handler(request):
+        await asyncio.sleep(60)
+        return httpx.Response(200)
+
+    route(monkeypatch, handler)
+    with pytest.raises(TimeoutError, match="deadline"):
+        asyncio.run(main.download_to_file("https://cdn/slow", tmp_path / "slow.bin", deadline=0.05))
+
+
+def test_http_client_is_shared(monkeypatch):
+    monkeypatch.setattr(main, "_http_client", None)
+    assert main.get_http_client() is main.get_http_client()
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+def test_a_failed_sentence_cancels_the_others(monkeypatch, tmp_path):
+    finished = []
+
+    async def fake_stream(sentence, voice, part_path, first_chunk=None):
+        if sentence.startswith("Deux"):
+            await asyncio.sleep(0.05)
+            raise RuntimeError("edge down")
+        await asyncio.sleep(0.3)
+        part_path.write_bytes(b"mp3")
+        finished.append(sentence)
+        return []
+
+    monkeypatch.setattr(main, "stream_edge_tts", fake_stream)
+    audio_path = tmp_path / "tts.mp3"
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="edge down"):
+            await main.synthesize_edge_sentences("Un. Deux. Trois.", "fr-FR-X", audio_path)
+        # Leave time for any sibling that was not cancelled to finish
+        await asyncio.sleep(0.5)
+
+    asyncio.run(scenario())
+    assert finished == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parts_are_joined_with_shifted_boundaries(monkeypatch, tmp_path):
+    async def fake_stream(sentence, voice, part_path, first_chunk=None):
+        part_path.write_bytes(b"x" * (main.EDGE_MP3_BITRATE // 8))  # one second of audio
+        return [{"offset": 0.5, "duration": 0.2, "text": sentence.split()[0]}]
+
+    monkeypatch.setattr(main, "stream_edge_tts", fake_stream)
+    audio_path = tmp_path / "tts.mp3"
+    boundaries = asyncio.run(
+        main.synthesize_edge_sentences("Un deux. Trois quatre.", "fr-FR-X", audio_path)
+    )
+    assert [b["offset"] for b in boundaries] == [0.5, 1.5]
+    assert audio_path.stat().st_size == 2 * (main.EDGE_MP3_BITRATE // 8)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["tts.mp3"]
+
+
+def race(behaviours: dict, hedge_after: float = 0.05) -> tuple:
+    """first_successful over behaviours {candidate: [per-attempt coroutine functions]}."""
+    started = []
+
+    async def attempt(candidate, first_chunk):
+        started.append(candidate)
+        run = behaviours[candidate][started.count(candidate) - 1]
+        return await run(first_chunk)
+
+    async def scenario():
+        return await main.first_successful(list(behaviours), attempt, hedge_after)
+
+    return asyncio.run(scenario()), started
+
+
+def test_streaming_attempt_is_not_hedged():
+    async def slow_but_streaming(first_chunk):
+        first_chunk.set()
+        await asyncio.sleep(0.3)
+        return "long caption"
+
+    result, started = race({"voice-a": [slow_but_streaming], "voice-b": []})
+    assert result == ("voice-a", "long caption")
+    assert started == ["voice-a"]
+
+
+def test_silent_attempt_is_hedged_with_the_same_voice():
+    async def stuck(first_chunk):
+        await asyncio.sleep(10)
+
+    async def fresh(first_chunk):
+        first_chunk.set()
+        return "audio"
+
+    result, started = race({"voice-a": [stuck, fresh], "voice-b": []})
+    assert result == ("voice-a", "audio")
+    assert started == ["voice-a", "voice-a"]
+
+
+def test_next_voice_starts_when_the_voice_fails():
+    async def down(first_chunk):
+        raise RuntimeError("no such voice")
+
+    async def ok(first_chunk):
+        return "audio"
+
+    result, started = race({"voice-a": [down], "voice-b": [ok]})
+    assert result == ("voice-b", "audio")
+    assert started == ["voice-a", "voice-b"]
@@ -0,0 +1,31 @@
+import main
+
+
+def test_busy_queue_keeps_the_requested_profile_by_default(monkeypatch):
+    monkeypatch.setattr(main, "ENCODING_DOWNGRADE_QUEUE_DEPTH", 4)
+    request = main.ReelRequest(encoding_profile="archive")
+    assert main.select_encoding_profile(request, queued_jobs=40) == "archive"
+
+
+def test_downgrade_is_opt_in(monkeypatch):
+    monkeypatch.setattr(main, "ENCODING_DOWNGRADE_QUEUE_DEPTH", 4)
+    request = main.ReelRequest(encoding_profile="archive", allow_profile_downgrade=True)
+    assert main.select_encoding_profile(request, queued_jobs=3) == "archive"
+    assert main.select_encoding_profile(request, queued_jobs=4) == "balanced"
+    assert main.select_encoding_profile(request, queued_jobs=40) == "draft"
+
+
+def test_response_reports_the_profile_used(tmp_path):
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    output = job_dir / "output.mp4"
+    output.write_bytes(b"mp4")
+    result = main.deliver_output(
+        main.ReelRequest(output_mode="base64"),
+        job_dir,
+        output,
+        {},
+        12.0,
+        {"encoding_profile": "balanced"},
+    )
+    assert result["encoding_profile"] == "balanced"
@@ -0,0 +1,112 @@
+import pytest
+
+from filter_graph import MOTION, FilterGraph, FilterGraphError, legacy_reel_plan, plan_reel_video
+
+REEL = (1080, 1920)
+SCALE = "scale=1080:1920:force_original_aspect_ratio=increase"
+CROP = "crop=1080:1920"
+SHARPEN = "unsharp=5:5:1.0:5:5:0.0"
+COLOR = "eq=brightness=0.05:contrast=1.1"
+
+
+def overlay_graph() -> FilterGraph:
+    graph = FilterGraph()
+    graph.chain(["1:v"], ["scale=200:-1"], ["wm"])
+    graph.chain(["0:v", "wm"], ["overlay=W-w-20:H-h-20"], ["vout"])
+    return graph
+
+
+def test_valid_graph_renders():
+    graph = overlay_graph()
+    graph.validate(2, ["[vout]", "0:a"])
+    assert graph.render() == "[1:v]scale=200:-1[wm];[0:v][wm]overlay=W-w-20:H-h-20[vout]"
+
+
+def test_input_stream_can_feed_several_chains():
+    graph = FilterGraph()
+    graph.chain(["1:v"], ["scale=200:-1"], ["small"])
+    graph.chain(["1:v"], ["scale=-1:300"], ["large"])
+    graph.chain(["0:v", "small", "large"], ["overlay", "overlay"], ["vout"])
+    graph.validate(2, ["[vout]"])
+
+
+@pytest.mark.parametrize(
+    "input_count, mapped, message",
+    [
+        (1, ["[vout]"], "only 1 inputs"),
+        (2, [], "read 0 times"),
+        (2, ["[vout]", "[vout]"], "read 2 times"),
+        (2, ["[missing]"], "no chain produces"),
+    ],
+)
+def test_miswired_graph_is_rejected(input_count, mapped, message):
+    with pytest.raises(FilterGraphError, match=message):
+        overlay_graph().validate(input_count, mapped)
+
+
+def test_duplicate_output_and_open_chain_are_rejected():
+    graph = overlay_graph()
+    graph.chain(["0:v"], ["null"], ["wm"])
+    with pytest.raises(FilterGraphError, match="produced twice"):
+        graph.validate(2, ["[vout]"])
+    graph = overlay_graph()
+    graph.chain(["0:a"], ["anull"])
+    with pytest.raises(FilterGraphError, match="no output label"):
+        graph.validate(2, ["[vout]"])
+
+
+def test_cycle_is_rejected():
+    graph = FilterGraph()
+    graph.chain(["b"], ["null"], ["a"])
+    graph.chain(["a"], ["split=2"], ["b", "vout"])
+    with pytest.raises(FilterGraphError, match="Cycle"):
+        graph.validate(1, ["[vout]"])
+
+
+def test_4k_scales_before_stabilization_and_sharpens_after_it():
+    plan = plan_reel_video((3840, 2160), REEL, motion=True, sharpen=SHARPEN, color=COLOR)
+    assert plan.early_scale
+    assert plan.signature() == ",".join([SCALE, MOTION, CROP, SHARPEN, COLOR])
+    assert plan.motion_size == (3413, 1920)
+    assert plan.filters("deshake")[1] == "deshake"
+    assert plan.pixel_work(("local",)) == 1080 * 1920
+
+
+def test_late_scale_is_the_legacy_order():
+    plan = plan_reel_video(
+        (3840, 2160), REEL, motion=True, sharpen=SHARPEN, color=COLOR, early_scale=False
+    )
+    assert not plan.early_scale
+    assert plan.signature() == legacy_reel_plan((3840, 2160), REEL, True, SHARPEN, COLOR).signature()
+    assert plan.motion_size == (3840, 2160)
+
+
+def test_upscaled_source_is_filtered_before_the_scale():
+    plan = plan_reel_video((720, 1280), REEL, motion=True, sharpen=SHARPEN, color=COLOR)
+    assert plan.signature() == ",".join([MOTION, SHARPEN, COLOR, SCALE, CROP])
+    assert plan.pixel_work() < legacy_reel_plan((720, 1280), REEL, True, SHARPEN, COLOR).pixel_work()
+
+
+def test_unknown_size_keeps_the_legacy_order():
+    plan = plan_reel_video(None, REEL, motion=True, sharpen=SHARPEN, color=COLOR)
+    assert plan.signature() == ",".join([MOTION, SHARPEN, SCALE, CROP, COLOR])
+    assert plan.pixel_work() == 0
+    with pytest.raises(FilterGraphError):
+        plan.filters()
+
+
+@pytest.mark.parametrize("source", [(3840, 2160), (2160, 3840), (1920, 1080), (1080, 1920), (720, 1280), None])
+@pytest.mark.parametrize("motion", [False, True])
+@pytest.mark.parametrize("early_scale", [False, True])
+def test_filters_keep_the_legacy_order_apart_from_geometry(source, motion, early_scale):
+    """Only scale and crop move: motion filter, sharpen and colour run in the legacy order."""
+    sharpen = SHARPEN if motion else None
+    plan = plan_reel_video(source, REEL, motion, sharpen, COLOR, early_scale=early_scale)
+    legacy = legacy_reel_plan(source, REEL, motion, sharpen, COLOR)
+
+    def non_geometry(reel_plan):
+        return [step.filter for step in reel_plan.steps if step.kind != "geometry"]
+
+    assert non_geometry(plan) == non_geometry(legacy)
+    assert sorted(plan.signature().split(",")) == sorted(legacy.signature().split(","))
+    assert plan.pixel_work() <= legacy.pixel_work()
@@ -0,0 +1,56 @@
+import asyncio
+
+import main
+
+
+def fingerprint(**fields) -> str:
+    return asyncio.run(main.request_fingerprint(main.ReelRequest(text="Bonjour", **fields)))
+
+
+def test_gemini_key_presence_changes_the_fingerprint():
+    assert fingerprint() != fingerprint(gemini_api_key="key-a")
+
+
+def test_gemini_key_value_does_not_change_the_fingerprint():
+    assert fingerprint(gemini_api_key="key-a") == fingerprint(gemini_api_key="key-b")
+
+
+def test_edge_engine_ignores_the_gemini_key():
+    assert fingerprint(tts_engine="edge") == fingerprint(tts_engine="edge", gemini_api_key="key-a")
+
+
+def served(monkeypatch, contents: dict):
+    """Make the asset cache report the hash of contents[url] for each URL."""
+
+    async def content_hash(url):
+        return main.hashlib.sha256(contents[url]).hexdigest() if url in contents else None
+
+    monkeypatch.setattr(main.asset_cache, "content_hash", content_hash)
+
+
+def test_url_sources_count_by_content(monkeypatch):
+    served(monkeypatch, {"https://cdn/a.mp4": b"clip", "https://cdn/b.mp4": b"clip"})
+    first = fingerprint(video_url="https://cdn/a.mp4")
+    assert first == fingerprint(video_url="https://cdn/b.mp4")
+
+    served(monkeypatch, {"https://cdn/a.mp4": b"new clip"})
+    assert fingerprint(video_url="https://cdn/a.mp4") != first
+
+
+def test_unreachable_url_counts_by_url(monkeypatch):
+    served(monkeypatch, {})
+    assert fingerprint(music_url="https://cdn/a.mp3") != fingerprint(music_url="https://cdn/b.mp3")
+
+
+def test_tts_token_does_not_change_the_fingerprint():
+    assert fingerprint() == fingerprint(tts_token="preview-token")
+
+
+def test_tts_voice_counts_once_resolved():
+    assert fingerprint(tts_voice="female") == fingerprint(tts_voice="fr-FR-VivienneMultilingualNeural")
+    assert fingerprint(tts_voice="female") != fingerprint(tts_voice="male")
+
+
+def test_no_fingerprint_without_output_cache(monkeypatch):
+    monkeypatch.setattr(main.output_cache, "max_entries", 0)
+    assert fingerprint() is None
@@ -0,0 +1,36 @@
+import asyncio
+
+import main
+from conftest import client
+
+
+def test_health_answers_while_a_process_runs(api_headers, tmp_path):
+    """/health returns while a child process is blocked until the test releases it."""
+    release = tmp_path / "release"
+
+    async def scenario():
+        started = asyncio.Event()
+        encode = asyncio.create_task(
+            main.run_process(
+                ["sh", "-c", 'echo started; while [ ! -e "$0" ]; do sleep 0.01; done', release],
+                on_stdout_line=lambda line: started.set(),
+            )
+        )
+        await asyncio.wait_for(started.wait(), timeout=10)
+        async with client() as c:
+            response = await c.get("/health", headers=api_headers)
+        still_running = not encode.done()
+        release.touch()
+        return response, still_running, await encode
+
+    response, still_running, encode = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert still_running
+    assert encode.returncode == 0
+
+
+def test_run_process_returns_output_and_exit_code():
+    result = asyncio.run(main.run_process(["sh", "-c", "echo out; echo err >&2; exit 3"]))
+    assert result.returncode == 3
+    assert result.stdout == b"out\n"
+    assert result.stderr == b"err\n"
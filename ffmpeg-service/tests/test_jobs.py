@@ -0,0 +1,85 @@
+import asyncio
+
+import main
+from conftest import client
+
+
+def fake_render(monkeypatch, video: bytes = b"reel"):
+    """render_reel stand-in delivering `video` the way the real one does."""
+
+    async def render_reel(request, job_dir, extra_stats=None, on_progress=None, fingerprint=None):
+        output = job_dir / "output.mp4"
+        output.write_bytes(video)
+        return main.deliver_output(request, job_dir, output, {}, 12.0, {"encoding_profile": "archive"})
+
+    monkeypatch.setattr(main, "render_reel", render_reel)
+
+
+def run_with_workers(monkeypatch, scenario):
+    """Run scenario(c) with the job workers started as the lifespan handler does."""
+    monkeypatch.setattr(main, "JOBS", {})
+    monkeypatch.setattr(main, "job_queue", None)
+    monkeypatch.setattr(main, "render_slots", [])
+
+    async def with_workers():
+        main.start_job_workers()
+        async with client() as c:
+            return await scenario(c)
+
+    return asyncio.run(with_workers())
+
+
+async def wait_for_job(c, headers, job_id) -> dict:
+    for _ in range(200):
+        job = (await c.get(f"/jobs/{job_id}", headers=headers)).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_base64_job_keeps_a_handle_instead_of_the_video(monkeypatch, api_headers):
+    fake_render(monkeypatch)
+    monkeypatch.setattr(main.output_cache, "max_entries", 0)
+
+    async def scenario(c):
+        created = await c.post(
+            "/jobs",
+            headers=api_headers,
+            json={"video_url": "https://cdn/clip.mp4", "output_mode": "base64"},
+        )
+        assert created.status_code == 202
+        job = await wait_for_job(c, api_headers, created.json()["job_id"])
+        video = await c.get(job["result"]["download_url"], headers=api_headers)
+        return job, video
+
+    job, video = run_with_workers(monkeypatch, scenario)
+    assert job["status"] == "completed"
+    assert "output_base64" not in job["result"]
+    assert job["result"]["encoding_profile"] == "archive"
+    assert video.content == b"reel"
+
+
+def test_unknown_job_is_404(monkeypatch, api_headers):
+    async def scenario(c):
+        return await c.get("/jobs/nope", headers=api_headers)
+
+    assert run_with_workers(monkeypatch, scenario).status_code == 404
+
+
+def test_finished_jobs_are_bounded(monkeypatch):
+    monkeypatch.setattr(main, "MAX_FINISHED_JOBS", 2)
+    now = main.time.time()
+    monkeypatch.setattr(
+        main,
+        "JOBS",
+        {
+            "old": {"finished_at": now - 30},
+            "older": {"finished_at": now - 60},
+            "recent": {"finished_at": now - 10},
+            "expired": {"finished_at": now - main.JOB_TTL_SECONDS - 1},
+            "running": {"finished_at": None},
+        },
+    )
+    main.purge_finished_jobs()
+    assert sorted(main.JOBS) == ["old", "recent", "running"]
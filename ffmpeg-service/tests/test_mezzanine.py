@@ -0,0 +1,37 @@
+import main
+
+
+def test_mezzanine_is_stored_on_second_sighting(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "MEZZANINE_WRITE_AFTER", 2)
+    cache = main.FileCache(tmp_path / "mezzanine", 10**9, ".mp4")
+    assert cache.get("source") is None
+    assert cache.sightings("source") < main.MEZZANINE_WRITE_AFTER
+    assert cache.sightings("other") == 1
+    assert cache.get("source") is None
+    assert cache.sightings("source") == main.MEZZANINE_WRITE_AFTER
+
+    render = tmp_path / "mezzanine.mp4"
+    render.write_bytes(b"video")
+    cache.put("source", render, move=True)
+    assert "source" not in cache.missed
+    assert cache.get("source").read_bytes() == b"video"
+    assert cache.stats()["misses"] == 2
+
+
+def test_uncounted_lookup_is_not_a_miss(tmp_path):
+    cache = main.FileCache(tmp_path / "mezzanine", 10**9, ".mp4")
+    assert cache.get("early-plan", count_miss=False) is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_sightings_are_bounded(tmp_path):
+    cache = main.FileCache(tmp_path / "mezzanine", 10**9, ".mp4")
+    for index in range(5000):
+        cache.sightings(str(index))
+    assert len(cache.missed) == 4096
+    assert "0" not in cache.missed
+
+
+def test_mezzanine_has_a_keyframe_every_second():
+    args = main.mezzanine_encoding_args()
+    assert args[args.index("-g") + 1] == str(main.OUTPUT_FPS)
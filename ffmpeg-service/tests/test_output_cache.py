@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = main.OutputCache(tmp_path / "outputs", 8, 60)
+    monkeypatch.setattr(main, "output_cache", cache)
+    monkeypatch.setattr(main, "inflight_jobs", {})
+    return cache
+
+
+def job_dir(tmp_path, name: str):
+    path = tmp_path / name
+    path.mkdir()
+    return path
+
+
+def test_followers_get_a_downgraded_render(cache, monkeypatch, tmp_path):
+    request = main.ReelRequest(text="Bonjour", output_mode="handle")
+
+    async def scenario():
+        monkeypatch.setattr(main, "job_queue", asyncio.Queue())
+        leader = asyncio.create_task(
+            main.submit_and_wait(request, job_dir(tmp_path, "a"), fingerprint="fp")
+        )
+        followers = [
+            asyncio.create_task(
+                main.submit_and_wait(request, job_dir(tmp_path, f"f{i}"), fingerprint="fp")
+            )
+            for i in range(3)
+        ]
+        job = await main.job_queue.get()
+        assert main.job_queue.empty()
+
+        # The leader's render, downgraded on a busy queue
+        output = job["job_dir"] / "output.mp4"
+        output.write_bytes(b"reel")
+        cache.put("fp", output, {}, 5.0, {"encoding_profile": "draft"}, reusable=False)
+        del main.inflight_jobs["fp"]
+        await main.finish_job(job, {"success": True})
+        await leader
+        results = await asyncio.gather(*followers)
+
+        # Not served to a later request: it renders with the requested profile
+        later = main.create_job(request, job_dir(tmp_path, "later"), fingerprint="fp")
+        assert not main.attach_to_identical(later)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(r["success"] for r in results)
+    assert {r["processing_stats"]["output_cache"] for r in results} == {"hit"}
+    assert {r["processing_stats"]["encoding_profile"] for r in results} == {"draft"}
+    assert cache.counters["coalesced"] == 3
+
+
+def test_reusable_entry_serves_later_requests(cache, tmp_path):
+    output = tmp_path / "output.mp4"
+    output.write_bytes(b"reel")
+    cache.put("fp", output, {}, 5.0, {})
+    assert cache.has("fp")
+    assert cache.get("fp")["duration"] == 5.0
+
+
+def test_expired_entry_is_dropped(cache, tmp_path):
+    output = tmp_path / "output.mp4"
+    output.write_bytes(b"reel")
+    cache.put("fp", output, {}, 5.0, {})
+    cache.entries["fp"]["expires_at"] = 0
+    assert cache.get("fp") is None
+    assert "fp" not in cache.entries
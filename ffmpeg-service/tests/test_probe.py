@@ -0,0 +1,88 @@
+import asyncio
+import json
+import subprocess
+from collections import OrderedDict
+
+import main
+
+FFPROBE_4K = {
+    "format": {"duration": "24.0", "size": "10", "format_name": "mov"},
+    "streams": [
+        {
+            "codec_type": "video",
+            "codec_name": "h264",
+            "width": 3840,
+            "height": 2160,
+            "avg_frame_rate": "30000/1001",
+            "pix_fmt": "yuv420p",
+            "side_data_list": [{"rotation": -90}],
+        },
+        {"codec_type": "audio", "codec_name": "aac", "sample_rate": "48000", "channels": 2},
+    ],
+}
+
+
+def count_probes(monkeypatch, data: dict = FFPROBE_4K) -> list:
+    monkeypatch.setattr(main, "_probe_cache", OrderedDict())
+    probed = []
+
+    async def run_process(cmd, *args, **kwargs):
+        probed.append(cmd[-1])
+        return subprocess.CompletedProcess(cmd, 0, json.dumps(data).encode(), b"")
+
+    monkeypatch.setattr(main, "run_process", run_process)
+    return probed
+
+
+def test_one_ffprobe_run_describes_video_and_audio():
+    info = main.MediaInfo.from_ffprobe(FFPROBE_4K)
+    assert (info.width, info.height, info.rotation) == (3840, 2160, 270)
+    assert round(info.fps, 2) == 29.97
+    assert info.has_audio and info.sample_rate == 48000 and info.channels == 2
+    assert info.duration == 24.0
+
+
+def test_cover_art_is_not_a_video_stream():
+    info = main.MediaInfo.from_ffprobe(
+        {
+            "format": {},
+            "streams": [
+                {"codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}},
+                {"codec_type": "audio", "codec_name": "mp3", "duration": "31.5"},
+            ],
+        }
+    )
+    assert not info.has_video
+    assert info.duration == 31.5
+
+
+def test_same_content_is_probed_once(monkeypatch, tmp_path):
+    probed = count_probes(monkeypatch)
+    first, second = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    first.write_bytes(b"track")
+    second.write_bytes(b"track")
+
+    async def scenario():
+        info = await main.probe_media(first)
+        info.duration = 0.0  # callers get a copy
+        return await main.probe_media(second)
+
+    assert asyncio.run(scenario()).duration == 24.0
+    assert probed == [str(first)]
+
+
+def test_probe_cache_is_bounded(monkeypatch, tmp_path):
+    probed = count_probes(monkeypatch)
+    monkeypatch.setattr(main, "PROBE_CACHE_SIZE", 2)
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"{i}.mp4")
+        paths[-1].write_bytes(bytes([i]))
+
+    async def scenario():
+        for path in [*paths, paths[0]]:
+            await main.probe_media(path)
+
+    asyncio.run(scenario())
+    assert len(main._probe_cache) == 2
+    assert probed == [str(p) for p in [*paths, paths[0]]]
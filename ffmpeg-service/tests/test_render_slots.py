@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import pytest
+
+import main
+import subtitle_aligner
+
+
+def allowed_cpus(status: bytes) -> str:
+    for line in status.decode().splitlines():
+        if line.startswith("Cpus_allowed_list:"):
+            return line.split(":", 1)[1].strip()
+    raise AssertionError("no Cpus_allowed_list")
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+@pytest.mark.parametrize("taskset", [main.TASKSET, None])
+def test_children_are_pinned_to_the_slot(monkeypatch, taskset):
+    cpu = min(os.sched_getaffinity(0))
+    monkeypatch.setattr(main, "TASKSET", taskset)
+
+    async def scenario():
+        token = main.current_render_slot.set(main.RenderSlot(0, [cpu]))
+        try:
+            # sleep first: without taskset the mask is set just after the spawn
+            return await main.run_process(["sh", "-c", "sleep 0.1; cat /proc/self/status"])
+        finally:
+            main.current_render_slot.reset(token)
+
+    result = asyncio.run(scenario())
+    assert allowed_cpus(result.stdout) == str(cpu)
+
+
+def test_outside_a_slot_children_are_not_pinned():
+    assert main.slot_cpus() is None
+    result = asyncio.run(main.run_process(["cat", "/proc/self/status"]))
+    with open("/proc/self/status", "rb") as f:
+        assert allowed_cpus(result.stdout) == allowed_cpus(f.read())
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_aligner_worker_pins_to_the_caller_slot_then_back(monkeypatch):
+    all_cpus = os.sched_getaffinity(0)
+    monkeypatch.setattr(subtitle_aligner, "_all_cpus", all_cpus)
+    try:
+        subtitle_aligner.pin([min(all_cpus)])
+        assert os.sched_getaffinity(0) == {min(all_cpus)}
+        subtitle_aligner.pin(None)
+        assert os.sched_getaffinity(0) == all_cpus
+    finally:
+        os.sched_setaffinity(0, all_cpus)
@@ -0,0 +1,75 @@
+import asyncio
+import re
+
+import pytest
+
+import main
+
+
+def test_segments_cover_the_reel_on_the_frame_grid():
+    segments = main.plan_segments(25.0, 3, 10)
+    assert segments[0][0] == 0 and segments[-1][1] == 25.0
+    assert len(segments) == 2
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end == start
+        assert (start * main.OUTPUT_FPS) == pytest.approx(round(start * main.OUTPUT_FPS))
+
+
+def test_short_reel_is_one_segment():
+    assert main.plan_segments(8.0, 4, 10) == [(0.0, 8.0)]
+
+
+def test_segment_count_is_capped():
+    assert len(main.plan_segments(120.0, 4, 10)) == 4
+
+
+def test_segments_run_the_whole_graph_on_source_timestamps(monkeypatch, tmp_path, fake_ffmpeg):
+    monkeypatch.setattr(main, "ENCODE_SEGMENTS", 3)
+    monkeypatch.setattr(main, "SEGMENT_MIN_SECONDS", 10)
+    graph = main.FilterGraph()
+    chain = graph.chain(["0:v"], ["scale=1080:1920"])
+    graph.then(chain, "v0", ["overlay=enable='gte(t,20)'", "fade=t=out:st=34:d=1"], ["1:v"])
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+
+    stats = asyncio.run(
+        main.encode_segmented(
+            ["-i", "source.mp4", "-i", "logo.png"],
+            graph,
+            main.FilterGraph(),
+            "0:a",
+            35.0,
+            "draft",
+            job_dir,
+            job_dir / "output.mp4",
+        )
+    )
+
+    commands = [line.split() for line in fake_ffmpeg.read_text().splitlines()]
+    trim_re = re.compile(r"trim=start=([\d.]+):end=([\d.]+)")
+
+    def trim(cmd):
+        return tuple(map(float, trim_re.search(cmd[cmd.index("-filter_complex") + 1]).groups()))
+
+    # Segments run concurrently, in any order
+    segments = sorted((cmd for cmd in commands if any("trim=" in arg for arg in cmd)), key=trim)
+    assert stats["segments"] == len(segments) == 3
+    planned = main.plan_segments(35.0, 3, 10)
+    trims = []
+    for cmd, (start, _) in zip(segments, planned):
+        assert "-copyts" in cmd
+        # Only the source is seeked, one second early
+        seek = cmd.index("-ss")
+        assert cmd[seek + 1 : seek + 4] == [f"{max(0.0, start - 1):.3f}", "-i", "source.mp4"]
+        assert cmd.count("-ss") == 1
+        graph_arg = cmd[cmd.index("-filter_complex") + 1]
+        assert "overlay=enable='gte(t,20)',fade=t=out:st=34:d=1" in graph_arg
+        trims += trim(cmd)
+    assert trims == pytest.approx([t for segment in planned for t in segment])
+
+    audio = next(cmd for cmd in commands if cmd[-1].endswith("audio.m4a"))
+    assert audio[audio.index("-t") + 1] == "35.0"
+    concat = next(cmd for cmd in commands if "concat" in cmd)
+    assert concat[concat.index("-c") + 1] == "copy"
+    listed = (job_dir / "segments.txt").read_text().splitlines()
+    assert listed == [f"file 'segment_{i:03d}.mp4'" for i in range(3)]
@@ -0,0 +1,78 @@
+import asyncio
+
+import main
+
+
+def test_local_motions_are_rescaled(tmp_path):
+    src = tmp_path / "proxy.trf"
+    src.write_text(
+        "VID.STAB 1\n"
+        "Frame 1 (List 2 [(LM 10 -4 100 200 64 0.5 0.1),(LM -3 7 300 40 64 0.2 0.3)])\n",
+        encoding="ascii",
+    )
+    dest = tmp_path / "scaled.trf"
+    assert main.rescale_transforms(src, dest, 2.0, 3.0)
+    assert dest.read_text(encoding="ascii") == (
+        "VID.STAB 1\n"
+        "Frame 1 (List 2 [(LM 20 -12 200 600 128 0.5 0.1),(LM -6 21 600 120 128 0.2 0.3)])\n"
+    )
+
+
+def test_binary_transforms_are_not_rescaled(tmp_path):
+    src = tmp_path / "proxy.trf"
+    src.write_bytes(b"TRF1\x00\x01")
+    dest = tmp_path / "scaled.trf"
+    # The caller detects again at source resolution instead (see below)
+    assert not main.rescale_transforms(src, dest, 2.0, 2.0)
+    assert not dest.exists()
+
+
+def render_stabilized(tmp_path, monkeypatch, filter_options: dict) -> dict:
+    registry = main.CapabilityRegistry()
+    registry.restore(
+        {
+            "version": "ffmpeg test",
+            "filters": ["scale", "crop", "eq", "unsharp", "vidstabdetect", "vidstabtransform"],
+            "encoders": ["libx264", "aac"],
+            "filter_options": filter_options,
+        }
+    )
+    monkeypatch.setattr(main, "capabilities", registry)
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    (job_dir / "input.mp4").write_bytes(b"4k clip")
+    request = main.ReelRequest(stabilize=True, enable_ending_effect=False, output_mode="handle")
+    return asyncio.run(main.render_reel(request, job_dir))["processing_stats"]
+
+
+def test_ascii_transforms_are_detected_on_the_proxy(tmp_path, monkeypatch, fake_ffmpeg):
+    stats = render_stabilized(tmp_path, monkeypatch, {"vidstabdetect": ["fileformat", "result"]})
+    assert "fileformat=ascii" in fake_ffmpeg.read_text()
+    assert stats["stabilize"]["proxy"] != "source"
+    assert stats["video_plan"]["early_scale"]
+    assert any(f.startswith("vidstabtransform=") for f in stats["video_plan"]["filters"])
+
+
+def test_binary_transforms_still_stabilize(tmp_path, monkeypatch, fake_ffmpeg):
+    # A build that cannot be asked for ASCII transforms writes binary ones
+    stats = render_stabilized(tmp_path, monkeypatch, {"vidstabdetect": ["result"]})
+    assert "fileformat" not in fake_ffmpeg.read_text()
+    assert stats["stabilize"]["proxy"] == "source"
+    assert stats["stabilize"]["proxy_fallback"]
+    # Source-resolution transforms are applied before the downscale
+    assert not stats["video_plan"]["early_scale"]
+    assert any(f.startswith("vidstabtransform=") for f in stats["video_plan"]["filters"])
+
+
+def test_filter_options_are_read_from_ffmpeg_help(monkeypatch, tmp_path):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(
+        "#!/bin/sh\n"
+        "printf 'vidstabdetect AVOptions:\\n"
+        "   result            <string>     ..FV....... path (default \"transforms.trf\")\\n"
+        "   fileformat        <int>        ..FV....... transforms data file format\\n"
+        "     ascii           1            ..FV....... ASCII text\\n'\n"
+    )
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    assert main._ffmpeg_filter_options("vidstabdetect") == {"result", "fileformat"}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+def test_independent_stages_run_concurrently():
+    graph = main.StageGraph()
+    tts_started, detect_started = asyncio.Event(), asyncio.Event()
+
+    async def stage(mine, other):
+        mine.set()
+        # A sequential run would wait here forever
+        await asyncio.wait_for(other.wait(), timeout=5)
+        return "done"
+
+    graph.add("tts", lambda: stage(tts_started, detect_started))
+    graph.add("stabilize", lambda: stage(detect_started, tts_started))
+    results = asyncio.run(graph.run())
+    assert results == {"tts": "done", "stabilize": "done"}
+
+
+def test_stage_waits_for_its_dependencies():
+    graph = main.StageGraph()
+    order = []
+
+    async def stage(name, delay=0.0):
+        await asyncio.sleep(delay)
+        order.append(name)
+
+    graph.add("encode", lambda: stage("encode"), deps=("download", "tts"))
+    graph.add("download", lambda: stage("download", 0.02))
+    graph.add("tts", lambda: stage("tts", 0.01))
+    asyncio.run(graph.run())
+    assert order[-1] == "encode"
+    assert set(graph.timings) == {"download", "tts", "encode"}
+
+
+def test_first_failure_cancels_the_other_stages():
+    graph = main.StageGraph()
+    cancelled = []
+
+    async def forever():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append("stabilize")
+            raise
+
+    async def fail():
+        raise RuntimeError("TTS failed")
+
+    graph.add("stabilize", forever)
+    graph.add("tts", fail)
+    graph.add("encode", forever, deps=("tts",))
+    with pytest.raises(RuntimeError, match="TTS failed"):
+        asyncio.run(graph.run())
+    assert cancelled == ["stabilize"]
+    assert "encode" not in graph.timings
+
+
+def test_critical_path_follows_the_latest_dependency():
+    graph = main.StageGraph()
+    graph.add("download", None)
+    graph.add("tts", None)
+    graph.add("stabilize", None, deps=("download",))
+    graph.add("encode", None, deps=("stabilize", "tts"))
+    graph.timings = {
+        "download": {"start": 0.0, "wall": 1.0, "cpu": 0.0},
+        "tts": {"start": 0.0, "wall": 3.0, "cpu": 0.0},
+        "stabilize": {"start": 1.0, "wall": 4.0, "cpu": 3.5},
+        "encode": {"start": 5.0, "wall": 10.0, "cpu": 40.0},
+    }
+    stats = graph.stats()
+    assert stats["critical_path"] == ["download", "stabilize", "encode"]
+    assert stats["critical_path_seconds"] == 15.0
+    assert stats["sequential_seconds"] == 18.0
+    assert stats["wall_seconds"] == 15.0
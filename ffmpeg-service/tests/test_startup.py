@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+import main
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_server_accepts_requests_before_the_warm_up(tmp_path):
+    """/health answers as soon as the app is imported, whatever /ready says."""
+    port = free_port()
+    start = time.time()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=SERVICE_DIR,
+        env={**os.environ, "CACHE_DIR": str(tmp_path)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        serving = None
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as c:
+            while time.time() - start < 20:
+                try:
+                    if c.get("/health", headers={"X-API-Key": main.API_KEY}).status_code == 200:
+                        serving = time.time() - start
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            ready = c.get("/ready")
+    finally:
+        server.terminate()
+        server.wait()
+    assert serving is not None and serving < 10, f"serving after {serving}s"
+    assert ready.status_code in (200, 503)
+    assert set(ready.json()) >= {"ready", "steps", "error"}
+
+
+def test_cached_environment_is_ready_without_diagnostics(monkeypatch, tmp_path):
+    emoji_font = tmp_path / "NotoColorEmoji.ttf"
+    emoji_font.write_bytes(b"font")
+    cache_file = tmp_path / "environment.json"
+    monkeypatch.setattr(main, "ENVIRONMENT_CACHE_FILE", cache_file)
+    monkeypatch.setattr(main, "environment", {**main.environment, "ready": False})
+    monkeypatch.setattr(main, "capabilities", main.CapabilityRegistry())
+    monkeypatch.setattr(main, "FONT_PATH", main.FONT_PATH)
+    cache_file.write_text(
+        json.dumps(
+            {
+                "capabilities": {
+                    "version": "ffmpeg test",
+                    "filters": ["scale"],
+                    "encoders": ["aac"],
+                    "filter_options": {},
+                },
+                "emoji_font": str(emoji_font),
+                "font_path": "Sans",
+                "fingerprint": main.environment_fingerprint(),
+            }
+        )
+    )
+
+    def no_diagnostics():
+        raise AssertionError("diagnostics ran despite a valid cache")
+
+    monkeypatch.setattr(main, "run_diagnostics", no_diagnostics)
+    asyncio.run(main.warm_up_environment())
+
+    assert main.environment["ready"] and main.environment["from_cache"]
+    assert main.environment["ready_at"] - main.environment["started_at"] < 0.5
+    assert main.capabilities.loaded and main.capabilities.has_filter("scale")
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import main
+
+TEXT = "Bonjour tout le monde"
+VOICE = "fr-FR-VivienneMultilingualNeural"
+
+
+@pytest.fixture
+def tts(monkeypatch, tmp_path):
+    """Fake engines: Gemini fails while state["gemini_up"] is False, Edge may swap voices."""
+    state = {"gemini_up": False, "edge_voice": VOICE, "calls": []}
+    monkeypatch.setattr(main, "tts_cache", main.TTSCache(tmp_path / "tts", 10**9, 3600))
+    monkeypatch.setattr(
+        main, "tts_health", main.TTSHealth(main.TTS_BREAKER_FAILURES, main.TTS_BREAKER_COOLDOWN_SECONDS)
+    )
+
+    async def fake_gemini(text, voice, api_key, audio_path, ass_path, display_text=None, delay=0.0):
+        state["calls"].append("gemini")
+        if not state["gemini_up"]:
+            raise RuntimeError("gemini down")
+        audio_path.write_bytes(b"wav")
+        ass_path.write_text("gemini")
+
+    async def fake_edge(text, voice, audio_path, ass_path, display_text=None, delay=0.0):
+        state["calls"].append("edge")
+        audio_path.write_bytes(b"mp3")
+        ass_path.write_text("edge")
+        return state["edge_voice"]
+
+    monkeypatch.setattr(main, "generate_tts_gemini", fake_gemini)
+    monkeypatch.setattr(main, "generate_tts_with_subs", fake_edge)
+    return state
+
+
+def synthesize(tmp_path, engine="gemini", api_key="key") -> dict:
+    job_dir = tmp_path / f"job{len(list(tmp_path.glob('job*')))}"
+    job_dir.mkdir()
+    return asyncio.run(
+        main.synthesize_tts(TEXT, VOICE, engine, api_key, job_dir / "tts.mp3", job_dir / "tts.ass")
+    )
+
+
+def test_edge_fallback_is_not_served_for_gemini(tts, tmp_path):
+    fallback = synthesize(tmp_path)
+    assert (fallback["engine"], fallback["cache"]) == ("edge", "miss")
+
+    # Gemini is back: the request is synthesized again, not answered from the Edge entry
+    tts["gemini_up"] = True
+    recovered = synthesize(tmp_path)
+    assert (recovered["engine"], recovered["cache"]) == ("gemini", "miss")
+    assert recovered["token"] != fallback["token"]
+    assert synthesize(tmp_path)["cache"] == "hit"
+
+
+def test_edge_fallback_is_cached_as_edge(tts, tmp_path):
+    synthesize(tmp_path)
+    assert synthesize(tmp_path, engine="edge", api_key=None)["cache"] == "hit"
+
+
+def test_another_voice_is_not_cached_under_the_requested_one(tts, tmp_path):
+    tts["edge_voice"] = "fr-FR-DeniseNeural"
+    first = synthesize(tmp_path, engine="edge", api_key=None)
+    assert first["voice"] == "fr-FR-DeniseNeural"
+    tts["edge_voice"] = VOICE
+    second = synthesize(tmp_path, engine="edge", api_key=None)
+    assert (second["voice"], second["cache"]) == (VOICE, "miss")
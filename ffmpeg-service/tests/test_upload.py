@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import main
+from conftest import client
+
+VIDEO = bytes(range(256)) * 4096  # 1 MiB, spans several multipart chunks
+
+
+def post_upload(headers: dict, **kwargs):
+    async def scenario():
+        async with client() as c:
+            return await c.post("/process-reel-upload", headers=headers, **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def capture_submit(monkeypatch) -> dict:
+    seen = {}
+
+    async def fake_submit(request, job_dir, extra_stats=None, fingerprint=None):
+        seen["request"] = request
+        seen["video"] = (job_dir / "input.mp4").read_bytes()
+        return {"success": True}
+
+    monkeypatch.setattr(main, "submit_and_wait", fake_submit)
+    return seen
+
+
+def test_multipart_video_is_streamed_to_the_job_dir(monkeypatch, api_headers):
+    seen = capture_submit(monkeypatch)
+    response = post_upload(
+        api_headers,
+        files={"video": ("clip.mp4", VIDEO, "video/mp4")},
+        data={"options": json.dumps({"text": "Bonjour", "video_url": "http://ignored"})},
+    )
+    assert response.json() == {"success": True}
+    assert seen["video"] == VIDEO
+    assert seen["request"].text == "Bonjour"
+    assert seen["request"].video_url is None
+
+
+def test_raw_body_over_the_limit_is_413(monkeypatch, api_headers):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    response = post_upload(
+        {**api_headers, "Content-Type": "video/mp4"}, content=VIDEO
+    )
+    assert response.status_code == 413
+
+
+def test_multipart_over_the_limit_is_413(monkeypatch, api_headers):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    response = post_upload(
+        api_headers, files={"video": ("clip.mp4", VIDEO, "video/mp4")}, data={"options": "{}"}
+    )
+    assert response.status_code == 413
+
+
+def test_multipart_without_video_is_400(api_headers):
+    response = post_upload(
+        api_headers,
+        files={"other": ("a.txt", b"x", "text/plain")},
+        data={"options": "{}"},
+    )
+    assert response.status_code == 400
+
+
+BOUNDARY = "reel-test-boundary"
+MULTIPART = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+def multipart_body(*parts) -> bytes:
+    """Multipart body with parts (name, filename or None, content) in this order."""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def refuse_video(monkeypatch):
+    """Fail if save_upload_stream ever receives a video chunk."""
+    real_save = main.save_upload_stream
+
+    async def chunks_forbidden(chunks, dest_path):
+        async def checked():
+            async for chunk in chunks:
+                raise AssertionError("video read before the options were validated")
+                yield chunk
+
+        return await real_save(checked(), dest_path)
+
+    monkeypatch.setattr(main, "save_upload_stream", chunks_forbidden)
+
+
+def test_options_after_the_video_are_400_before_reading_it(monkeypatch, api_headers):
+    refuse_video(monkeypatch)
+    response = post_upload(
+        {**api_headers, **MULTIPART},
+        content=multipart_body(
+            ("video", "clip.mp4", VIDEO), ("options", None, b'{"text": "Bonjour"}')
+        ),
+    )
+    assert response.status_code == 400
+    assert "before the video" in response.json()["detail"]
+
+
+def test_invalid_options_are_400_before_reading_the_video(monkeypatch, api_headers):
+    refuse_video(monkeypatch)
+    response = post_upload(
+        {**api_headers, **MULTIPART},
+        content=multipart_body(
+            ("options", None, b'{"variants": ["billboard"]}'), ("video", "clip.mp4", VIDEO)
+        ),
+    )
+    assert response.status_code == 400
+    assert "billboard" in response.json()["detail"]
+
+
+def test_invalid_raw_options_are_400_before_reading_the_body(monkeypatch, api_headers):
+    refuse_video(monkeypatch)
+    response = post_upload(
+        {**api_headers, "Content-Type": "video/mp4", "X-Reel-Options": '{"text": 12'},
+        content=VIDEO,
+    )
+    assert response.status_code == 400
+
+
+def test_options_header_stands_in_for_the_options_part(monkeypatch, api_headers):
+    seen = capture_submit(monkeypatch)
+    response = post_upload(
+        {**api_headers, "X-Reel-Options": json.dumps({"text": "Salut"})},
+        files={"video": ("clip.mp4", VIDEO, "video/mp4")},
+    )
+    assert response.json() == {"success": True}
+    assert seen["request"].text == "Salut"